@@ -0,0 +1,262 @@
+# admission.py
+#
+# Admission control for the CPU-heavy AI backends. Each backend (llama,
+# whisper, tts) has its own budget:
+#
+#   slots   calls allowed to run at once
+#   queue   callers allowed to wait for a slot; one more is refused at once
+#   wait    seconds a caller waits before it is refused
+#
+# On top of that every backend draws from one shared pool of AI_SLOTS,
+# by default the CPU count minus ADMISSION_RESERVED_CPUS, so a burst of
+# assistant, dictation and speech requests cannot take every core away
+# from the booking routes.
+#
+# A refused call raises Overloaded with a Retry-After estimate taken
+# from how long recent calls held their slot; routes answer 503. Cache
+# hits never get here, they are served before a slot is requested.
+#
+# Budgets are per worker process: with N gunicorn workers the machine
+# runs at most N × AI_SLOTS inference calls.
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import metrics, Gauge
+
+# ================= CONFIG ================= #
+
+# backend -> (slots, queue, wait seconds)
+DEFAULT_BUDGETS = {
+    "llama": (2, 4, 5.0),
+    "whisper": (1, 4, 5.0),
+    "tts": (2, 8, 5.0),
+}
+DEFAULT_RESERVED_CPUS = 1
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+HOLD_SMOOTHING = 0.2        # weight of the newest call in the hold average
+
+
+class Overloaded(Exception):
+    """No slot for the backend within its queue wait."""
+
+    def __init__(self, backend, reason, retry_after):
+        super().__init__(f"{backend} is busy ({reason})")
+        self.backend = backend
+        self.reason = reason            # "queue_full" | "timeout"
+        self.retry_after = retry_after  # whole seconds
+
+
+class Gate:
+    def __init__(self, name, slots, queue, wait):
+        self.name = name
+        self.slots = slots
+        self.queue = queue
+        self.wait = wait
+
+        self.active = 0
+        self.waiters = deque()      # first come, first admitted
+        self.hold_avg = None        # seconds, smoothed
+
+        # stats
+        self.admitted = 0
+        self.queued = 0             # admitted after waiting
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.peak_waiting = 0
+        self.wait_ms_total = 0.0
+
+    @property
+    def waiting(self):
+        return len(self.waiters)
+
+
+class Slot:
+    """An admitted call; release() once done (idempotent)."""
+
+    def __init__(self, controller, gate):
+        self._controller = controller
+        self._gate = gate
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._gate, time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, app=None):
+        self._cond = threading.Condition()
+        self._gates = {}
+        self.ai_slots = None
+        self.active = 0
+
+        for name, budget in DEFAULT_BUDGETS.items():
+            self.configure(name, *budget)
+        self.ai_slots = self._default_ai_slots(DEFAULT_RESERVED_CPUS)
+
+        metrics.register(Gauge(
+            "admission_active",
+            "AI calls holding an admission slot.",
+            lambda: self._read("active"), labels=("backend",)
+        ))
+        metrics.register(Gauge(
+            "admission_queue_depth",
+            "AI calls waiting for an admission slot.",
+            lambda: self._read("waiting"), labels=("backend",)
+        ))
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        budgets = app.config.get("ADMISSION_BUDGETS") or {}
+        for name, budget in budgets.items():
+            self.configure(name, *budget)
+
+        slots = app.config.get("ADMISSION_AI_SLOTS")
+        if slots is None:
+            reserved = app.config.get("ADMISSION_RESERVED_CPUS", DEFAULT_RESERVED_CPUS)
+            slots = self._default_ai_slots(reserved)
+        with self._cond:
+            self.ai_slots = slots
+            self._cond.notify_all()
+        app.extensions["admission"] = self
+
+    @staticmethod
+    def _default_ai_slots(reserved):
+        return max(1, (os.cpu_count() or 1) - reserved)
+
+    def configure(self, name, slots, queue, wait):
+        """Set (or add) the budget of one backend."""
+        with self._cond:
+            gate = self._gates.get(name)
+            if gate is None:
+                self._gates[name] = Gate(name, slots, queue, wait)
+            else:
+                gate.slots, gate.queue, gate.wait = slots, queue, wait
+            self._cond.notify_all()
+
+    # ---------- admission ----------
+
+    def _free(self, gate):
+        return gate.active < gate.slots and self.active < self.ai_slots
+
+    def acquire(self, name, wait=None):
+        """
+        A Slot for one call to the backend, waiting up to `wait` seconds
+        (the backend's budget by default). Raises Overloaded.
+        """
+        gate = self._gates[name]
+        started = time.monotonic()
+        with self._cond:
+            # nobody overtakes a waiter, or a caller that just released
+            # its slot would take it straight back and starve the queue
+            if gate.waiters or not self._free(gate):
+                if gate.waiting >= gate.queue:
+                    raise self._reject(gate, "queue_full")
+
+                deadline = started + (gate.wait if wait is None else wait)
+                ticket = object()
+                gate.waiters.append(ticket)
+                gate.peak_waiting = max(gate.peak_waiting, gate.waiting)
+                try:
+                    while gate.waiters[0] is not ticket or not self._free(gate):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject(gate, "timeout")
+                        self._cond.wait(remaining)
+                finally:
+                    gate.waiters.remove(ticket)
+                    self._cond.notify_all()     # the next in line may fit too
+                gate.queued += 1
+                gate.wait_ms_total += (time.monotonic() - started) * 1000
+
+            gate.active += 1
+            self.active += 1
+            gate.admitted += 1
+
+        metrics.observe_admission(name, "admitted", time.monotonic() - started)
+        return Slot(self, gate)
+
+    @contextmanager
+    def slot(self, name, wait=None):
+        """with admission.slot("llama"): ... — acquire() and release()."""
+        with self.acquire(name, wait) as slot:
+            yield slot
+
+    def _release(self, gate, held):
+        with self._cond:
+            gate.active -= 1
+            self.active -= 1
+            if gate.hold_avg is None:
+                gate.hold_avg = held
+            else:
+                gate.hold_avg += HOLD_SMOOTHING * (held - gate.hold_avg)
+            self._cond.notify_all()
+
+    def _reject(self, gate, reason):
+        # called with self._cond held
+        gate.rejected[reason] += 1
+        retry_after = self._retry_after(gate)
+        metrics.observe_admission(gate.name, reason)
+        return Overloaded(gate.name, reason, retry_after)
+
+    def _retry_after(self, gate):
+        # time for the calls ahead of a new one to drain through the slots
+        if gate.hold_avg is None:
+            return max(MIN_RETRY_AFTER, math.ceil(gate.wait))
+        hold = gate.hold_avg
+        ahead = gate.active + gate.waiting + 1
+        parallel = max(1, min(gate.slots, self.ai_slots))
+        seconds = math.ceil(hold * ahead / parallel)
+        return min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, seconds))
+
+    # ---------- stats ----------
+
+    def _read(self, field):
+        with self._cond:
+            return {(name,): getattr(g, field) for name, g in self._gates.items()}
+
+    def stats(self):
+        with self._cond:
+            return {
+                "ai_slots": self.ai_slots,
+                "active": self.active,
+                "backends": {
+                    name: {
+                        "slots": g.slots,
+                        "queue": g.queue,
+                        "wait_s": g.wait,
+                        "active": g.active,
+                        "waiting": g.waiting,
+                        "peak_waiting": g.peak_waiting,
+                        "admitted": g.admitted,
+                        "queued": g.queued,
+                        "rejected": dict(g.rejected),
+                        "wait_avg_ms": (
+                            round(g.wait_ms_total / g.queued, 1) if g.queued else None
+                        ),
+                        "hold_avg_ms": (
+                            round(g.hold_avg * 1000, 1) if g.hold_avg is not None else None
+                        )
+                    }
+                    for name, g in self._gates.items()
+                }
+            }
+
+
+admission = AdmissionController()
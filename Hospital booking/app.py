@@ -1,6 +1,7 @@
 from flask import (
     Flask, render_template, request, redirect,
-    url_for, flash, jsonify, abort
+    url_for, flash, jsonify, abort,
+    Response, stream_with_context
 )
 from flask_login import (
     LoginManager, login_user, logout_user,
@@ -8,19 +9,59 @@ from flask_login import (
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+import itertools
+import json
+import multiprocessing
 import os
-import dateparser
+
+try:
+    # schema migrations are optional; without Flask-Migrate the app
+    # falls back to db.create_all() + create_missing_indexes()
+    from flask_migrate import Migrate, upgrade as migrate_upgrade, stamp as migrate_stamp
+except ImportError:
+    Migrate = None
 
 from config import Config
 from models import (
     db, User, Doctor, DoctorSchedule,
-    Booking, Prescription, Notification, Notification_win
+    Booking, Prescription, Notification,
+    AnalysisJob, create_missing_indexes, configure_database
 )
 
 # offline AI
-from whisper_stt_processor import transcribe_audio_whisper
-from tinyllama_client import tinyllama_chat
-from tts_engine import synthesize_to_wav
+from whisper_stt_processor import (
+    transcribe_audio_bytes,
+    get_backend as get_whisper_backend
+)
+from stt_stream import stt_streams, TooManyStreams, SAMPLE_RATE as STT_SAMPLE_RATE
+from tinyllama_client import (
+    tinyllama_chat, tinyllama_stream, stream_stats,
+    get_backend as get_llama_backend,
+    get_cache as get_llama_cache,
+    ERROR_REPLIES as LLAMA_ERROR_REPLIES
+)
+from tts_engine import tts, synthesize_to_wav, TTSError
+
+from booking_status import status_engine
+from availability import availability, department_free_slots
+from directory_cache import directory
+from identity_cache import identity, full_user
+from reservation import (
+    reserve_booking, reassign_booking, bulk_cancel, bulk_transfer, BUSY_REASON
+)
+from notifications import mark_read
+from push import push, TooManyConnections
+from jobs import jobs, QueueFull, JobError
+from services import services
+from metrics import metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from admission import admission, Overloaded
+from spoken_dates import spoken_dates
+from dashboard_data import (
+    doctor_directory, user_bookings, doctor_bookings,
+    admin_bookings, admin_users, unread_notifications, BadCursor,
+    bookings_page, doctors_page,
+    booking_to_dict, user_to_dict, doctor_to_dict
+)
 
 # =========================
 # APP INIT
@@ -28,44 +69,41 @@ from tts_engine import synthesize_to_wav
 app = Flask(__name__)
 app.config.from_object(Config)
 
-db.init_app(app)
+configure_database(app)
+
+# Alembic migrations (migrations/), run with "flask db upgrade"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+BASELINE_REVISION = "96fdb1d6021c"
+if Migrate is not None:
+    Migrate(app, db, directory=MIGRATIONS_DIR)
 
 login_manager = LoginManager()
 login_manager.login_view = "login"
 login_manager.init_app(app)
 
+# TTS pool workers re-import this module on spawn platforms; they only
+# render audio, so the booking status engine stays in the main process
+if multiprocessing.parent_process() is not None:
+    app.config["BOOKING_STATUS_ENGINE"] = False
+
+status_engine.init_app(app)
+availability.init_app(app)
+directory.init_app(app)
+identity.init_app(app)
+jobs.init_app(app)
+stt_streams.init_app(app)
+tts.init_app(app)
+services.init_app(app)
+push.init_app(app)
+metrics.init_app(app)
+admission.init_app(app)
+spoken_dates.init_app(app)
+
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-
-# =========================
-# AUTO BOOKING STATUS UPDATE
-# =========================
-def update_booking_status():
-    now = datetime.now()
-
-    # booked → ongoing
-    booked = Booking.query.filter(
-        Booking.status == "booked",
-        Booking.start_time <= now,
-        Booking.end_time > now
-    ).all()
-
-    for b in booked:
-        b.status = "ongoing"
-
-    # ongoing → completed
-    completed = Booking.query.filter(
-        Booking.status.in_(["booked", "ongoing"]),
-        Booking.end_time <= now
-    ).all()
-
-    for b in completed:
-        b.status = "completed"
-
-    db.session.commit()
+    # cached (id, role, username) snapshot; full_user() for the rest
+    return identity.load(user_id)
 
 
 # =========================
@@ -141,39 +179,37 @@ def user_dashboard():
     if current_user.role != "user":
         return redirect("/")
 
-    update_booking_status()
+    doctors = doctor_directory()
 
-    doctors = Doctor.query.all()
-    
-    bookings = Booking.query.filter_by(
-        user_id=current_user.id
-    ).order_by(Booking.start_time.desc()).all()
+    try:
+        bookings, next_cursor = user_bookings(
+            current_user.id,
+            cursor=request.args.get("after"),
+            limit=Config.DASHBOARD_PAGE_SIZE
+        )
+    except BadCursor:
+        abort(400)
 
-    # --- NEW CODE: Fetch Notifications ---
-    # Ensure you have imported the Notification model
-    notifications = Notification_win.query.filter_by(
-        user_id=current_user.id, 
-        is_read=False
-    ).all()
+    notifications = unread_notifications(current_user.id)
 
     return render_template(
         "user_dashboard.html",
         doctors=doctors,
+        departments=directory.departments(),
         bookings=bookings,
+        next_cursor=next_cursor,
+        profile=full_user(),
         notifications=notifications  # <--- PASS THIS TO HTML
     )
 
 @app.route("/api/notifications/mark_read", methods=["POST"])
 @login_required
 def mark_notifications_read():
-    # Find all unread notifications for this user
-    unread_notifs = Notification_win.query.filter_by(user_id=current_user.id, is_read=False).all()
-    
-    for n in unread_notifs:
-        n.is_read = True  # Mark as read
-    
+    # one UPDATE for all of this user's unread notifications
+    marked = mark_read(current_user.id)
+
     db.session.commit()
-    return jsonify(success=True)
+    return jsonify(success=True, marked=marked)
 # =========================
 # ADMIN DASHBOARD
 # =========================
@@ -183,16 +219,179 @@ def admin_dashboard():
     if current_user.role != "admin":
         return redirect("/")
 
-    update_booking_status()
+    try:
+        users, users_next = admin_users(
+            cursor=request.args.get("users_after"),
+            limit=Config.DASHBOARD_PAGE_SIZE
+        )
+        bookings, bookings_next = admin_bookings(
+            cursor=request.args.get("bookings_after"),
+            limit=Config.DASHBOARD_PAGE_SIZE
+        )
+    except BadCursor:
+        abort(400)
 
     return render_template(
         "admin_dashboard.html",
-        doctors=Doctor.query.all(),
-        users=User.query.all(),
-        bookings=Booking.query.order_by(Booking.start_time.desc()).all()
+        doctors=doctor_directory(),
+        users=users,
+        users_next=users_next,
+        bookings=bookings,
+        bookings_next=bookings_next
     )
 
 
+# =========================
+# ADMIN STATS
+# =========================
+@app.route("/api/admin/stats")
+@login_required
+def admin_stats():
+    if current_user.role != "admin":
+        return jsonify(success=False), 403
+
+    return jsonify(
+        success=True,
+        booking_status=status_engine.stats(),
+        llama=get_llama_backend().stats(),
+        llama_stream=stream_stats(),
+        llama_cache=get_llama_cache().stats(),
+        directory=directory.stats(),
+        identity=identity.stats(),
+        whisper=get_whisper_backend().stats(),
+        stt_stream=stt_streams.stats(),
+        tts=tts.stats(),
+        services=services.stats(),
+        admission=admission.stats(),
+        spoken_dates=spoken_dates.stats(),
+        push=push.stats(),
+        jobs=jobs.stats()
+    )
+
+
+# =========================
+# METRICS (PROMETHEUS)
+# =========================
+@app.route("/metrics")
+def metrics_export():
+    # local scrapers only (METRICS_ALLOWED_IPS), no login
+    if not metrics.allowed(request.remote_addr):
+        abort(404)
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+# =========================
+# LIST APIS (JSON, KEYSET PAGED)
+# =========================
+def _page_args():
+    limit = request.args.get("limit", Config.DASHBOARD_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, Config.API_MAX_PAGE_SIZE))
+    return request.args.get("cursor") or None, limit
+
+
+def _overloaded(e, **body):
+    """503 for a call refused by admission control (admission.py)."""
+    res = jsonify(body)
+    res.headers["Retry-After"] = str(e.retry_after)
+    return res, 503
+
+
+def _parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+def json_page(items, next_cursor):
+    """
+    Page response with an ETag; a client sending If-None-Match for an
+    unchanged page gets an empty 304.
+    """
+    res = jsonify(items=items, next_cursor=next_cursor)
+    res.cache_control.private = True
+    res.cache_control.no_cache = True
+    res.add_etag()
+    return res.make_conditional(request)
+
+
+@app.route("/api/bookings")
+@login_required
+def api_bookings():
+    """
+    Bookings visible to the caller, ordered by (start_time, id).
+    ?cursor= &limit= &status=booked,ongoing &doctor_id= &order=asc|desc
+    &date_from=YYYY-MM-DD &date_to=YYYY-MM-DD (inclusive)
+    """
+    cursor, limit = _page_args()
+
+    if current_user.role == "doctor":
+        doctor = directory.by_user(current_user.id)
+        if doctor is None:
+            abort(404)
+        scope = dict(doctor_id=doctor.id, with_user=True, with_prescription=True)
+    elif current_user.role == "admin":
+        scope = dict(doctor_id=request.args.get("doctor_id", type=int),
+                     with_user=True, with_doctor=True)
+    else:
+        scope = dict(user_id=current_user.id,
+                     doctor_id=request.args.get("doctor_id", type=int),
+                     with_doctor=True)
+
+    try:
+        date_from = _parse_day(request.args.get("date_from"))
+        date_to = _parse_day(request.args.get("date_to"))
+        if date_to:
+            date_to += timedelta(days=1)
+
+        rows, next_cursor = bookings_page(
+            statuses=[s for s in request.args.get("status", "").split(",") if s],
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            limit=limit,
+            descending=request.args.get("order", "desc") != "asc",
+            **scope
+        )
+    except ValueError:   # bad date or cursor
+        return jsonify(success=False, message="Invalid filter or cursor"), 400
+
+    with_flags = {k: v for k, v in scope.items() if k.startswith("with_")}
+    return json_page([booking_to_dict(b, **with_flags) for b in rows], next_cursor)
+
+
+@app.route("/api/doctors")
+@login_required
+def api_doctors():
+    cursor, limit = _page_args()
+    try:
+        rows, next_cursor = doctors_page(
+            cursor=cursor,
+            limit=limit,
+            department=request.args.get("department")
+        )
+    except BadCursor:
+        return jsonify(success=False, message="Invalid cursor"), 400
+
+    return json_page([doctor_to_dict(d) for d in rows], next_cursor)
+
+
+@app.route("/api/admin/users")
+@login_required
+def api_admin_users():
+    if current_user.role != "admin":
+        return jsonify(success=False), 403
+
+    cursor, limit = _page_args()
+    try:
+        rows, next_cursor = admin_users(
+            cursor=cursor,
+            limit=limit,
+            role=request.args.get("role")
+        )
+    except BadCursor:
+        return jsonify(success=False, message="Invalid cursor"), 400
+
+    return json_page([user_to_dict(u) for u in rows], next_cursor)
+
+
 # =========================
 # ADMIN ADD DOCTOR
 # =========================
@@ -223,6 +422,7 @@ def admin_add_doctor():
     db.session.add(doctor)
     db.session.commit()
 
+    directory.invalidate()
     return jsonify(success=True, message="Doctor added")
 
 
@@ -236,26 +436,32 @@ def doctor_dashboard():
     if current_user.role != "doctor":
         return redirect("/")
 
-    # 2. Update status of old bookings (optional helper function)
-    update_booking_status()
-
-    # 3. Get the current Doctor profile
-    doctor = Doctor.query.filter_by(
-        user_id=current_user.id
-    ).first_or_404()
+    # 2. Get the current Doctor profile from the directory cache
+    #    (statuses are kept up to date by the background status engine)
+    doctor = directory.by_user(current_user.id)
+    if doctor is None:
+        abort(404)
 
-    # 4. Get bookings for THIS doctor
-    bookings = Booking.query.filter_by(
-        doctor_id=doctor.id
-    ).order_by(Booking.start_time).all()
+    # 3. Get bookings for THIS doctor (patient names and prescriptions
+    #    are loaded with the page, not one query per card)
+    try:
+        bookings, next_cursor, earlier_cursor = doctor_bookings(
+            doctor.id,
+            cursor=request.args.get("after"),
+            limit=Config.DASHBOARD_PAGE_SIZE
+        )
+    except BadCursor:
+        abort(400)
 
-    # 5. --- NEW: Get ALL doctors for the Transfer Popup ---
-    all_doctors = Doctor.query.all()
+    # 4. --- NEW: Get ALL doctors for the Transfer Popup ---
+    all_doctors = doctor_directory()
 
     return render_template(
         "doctor_dashboard.html",
         doctor=doctor,
         bookings=bookings,
+        next_cursor=next_cursor,
+        earlier_cursor=earlier_cursor,
         all_doctors=all_doctors  # <--- Pass this to the HTML!
     )
 
@@ -268,9 +474,7 @@ def doctor_add_schedule():
     if current_user.role != "doctor":
         return jsonify(success=False), 403
 
-    doctor = Doctor.query.filter_by(
-        user_id=current_user.id
-    ).first()
+    doctor = directory.by_user(current_user.id)
 
     data = request.json
     start = datetime.fromisoformat(data["start_time"])
@@ -288,6 +492,8 @@ def doctor_add_schedule():
     )
     db.session.commit()
 
+    availability.add_schedule(doctor.id, start, end)
+
     return jsonify(success=True, message="Schedule added")
 
 
@@ -304,26 +510,103 @@ def check_slot():
     )
     end = start + timedelta(minutes=30)
 
-    free = DoctorSchedule.query.filter(
-        DoctorSchedule.doctor_id == int(data["doctor_id"]),
-        DoctorSchedule.start_time <= start,
-        DoctorSchedule.end_time >= end
-    ).first()
+    available, reason = availability.is_free(
+        int(data["doctor_id"]), start, end
+    )
 
-    if not free:
-        return jsonify(available=False, reason="Doctor not available")
+    if not available:
+        return jsonify(available=False, reason=reason)
 
-    clash = Booking.query.filter(
-        Booking.doctor_id == int(data["doctor_id"]),
-        Booking.status.in_(["booked", "ongoing"]),
-        Booking.start_time < end,
-        Booking.end_time > start
-    ).first()
+    return jsonify(available=True)
 
-    if clash:
-        return jsonify(available=False, reason="Already booked")
 
-    return jsonify(available=True)
+# =========================
+# FREE SLOTS (ONE DOCTOR)
+# =========================
+@app.route("/api/doctor/<int:doctor_id>/free_slots")
+@login_required
+def doctor_free_slots(doctor_id):
+    """
+    ?date=YYYY-MM-DD: every free slot of the doctor that day.
+    Otherwise the next ?n= free slots from now (default 5, at most 50).
+    Read from a fresh load of the doctor, so slots opened by another
+    worker are listed (and refreshes this worker's index).
+    """
+    if directory.get(doctor_id) is None:
+        return jsonify(success=False, message="Doctor not found"), 404
+
+    now = datetime.now()
+    if request.args.get("date"):
+        try:
+            day = datetime.strptime(request.args["date"], "%Y-%m-%d").date()
+        except ValueError:
+            return jsonify(success=False, message="Invalid date"), 400
+        slots = [s for s in availability.day_slots(doctor_id, day, fresh=True)
+                 if s[0] >= now]
+    else:
+        n = min(max(request.args.get("n", 5, type=int), 1), 50)
+        slots = availability.next_free_slots(doctor_id, after=now, n=n, fresh=True)
+
+    return jsonify(
+        success=True,
+        doctor_id=doctor_id,
+        slots=[s.strftime("%Y-%m-%d %H:%M") for s, _ in slots]
+    )
+
+
+# =========================
+# FREE SLOT SEARCH (DEPARTMENT)
+# =========================
+@app.route("/api/free_slots", methods=["POST"])
+@login_required
+def free_slots():
+    data = request.json or {}
+
+    department = (data.get("department") or "").strip()
+    if not department:
+        return jsonify(success=False, message="Department is required")
+
+    try:
+        date_from = datetime.strptime(data["date_from"], "%Y-%m-%d")
+        date_to = datetime.strptime(
+            data.get("date_to") or data["date_from"], "%Y-%m-%d"
+        )
+        slot_minutes = int(data.get("slot_minutes", Config.SLOT_MINUTES))
+    except (KeyError, ValueError):
+        return jsonify(success=False, message="Invalid date range")
+
+    if date_to < date_from or slot_minutes <= 0:
+        return jsonify(success=False, message="Invalid date range")
+
+    if (date_to - date_from).days >= Config.FREE_SLOT_MAX_DAYS:
+        return jsonify(
+            success=False,
+            message=f"Date range is limited to {Config.FREE_SLOT_MAX_DAYS} days"
+        )
+
+    # whole days; slots that already started are dropped below
+    range_end = date_to + timedelta(days=1)
+    now = datetime.now()
+
+    results = department_free_slots(
+        department, date_from, range_end, timedelta(minutes=slot_minutes)
+    )
+
+    return jsonify(
+        success=True,
+        doctors=[
+            {
+                "doctor_id": doctor.id,
+                "name": doctor.name,
+                "department": doctor.department,
+                "slots": [
+                    s.strftime("%Y-%m-%d %H:%M")
+                    for s, _ in slots if s >= now
+                ]
+            }
+            for doctor, slots in results
+        ]
+    )
 
 
 # =========================
@@ -342,45 +625,30 @@ def api_book():
     end_time = start_time + timedelta(minutes=30)
     doctor_id = int(data["doctor_id"])
 
-    # 🔒 RECHECK FREE SCHEDULE
-    free = DoctorSchedule.query.filter(
-        DoctorSchedule.doctor_id == doctor_id,
-        DoctorSchedule.start_time <= start_time,
-        DoctorSchedule.end_time >= end_time
-    ).first()
-
-    if not free:
-        return jsonify({
-            "success": False,
-            "message": "Doctor not available at that time"
-        })
-
-    # 🔒 RECHECK CONFLICT
-    conflict = Booking.query.filter(
-        Booking.doctor_id == doctor_id,
-        Booking.status == "booked",
-        Booking.start_time < end_time,
-        Booking.end_time > start_time
-    ).first()
-
-    if conflict:
+    # 🔒 the database decides, not the in-memory index: the index is per
+    # worker and may not have seen a schedule or booking made elsewhere
+    booking, reason = reserve_booking(
+        current_user.id,
+        doctor_id,
+        start_time,
+        end_time,
+        issue_description=data.get("issue_description", ""),
+        session_type=data.get("session_type", "offline")
+    )
+    if reason:
+        # refresh the index so check_slot agrees with the database
+        availability.invalidate(doctor_id)
+        message = {
+            "Doctor not available": "Doctor not available at that time",
+            "Already booked": "Slot already booked"
+        }.get(reason, reason)
         return jsonify({
             "success": False,
-            "message": "Slot already booked"
+            "message": message
         })
 
-    booking = Booking(
-        user_id=current_user.id,
-        doctor_id=doctor_id,
-        start_time=start_time,
-        end_time=end_time,
-        issue_description=data.get("issue_description", ""),
-        session_type=data.get("session_type", "offline"),
-        status="booked"
-    )
-
-    db.session.add(booking)
-    db.session.commit()
+    availability.add_booking(booking)
+    status_engine.schedule(start_time, end_time)
 
     return jsonify({
         "success": True,
@@ -410,6 +678,16 @@ def cancel_booking(bid):
     ))
     db.session.commit()
 
+    availability.remove_booking(booking)
+
+    doctor = directory.get(booking.doctor_id)
+    if doctor is not None:
+        push.publish(doctor.user_id, "booking", {
+            "booking_id": booking.id,
+            "status": "cancelled",
+            "message": f"Booking #{booking.id} was cancelled by the patient: {booking.cancel_reason}"
+        })
+
     return jsonify(success=True)
 
 
@@ -424,6 +702,14 @@ def doctor_cancel_booking(booking_id):
     booking.cancel_reason = reason  # Ensure your Database Model has this column
     
     db.session.commit()
+
+    availability.remove_booking(booking)
+
+    push.publish(booking.user_id, "booking", {
+        "booking_id": booking.id,
+        "status": "cancelled",
+        "message": f"Your booking on {booking.start_time.strftime('%d %b %Y %I:%M %p')} was cancelled: {reason}"
+    })
     return jsonify(success=True, message=f"Booking cancelled: {reason}")
 
 # =========================
@@ -435,21 +721,87 @@ def doctor_cancel_booking(booking_id):
 @app.route("/api/doctor/booking/<int:booking_id>/transfer", methods=["POST"])
 def transfer_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
-    old_doctor_name = booking.doctor.name # Get current doctor's name
-    new_doc_id = request.json.get("new_doctor_id")
-    
-    new_doctor = Doctor.query.get(new_doc_id)
-    booking.doctor_id = new_doc_id
-    
-    # Create notification for the user
-    msg = f"1 booking transferred from Dr. {old_doctor_name} to Dr. {new_doctor.name}."
-    new_notif = Notification_win(user_id=booking.user_id, message=msg)
-    
-    db.session.add(new_notif)
-    db.session.commit()
+    new_doctor = directory.get((request.json or {}).get("new_doctor_id"))
+    if new_doctor is None:
+        return jsonify(success=False, message="Doctor not found"), 404
+    if new_doctor.id == booking.doctor_id:
+        return jsonify(success=False, message="Invalid new doctor"), 400
+
+    # 🔒 same schedule / conflict check as /api/book, against the new doctor
+    result, reason = reassign_booking(booking.id, new_doctor.id)
+    if reason == BUSY_REASON:
+        res = jsonify(success=False, message=reason)
+        res.headers["Retry-After"] = "1"
+        return res, 503
+    if reason:
+        availability.invalidate(new_doctor.id)
+        return jsonify(success=False, message=reason)
+
+    availability.move_booking(booking, result["from_doctor_id"])
+
+    push.publish(result["user_id"], "booking", {
+        "booking_id": booking.id,
+        "status": result["status"],
+        "doctor_name": new_doctor.name,
+        "message": result["message"]
+    })
     return jsonify(success=True, message="Transferred successfully")
 
 
+# =========================
+# ADMIN BULK TRANSFER / CANCEL
+# =========================
+@app.route("/api/admin/doctor/<int:doctor_id>/bookings/bulk", methods=["POST"])
+@login_required
+def admin_bulk_bookings(doctor_id):
+    """
+    Transfer or cancel all booked appointments of a doctor between
+    date_from and date_to (inclusive days), notifying each patient once.
+    JSON: {action: "transfer" | "cancel", date_from, date_to,
+           new_doctor_id (transfer), reason (cancel)}
+    """
+    if current_user.role != "admin":
+        return jsonify(success=False), 403
+
+    data = request.json or {}
+    action = data.get("action")
+
+    if directory.get(doctor_id) is None:
+        return jsonify(success=False, message="Doctor not found"), 404
+
+    try:
+        date_from = _parse_day(data["date_from"])
+        date_to = _parse_day(data.get("date_to") or data["date_from"]) + timedelta(days=1)
+    except (KeyError, TypeError, ValueError):
+        return jsonify(success=False, message="Invalid date range"), 400
+    if date_to <= date_from:
+        return jsonify(success=False, message="Invalid date range"), 400
+
+    if action == "cancel":
+        reason = data.get("reason") or "Cancelled by the hospital"
+        result, error = bulk_cancel(doctor_id, date_from, date_to, reason)
+        affected = [doctor_id]
+    elif action == "transfer":
+        new_doctor = directory.get(data.get("new_doctor_id"))
+        if new_doctor is None or new_doctor.id == doctor_id:
+            return jsonify(success=False, message="Invalid new doctor"), 400
+        result, error = bulk_transfer(doctor_id, new_doctor.id, date_from, date_to)
+        affected = [doctor_id, new_doctor.id]
+    else:
+        return jsonify(success=False, message="Unknown action"), 400
+
+    if error:
+        return jsonify(success=False, message=error), 503
+
+    for d in affected:
+        availability.invalidate(d)
+
+    for user_id, message in result.pop("notices"):
+        push.publish(user_id, "notification", {"message": message})
+
+    return jsonify(success=True, **result)
+
+
 # =========================
 # STT (WHISPER)
 # =========================
@@ -461,13 +813,18 @@ def api_stt_whisper():
 
     f = request.files["audio"]
 
-    save_dir = os.path.join(Config.UPLOAD_FOLDER)
-    os.makedirs(save_dir, exist_ok=True)
-
-    audio_path = os.path.join(save_dir, "recording.wav")
-    f.save(audio_path)
+    # Werkzeug already buffers each upload in its own spooled temp file;
+    # read it into memory and hand the bytes to the backend so parallel
+    # dictations never share a path on disk
+    try:
+        audio_bytes = f.read()
+    finally:
+        f.close()
 
-    text, success = transcribe_audio_whisper(audio_path)
+    try:
+        text, success = transcribe_audio_bytes(audio_bytes)
+    except Overloaded as e:
+        return _overloaded(e, error="Speech recognition is busy, please try again")
 
     if not success:
         return jsonify({"error": text}), 500
@@ -475,6 +832,36 @@ def api_stt_whisper():
     return jsonify({"text": text})
 
 
+@app.route("/api/stt/stream", methods=["POST"])
+def api_stt_stream_start():
+    """
+    Open a streaming dictation. The client then POSTs raw 16-bit mono
+    PCM chunks to /api/stt/stream/<session_id> (?final=1 on the last).
+    Sessions are held in this process, so every chunk must reach the
+    same worker: deploy with one gunicorn worker (or sticky routing).
+    """
+    try:
+        session_id = stt_streams.open()
+    except TooManyStreams:
+        res = jsonify({"error": "Speech recognition is busy, please try again"})
+        res.headers["Retry-After"] = "2"
+        return res, 503
+
+    return jsonify({"session_id": session_id, "sample_rate": STT_SAMPLE_RATE})
+
+
+@app.route("/api/stt/stream/<session_id>", methods=["POST"])
+def api_stt_stream_chunk(session_id):
+    """One PCM chunk; 404 if the session is not in this worker."""
+    final = request.args.get("final") == "1"
+
+    result = stt_streams.feed(session_id, request.get_data(), final=final)
+    if result is None:
+        return jsonify({"error": "Unknown or expired stream"}), 404
+
+    return jsonify(result)
+
+
 # =========================
 # TTS
 # =========================
@@ -484,21 +871,85 @@ def api_tts():
     text = data.get("text", "").strip()
     if not text:
         return jsonify({"error": "No text"}), 400
-    filename = synthesize_to_wav(text)
+    try:
+        filename = synthesize_to_wav(text)
+    except Overloaded as e:
+        return _overloaded(e, error="Speech is busy, please try again")
+    except TTSError as e:
+        return jsonify({"error": str(e)}), 503
     audio_url = url_for("static", filename=f"tts/{filename}")
     return jsonify({"audio_url": audio_url})
 
 
+# =========================
+# PUSH (SERVER-SENT EVENTS)
+# =========================
+@app.route("/api/push/stream")
+@login_required
+def push_stream():
+    """
+    Live events for the logged-in user ("booking", "notification").
+    The stream ends after PUSH_MAX_STREAM_SECONDS and EventSource
+    reconnects by itself.
+    """
+    try:
+        sub = push.subscribe(current_user.id)
+    except TooManyConnections:
+        res = jsonify({"error": "Too many live connections"})
+        res.headers["Retry-After"] = "10"
+        return res, 503
+
+    return Response(
+        push.stream(sub),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 # =========================
 # AI CHAT
 # =========================
 @app.route("/api/tinyllama/assistant", methods=["POST"])
 def tinyllama_api():
-    reply = tinyllama_chat(
+    try:
+        reply = tinyllama_chat(
+            "You are a hospital assistant.",
+            request.json["message"]
+        )
+    except Overloaded as e:
+        return _overloaded(e, reply="Assistant is busy, please try again.")
+    return jsonify(reply=reply)
+
+
+@app.route("/api/tinyllama/assistant/stream", methods=["POST"])
+def tinyllama_stream_api():
+    events = tinyllama_stream(
         "You are a hospital assistant.",
         request.json["message"]
     )
-    return jsonify(reply=reply)
+
+    # admission happens before the first event: take it here, while a
+    # refusal can still be a 503
+    try:
+        first = next(events)
+    except Overloaded as e:
+        return _overloaded(e, reply="Assistant is busy, please try again.")
+
+    def sse():
+        for event, data in itertools.chain([first], events):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        stream_with_context(sse()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 # =========================
@@ -507,10 +958,8 @@ def tinyllama_api():
 @app.route("/api/parse_booking_time", methods=["POST"])
 @login_required
 def parse_time():
-    dt = dateparser.parse(
-        request.json["spoken"],
-        settings={"PREFER_DATES_FROM": "future"}
-    )
+    # regex fast path and memo first, dateparser for anything else
+    dt = spoken_dates.parse(request.json["spoken"])
     if not dt:
         return jsonify(ok=False)
 
@@ -521,36 +970,125 @@ def parse_time():
 def upload_scan_prescription():
     if 'prescription' not in request.files:
         return jsonify(success=False, message="No file uploaded")
-    
+
     file = request.files['prescription']
     booking_id = request.form.get('booking_id')
+    booking = Booking.query.get_or_404(int(booking_id))
     
     # Save the file
     filename = f"presc_{booking_id}_{file.filename}"
     filepath = os.path.join("static/uploads/prescriptions", filename)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
     file.save(filepath)
 
+    # Save record to DB; OCR + AI analysis run in the background job
+    new_presc = Prescription(
+        booking_id=booking.id,
+        doctor_id=booking.doctor_id,
+        image_path=filepath
+    )
+    db.session.add(new_presc)
+    db.session.flush()
+
+    try:
+        job = jobs.submit(
+            "prescription_analysis",
+            {"prescription_id": new_presc.id},
+            user_id=current_user.id
+        )
+    except QueueFull:
+        # backpressure: keep nothing of a refused upload
+        db.session.rollback()
+        os.remove(filepath)
+        return jsonify(
+            success=False,
+            message="Scanner is busy, please try again shortly."
+        ), 503, {"Retry-After": str(Config.JOB_RETRY_DELAY)}
+
+    db.session.commit()
+    jobs.notify()
+
+    return jsonify(success=True, job_id=job.id, status=job.status), 202
+
+
+@jobs.handler("prescription_analysis")
+def analyse_prescription(payload):
+    prescription = db.session.get(Prescription, payload["prescription_id"])
+
     # 1. Extract text from image (Using OCR)
-    # Placeholder: extracted_text = ocr_tool.extract(filepath)
+    # Placeholder: extracted_text = ocr_tool.extract(prescription.image_path)
     extracted_text = "Patient requires Amoxicillin 500mg twice a day for 5 days." 
 
     # 2. Send extracted text to TinyLlama for "Scanning" / Analysis
     prompt = f"Summarize and explain this medical prescription text clearly: {extracted_text}"
-    ai_analysis = tinyllama_chat("You are a medical assistant analyzer.", prompt)
+    # background work: wait for a llama slot longer than a request would,
+    # and retry the job later if even that is refused
+    try:
+        ai_analysis = tinyllama_chat(
+            "You are a medical assistant analyzer.", prompt,
+            wait=Config.LLAMA_TIMEOUT
+        )
+    except Overloaded as e:
+        raise JobError(str(e))
 
-    # 3. Save record to DB
-    new_presc = Prescription(booking_id=booking_id, image_path=filepath)
-    db.session.add(new_presc)
-    db.session.commit()
+    if ai_analysis in LLAMA_ERROR_REPLIES:
+        raise JobError(ai_analysis)
+
+    # 3. Store the analysis on the prescription
+    prescription.report_text = ai_analysis
+    return ai_analysis
+
+
+# =========================
+# JOB STATUS
+# =========================
+@app.route("/api/jobs/<int:job_id>")
+@login_required
+def job_status(job_id):
+    job = AnalysisJob.query.get_or_404(job_id)
+
+    if job.user_id != current_user.id and current_user.role != "admin":
+        abort(403)
+
+    # answers at once; the client polls (waiting here would hold a worker)
+    return jsonify(
+        success=True,
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        result=job.result,
+        error=job.error if job.status == "failed" else None
+    )
+
+# =========================
+# SCHEMA
+# =========================
+def init_schema():
+    """
+    Bring the schema up to date. With Flask-Migrate this runs the
+    Alembic migrations; a database created earlier by create_all()
+    (tables but no alembic_version) is stamped at the baseline first.
+    Must be called inside an app context.
+    """
+    if Migrate is None:
+        db.create_all()
+        create_missing_indexes()
+    else:
+        tables = db.inspect(db.engine).get_table_names()
+        if "user" in tables and "alembic_version" not in tables:
+            migrate_stamp(directory=MIGRATIONS_DIR, revision=BASELINE_REVISION)
+        migrate_upgrade(directory=MIGRATIONS_DIR)
+
+    # on a fresh database the engine was not started at import
+    status_engine.start_when_ready()
 
-    return jsonify(success=True, analysis=ai_analysis)
 
 # =========================
 # RUN
 # =========================
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        init_schema()
 
         if not User.query.filter_by(username="admin").first():
             db.session.add(User(
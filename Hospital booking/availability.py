@@ -0,0 +1,411 @@
+# availability.py
+#
+# In-memory availability index used by /api/check_slot and the
+# per-doctor free slot route. Each doctor gets a sorted list of free
+# windows (from DoctorSchedule) and a sorted list of busy intervals
+# (active Bookings), searched with bisect instead of two range queries
+# per request.
+#
+# The index is per worker and only as fresh as AVAILABILITY_INDEX_TTL,
+# so it never has the last word on a "no": a refusal from check_slot is
+# confirmed with slot_refusal() against the database, the per-doctor
+# free slot route reloads the doctor, and /api/book always lets
+# reserve_booking() check the database.
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from directory_cache import directory
+from models import db, DoctorSchedule, Booking
+
+# ================= CONFIG ================= #
+
+SLOT_MINUTES = 30
+
+# A doctor's index is rebuilt from the database after this many seconds,
+# so changes made by other worker processes are eventually picked up.
+DEFAULT_TTL = 300
+
+ACTIVE_STATUSES = ("booked", "ongoing")
+
+
+# ================= INTERVAL HELPERS ================= #
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping / touching (start, end) pairs.
+    Input does not need to be sorted.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(windows, busy):
+    """
+    Sweep both sorted lists once and return the parts of `windows`
+    not covered by `busy`. Windows must be merged; busy may overlap.
+    """
+    gaps = []
+    j = 0
+    for w_start, w_end in windows:
+        cursor = w_start
+
+        # skip busy intervals that end before this window
+        while j < len(busy) and busy[j][1] <= w_start:
+            j += 1
+
+        k = j
+        while k < len(busy) and busy[k][0] < w_end:
+            b_start, b_end = busy[k][0], busy[k][1]
+            if b_start > cursor:
+                gaps.append((cursor, b_start))
+            if b_end > cursor:
+                cursor = b_end
+            k += 1
+
+        if cursor < w_end:
+            gaps.append((cursor, w_end))
+    return gaps
+
+
+def chop_slots(gaps, length, range_start=None, range_end=None, limit=None):
+    """
+    Cut free gaps into back-to-back slots of `length`.
+    Returns a list of (start, end).
+    """
+    slots = []
+    for g_start, g_end in gaps:
+        if range_start is not None and g_start < range_start:
+            g_start = range_start
+        if range_end is not None and g_end > range_end:
+            g_end = range_end
+
+        t = g_start
+        while t + length <= g_end:
+            slots.append((t, t + length))
+            if limit is not None and len(slots) >= limit:
+                return slots
+            t += length
+    return slots
+
+
+# ================= PER DOCTOR ================= #
+
+class DoctorAvailability:
+    """
+    Sorted free windows + sorted busy intervals for one doctor.
+    Lookups are O(log n) via bisect; inserts keep the lists sorted.
+    """
+
+    def __init__(self, schedules=(), bookings=()):
+        self.windows = merge_intervals(schedules)
+        self.window_starts = [w[0] for w in self.windows]
+
+        # busy entries are (start, end, booking_id)
+        self.busy = sorted(bookings)
+        self.busy_starts = [b[0] for b in self.busy]
+        self.max_busy = max(
+            (b[1] - b[0] for b in self.busy), default=timedelta(0)
+        )
+
+        self.loaded_at = time.monotonic()
+
+    # ---------- queries ----------
+
+    def in_schedule(self, start, end):
+        i = bisect_right(self.window_starts, start) - 1
+        return i >= 0 and self.windows[i][1] >= end
+
+    def overlaps_booking(self, start, end):
+        # only bookings starting before `end` can overlap; walk back
+        # until they start too early to still be running at `start`
+        k = bisect_left(self.busy_starts, end) - 1
+        while k >= 0 and self.busy[k][0] > start - self.max_busy:
+            if self.busy[k][1] > start:
+                return True
+            k -= 1
+        return False
+
+    def is_free(self, start, end):
+        return self.in_schedule(start, end) and not self.overlaps_booking(start, end)
+
+    def free_slots(self, range_start, range_end, length, limit=None):
+        # windows that can intersect [range_start, range_end)
+        lo = max(bisect_right(self.window_starts, range_start) - 1, 0)
+        hi = bisect_left(self.window_starts, range_end)
+        windows = [
+            w for w in self.windows[lo:hi]
+            if w[1] > range_start
+        ]
+        if not windows:
+            return []
+
+        b_lo = max(
+            bisect_left(self.busy_starts, windows[0][0] - self.max_busy), 0
+        )
+        b_hi = bisect_left(self.busy_starts, windows[-1][1])
+        busy = self.busy[b_lo:b_hi]
+
+        gaps = subtract_intervals(windows, busy)
+        return chop_slots(gaps, length, range_start, range_end, limit)
+
+    # ---------- updates ----------
+
+    def add_window(self, start, end):
+        self.windows = merge_intervals(self.windows + [(start, end)])
+        self.window_starts = [w[0] for w in self.windows]
+
+    def add_booking(self, booking_id, start, end):
+        entry = (start, end, booking_id)
+        i = bisect_left(self.busy, entry)
+        if i < len(self.busy) and self.busy[i] == entry:
+            return  # already loaded from the database
+        self.busy.insert(i, entry)
+        self.busy_starts.insert(i, start)
+        if end - start > self.max_busy:
+            self.max_busy = end - start
+
+    def remove_booking(self, booking_id):
+        for i, entry in enumerate(self.busy):
+            if entry[2] == booking_id:
+                del self.busy[i]
+                del self.busy_starts[i]
+                return entry
+        return None
+
+
+# ================= DATABASE CHECK ================= #
+
+def slot_refusal(doctor_id, start, end, ignore_booking_id=None):
+    """
+    Why the doctor cannot take [start, end) according to the database
+    ("Doctor not available" / "Already booked"), or None if they can.
+    ignore_booking_id: a booking being moved, not counted against itself.
+    """
+    in_schedule = db.session.query(DoctorSchedule.id).filter(
+        DoctorSchedule.doctor_id == doctor_id,
+        DoctorSchedule.start_time <= start,
+        DoctorSchedule.end_time >= end
+    ).first()
+    if not in_schedule:
+        return "Doctor not available"
+
+    conflict = db.session.query(Booking.id).filter(
+        Booking.doctor_id == doctor_id,
+        Booking.status.in_(ACTIVE_STATUSES),
+        Booking.start_time < end,
+        Booking.end_time > start
+    )
+    if ignore_booking_id is not None:
+        conflict = conflict.filter(Booking.id != ignore_booking_id)
+    if conflict.first():
+        return "Already booked"
+    return None
+
+
+# ================= BULK SEARCH ================= #
+
+def department_free_slots(department, range_start, range_end, length):
+    """
+    Every free slot of every doctor in `department` between
+    range_start and range_end, computed from one bulk load of
+    schedules and bookings (no query per doctor or per slot).
+
+    Returns a list of (doctor, [(start, end), ...]); the doctors come
+    from the directory cache.
+    """
+    doctors = directory.in_department(department)
+    if not doctors:
+        return []
+    doctor_ids = [d.id for d in doctors]
+
+    schedule_rows = db.session.query(
+        DoctorSchedule.doctor_id,
+        DoctorSchedule.start_time,
+        DoctorSchedule.end_time
+    ).filter(
+        DoctorSchedule.doctor_id.in_(doctor_ids),
+        DoctorSchedule.start_time < range_end,
+        DoctorSchedule.end_time > range_start
+    ).all()
+
+    booking_rows = db.session.query(
+        Booking.doctor_id,
+        Booking.start_time,
+        Booking.end_time
+    ).filter(
+        Booking.doctor_id.in_(doctor_ids),
+        Booking.status.in_(ACTIVE_STATUSES),
+        Booking.start_time < range_end,
+        Booking.end_time > range_start
+    ).all()
+
+    # group rows per doctor
+    windows = {}
+    for doctor_id, start, end in schedule_rows:
+        windows.setdefault(doctor_id, []).append((start, end))
+
+    busy = {}
+    for doctor_id, start, end in booking_rows:
+        busy.setdefault(doctor_id, []).append((start, end))
+
+    results = []
+    for doctor in doctors:
+        merged = merge_intervals(windows.get(doctor.id, []))
+        gaps = subtract_intervals(merged, sorted(busy.get(doctor.id, [])))
+        results.append(
+            (doctor, chop_slots(gaps, length, range_start, range_end))
+        )
+    return results
+
+
+# ================= INDEX ================= #
+
+class AvailabilityIndex:
+    """
+    Process-level registry of DoctorAvailability objects.
+    Doctors are loaded lazily from the database on first use and
+    updated incrementally by the booking / schedule routes.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = DEFAULT_TTL
+        self.slot = timedelta(minutes=SLOT_MINUTES)
+        self._doctors = {}
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("AVAILABILITY_INDEX_TTL", DEFAULT_TTL)
+        self.slot = timedelta(
+            minutes=app.config.get("SLOT_MINUTES", SLOT_MINUTES)
+        )
+        app.extensions["availability"] = self
+
+    def _load(self, doctor_id):
+        schedules = [
+            (s.start_time, s.end_time)
+            for s in DoctorSchedule.query.filter_by(doctor_id=doctor_id)
+        ]
+        bookings = [
+            (b.start_time, b.end_time, b.id)
+            for b in Booking.query.filter(
+                Booking.doctor_id == doctor_id,
+                Booking.status.in_(ACTIVE_STATUSES)
+            )
+        ]
+        return DoctorAvailability(schedules, bookings)
+
+    def get(self, doctor_id, fresh=False):
+        """
+        Return the index for one doctor, (re)loading it if missing,
+        older than the TTL or fresh=True. Must be called inside an app
+        context. Only doctors in the directory are kept: the ids come
+        straight from requests.
+
+        The database load runs outside the lock: holding it while
+        waiting for a pooled connection can deadlock busy workers.
+        """
+        with self._lock:
+            doc = self._doctors.get(doctor_id)
+            if (doc is not None and not fresh
+                    and time.monotonic() - doc.loaded_at <= self.ttl):
+                return doc
+
+        doc = self._load(doctor_id)
+
+        if directory.get(doctor_id) is not None:
+            with self._lock:
+                self._doctors[doctor_id] = doc
+        return doc
+
+    def invalidate(self, doctor_id=None):
+        with self._lock:
+            if doctor_id is None:
+                self._doctors.clear()
+            else:
+                self._doctors.pop(doctor_id, None)
+
+    # ---------- queries ----------
+
+    def is_free(self, doctor_id, start, end):
+        """
+        Returns (available, reason) like the old check_slot logic.
+        A "yes" comes from the index; a "no" is confirmed with the
+        database, since another worker may have added a schedule or
+        cancelled a booking since this index was loaded.
+        """
+        doc = self.get(doctor_id)
+        with self._lock:
+            free = doc.is_free(start, end)
+        if free:
+            return True, None
+
+        reason = slot_refusal(doctor_id, start, end)
+        if reason is None:
+            self.invalidate(doctor_id)      # stale: reload on next use
+            return True, None
+        return False, reason
+
+    def next_free_slots(self, doctor_id, after=None, n=5, length=None,
+                        fresh=False):
+        after = after or datetime.now()
+        length = length or self.slot
+        doc = self.get(doctor_id, fresh)
+        with self._lock:
+            if not doc.windows:
+                return []
+            return doc.free_slots(after, doc.windows[-1][1], length, limit=n)
+
+    def day_slots(self, doctor_id, day, length=None, fresh=False):
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        length = length or self.slot
+        doc = self.get(doctor_id, fresh)
+        with self._lock:
+            return doc.free_slots(start, end, length)
+
+    # ---------- incremental updates ----------
+
+    def add_schedule(self, doctor_id, start, end):
+        with self._lock:
+            if doctor_id in self._doctors:
+                self._doctors[doctor_id].add_window(start, end)
+
+    # Booking attributes are read before taking the lock: after a commit
+    # they are expired, and refreshing them needs a pooled connection.
+
+    def add_booking(self, booking):
+        if booking.status not in ACTIVE_STATUSES:
+            return      # cancelled / completed bookings do not block slots
+        doctor_id = booking.doctor_id
+        entry = (booking.id, booking.start_time, booking.end_time)
+        with self._lock:
+            if doctor_id in self._doctors:
+                self._doctors[doctor_id].add_booking(*entry)
+
+    def remove_booking(self, booking):
+        booking_id, doctor_id = booking.id, booking.doctor_id
+        with self._lock:
+            if doctor_id in self._doctors:
+                self._doctors[doctor_id].remove_booking(booking_id)
+
+    def move_booking(self, booking, old_doctor_id):
+        booking_id = booking.id
+        with self._lock:
+            if old_doctor_id in self._doctors:
+                self._doctors[old_doctor_id].remove_booking(booking_id)
+        self.add_booking(booking)
+
+
+availability = AvailabilityIndex()
@@ -0,0 +1,13 @@
+# benchmarks/
+#
+# Standalone benchmark scripts. Run them from the "Hospital booking"
+# folder so the app modules are importable, e.g.
+#
+#     python -m benchmarks.booking_concurrency --requests 2000
+#
+# Each script points DATABASE_URL at a throwaway SQLite file before the
+# app is imported, so database.db is never touched. The exception is
+# datagen, which fills the database given with --database.
+#
+#     python -m benchmarks.datagen --database demo.db      # synthetic data
+#     python -m benchmarks.load_test --clients 16          # route load test
@@ -0,0 +1,180 @@
+# benchmarks/admission.py
+#
+# A burst of assistant requests against booking traffic, with admission
+# control (admission.py) off and on. The llama stub here does what
+# llama-cli does to the machine: every call starts a process that keeps
+# a core busy for --ai-seconds. Booking clients call /api/check_slot the
+# whole time; their latency shows how much CPU the burst left them.
+#
+#   on    the configured budgets; extra requests wait briefly or get 503
+#   off   no limits: every assistant request starts its own process
+#
+# "on" runs first, so its Retry-After estimates are not skewed by the
+# slow calls of the unlimited run.
+#
+#     python -m benchmarks.admission
+#     python -m benchmarks.admission --burst 24 --ai-seconds 2 --seconds 15
+
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import datagen, stubs
+from benchmarks.load_test import World, Client, percentile
+
+QUESTIONS = itertools.count()     # unique across runs, so nothing is cached
+BURN = "import time\nend = time.process_time() + {seconds}\nwhile time.process_time() < end: pass\n"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--burst", type=int, default=16,
+                        help="clients sending assistant requests back to back")
+    parser.add_argument("--bookers", type=int, default=4,
+                        help="clients calling /api/check_slot")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--ai-seconds", type=float, default=1.0,
+                        help="CPU time each llama call burns")
+    datagen.add_arguments(parser)
+    parser.set_defaults(patients=200, doctors=12, bookings=2000)
+    return parser.parse_args()
+
+
+class BurningLlamaBackend:
+    """FakeLlamaBackend answers, after a child process burns CPU."""
+
+    name = "burn"
+
+    def __init__(self, seconds):
+        from tinyllama_client import FakeLlamaBackend
+        self.seconds = seconds
+        self.answers = FakeLlamaBackend()
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def available(self):
+        return True
+
+    def generate(self, prompt, timeout):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            subprocess.run([sys.executable, "-c", BURN.format(seconds=self.seconds)],
+                           timeout=timeout, check=True)
+        finally:
+            with self._lock:
+                self.running -= 1
+        return self.answers.generate(prompt, timeout)
+
+    def stats(self):
+        return {"backend": self.name, "peak_processes": self.peak}
+
+
+def run(app, world, args):
+    clients = [Client(app, world, i, args.seed, args.bookers) for i in range(args.bookers)]
+    askers = [Client._login(app, world.patients[i % len(world.patients)])
+              for i in range(args.burst)]
+    result = {"booking_ms": [], "ok_ms": [], "ok": 0, "busy": 0,
+              "other": 0, "retry_after": []}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.seconds
+
+    def book(client):
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            client.check_slot()
+            with lock:
+                result["booking_ms"].append((time.perf_counter() - t0) * 1000)
+
+    def ask(session):
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            res = session.post("/api/tinyllama/assistant", json={
+                "message": f"Question number {next(QUESTIONS)}?"
+            })
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                if res.status_code == 200:
+                    result["ok"] += 1
+                    result["ok_ms"].append(elapsed)
+                elif res.status_code == 503:
+                    result["busy"] += 1
+                    result["retry_after"].append(int(res.headers["Retry-After"]))
+                else:
+                    result["other"] += 1
+            if res.status_code == 503:
+                # a well-behaved client honours Retry-After
+                time.sleep(min(float(res.headers["Retry-After"]),
+                               max(0.0, stop_at - time.perf_counter())))
+
+    threads = [threading.Thread(target=book, args=(c,)) for c in clients]
+    threads += [threading.Thread(target=ask, args=(s,)) for s in askers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return result
+
+
+def main():
+    args = parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="admission_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+    stubs.stub_environment()
+
+    from app import app, init_schema
+    from models import db
+    from admission import admission
+    import tinyllama_client
+
+    stubs.install(os.path.join(tmp, "tts"))
+
+    with app.app_context():
+        init_schema()
+        world = World(datagen.generate(db, args))
+
+    budgets = {name: (g["slots"], g["queue"], g["wait_s"])
+               for name, g in admission.stats()["backends"].items()}
+    ai_slots = admission.ai_slots
+    print(f"{os.cpu_count()} CPUs, llama budget {budgets['llama']} "
+          f"(slots, queue, wait s), {ai_slots} AI slots overall; "
+          f"{args.burst} assistant + {args.bookers} booking clients, {args.seconds:.0f}s")
+    print(f"{'admission':<11}{'booking p50':>12}{'p95':>8}{'p99':>8}"
+          f"{'ai ok':>8}{'ai p95':>9}{'503':>6}{'procs':>7}   (ms)")
+
+    for mode in ("on", "off"):
+        if mode == "off":
+            admission.configure("llama", args.burst, 0, 0)
+            admission.ai_slots = args.burst
+        else:
+            admission.configure("llama", *budgets["llama"])
+            admission.ai_slots = ai_slots
+        backend = BurningLlamaBackend(args.ai_seconds)
+        tinyllama_client.set_backend(backend)
+
+        result = run(app, world, args)
+        booking = result["booking_ms"]
+        print(f"{mode:<11}{percentile(booking, 50):>12.1f}{percentile(booking, 95):>8.1f}"
+              f"{percentile(booking, 99):>8.1f}{result['ok']:>8}"
+              f"{percentile(result['ok_ms'], 95):>9.0f}{result['busy']:>6}{backend.peak:>7}"
+              + (f"   ({result['other']} other errors)" if result["other"] else ""))
+        if mode == "on":
+            llama = admission.stats()["backends"]["llama"]
+            print(f"{'':<11}admitted {llama['admitted']} ({llama['queued']} after waiting), "
+                  f"refused {llama['rejected']}, peak queue {llama['peak_waiting']}")
+        if result["retry_after"]:
+            values = sorted(result["retry_after"])
+            print(f"{'':<11}Retry-After {values[0]}-{values[-1]} s, "
+                  f"median {values[len(values) // 2]} s")
+
+
+if __name__ == "__main__":
+    main()
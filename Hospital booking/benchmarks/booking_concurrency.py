@@ -0,0 +1,147 @@
+# benchmarks/booking_concurrency.py
+#
+# Fires thousands of simultaneous /api/book requests at the Flask test
+# client and checks that no doctor ends up with overlapping bookings.
+#
+#     python -m benchmarks.booking_concurrency --requests 5000 --threads 64
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--doctors", type=int, default=5)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--slots", type=int, default=16,
+                        help="30-minute slots per doctor")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+
+    tmp = tempfile.mkdtemp(prefix="booking_bench_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+
+    # import after DATABASE_URL is set
+    from app import app
+    from models import db, User, Doctor, DoctorSchedule
+
+    day = (datetime.now() + timedelta(days=7)).replace(
+        hour=9, minute=0, second=0, microsecond=0
+    )
+
+    with app.app_context():
+        db.create_all()
+
+        patients = [
+            User(username=f"patient{i}", email=f"p{i}@bench.local",
+                 password_hash="x", role="user")
+            for i in range(args.patients)
+        ]
+        db.session.add_all(patients)
+        db.session.flush()
+
+        doctor_ids = []
+        for i in range(args.doctors):
+            u = User(username=f"doctor{i}", email=f"d{i}@bench.local",
+                     password_hash="x", role="doctor")
+            db.session.add(u)
+            db.session.flush()
+            d = Doctor(user_id=u.id, name=f"Bench {i}", department="Bench")
+            db.session.add(d)
+            db.session.flush()
+            db.session.add(DoctorSchedule(
+                doctor_id=d.id,
+                start_time=day,
+                end_time=day + timedelta(minutes=30 * args.slots)
+            ))
+            doctor_ids.append(d.id)
+
+        patient_ids = [p.id for p in patients]
+        db.session.commit()
+
+    # every request targets a random doctor and a random (possibly
+    # misaligned) start time, so many of them overlap
+    jobs = []
+    for _ in range(args.requests):
+        offset = random.randrange(0, 30 * args.slots - 30, 15)
+        jobs.append((
+            random.choice(patient_ids),
+            random.choice(doctor_ids),
+            (day + timedelta(minutes=offset)).strftime("%Y-%m-%d %H:%M")
+        ))
+
+    local = threading.local()
+    start_barrier = threading.Barrier(min(args.threads, args.requests))
+    ready = threading.local()
+
+    def book(job):
+        user_id, doctor_id, booking_time = job
+
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        client = local.client
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+
+        if not getattr(ready, "done", False):
+            ready.done = True
+            start_barrier.wait()
+
+        res = client.post("/api/book", json={
+            "doctor_id": doctor_id,
+            "booking_time": booking_time
+        })
+        return res.status_code, (res.get_json() or {}).get("success", False)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(book, jobs))
+    elapsed = time.perf_counter() - t0
+
+    errors = sum(1 for code, _ in results if code != 200)
+    booked = sum(1 for _, ok in results if ok)
+
+    with app.app_context():
+        overlaps = db.session.execute(db.text("""
+            SELECT COUNT(*) FROM booking a
+            JOIN booking b
+              ON a.doctor_id = b.doctor_id
+             AND a.id < b.id
+             AND a.start_time < b.end_time
+             AND b.start_time < a.end_time
+            WHERE a.status IN ('booked', 'ongoing')
+              AND b.status IN ('booked', 'ongoing')
+        """)).scalar()
+
+    print(f"requests:        {len(results)}")
+    print(f"threads:         {args.threads}")
+    print(f"elapsed:         {elapsed:.2f}s")
+    print(f"requests/sec:    {len(results) / elapsed:.1f}")
+    print(f"bookings made:   {booked}")
+    print(f"bookings/sec:    {booked / elapsed:.1f}")
+    print(f"http errors:     {errors}")
+    print(f"overlaps:        {overlaps}")
+
+    if overlaps or errors:
+        print("FAIL")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# benchmarks/datagen.py
+#
+# Synthetic hospital data: patients, doctors across departments, weekday
+# DoctorSchedule windows, bookings in every status (completed / cancelled
+# in the past, ongoing now, booked / cancelled ahead), prescriptions and
+# notifications. The same --seed always produces the same rows.
+#
+# Rows are inserted with executemany and explicit ids, so the target must
+# be empty: an existing database is refused unless --reset is given,
+# which drops and recreates every table.
+#
+#     python -m benchmarks.datagen --database /tmp/demo.db
+#     python -m benchmarks.datagen --database database.db --reset \
+#         --patients 5000 --doctors 60 --bookings 100000
+#
+# Every generated account has the password "bench"; the admin is
+# "admin", patients "patient<N>", doctors "doctor<N>".
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+DEPARTMENTS = [
+    "Cardiology", "Dermatology", "ENT", "General Medicine", "Neurology",
+    "Orthopaedics", "Paediatrics", "Psychiatry",
+]
+ISSUES = [
+    "Checkup", "Fever and cough", "Back pain", "Follow-up visit",
+    "Skin rash", "Headache", "Chest pain", "Vaccination",
+]
+WINDOWS = [(9, 13), (14, 17)]      # daily schedule windows, hours
+SLOT = timedelta(minutes=30)
+PASSWORD = "bench"
+
+DEFAULTS = {
+    "patients": 1000,
+    "doctors": 40,
+    "bookings": 20000,
+    "past_days": 60,
+    "future_days": 30,
+    "notifications": 3,
+    "seed": 1,
+}
+
+
+def add_arguments(parser):
+    """Scale options, shared with the load test."""
+    parser.add_argument("--patients", type=int, default=DEFAULTS["patients"])
+    parser.add_argument("--doctors", type=int, default=DEFAULTS["doctors"])
+    parser.add_argument("--bookings", type=int, default=DEFAULTS["bookings"])
+    parser.add_argument("--past-days", type=int, default=DEFAULTS["past_days"],
+                        help="days of schedules and bookings before today")
+    parser.add_argument("--future-days", type=int, default=DEFAULTS["future_days"],
+                        help="days of schedules and bookings from today")
+    parser.add_argument("--notifications", type=int, default=DEFAULTS["notifications"],
+                        help="max popup notifications per patient")
+    parser.add_argument("--seed", type=int, default=DEFAULTS["seed"])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database", required=True,
+                        help="SQLite file to fill (created if missing)")
+    parser.add_argument("--reset", action="store_true",
+                        help="drop and recreate all tables first")
+    add_arguments(parser)
+    return parser.parse_args()
+
+
+# ================= GENERATOR ================= #
+
+def _windows(day):
+    """Schedule windows of one day, weekdays only."""
+    if day.weekday() >= 5:
+        return []
+    return [
+        (day.replace(hour=start), day.replace(hour=end))
+        for start, end in WINDOWS
+    ]
+
+
+def _status(start, now, rng):
+    if start + SLOT <= now:
+        return "completed" if rng.random() < 0.8 else "cancelled"
+    if start <= now:
+        return "ongoing"
+    return "booked" if rng.random() < 0.85 else "cancelled"
+
+
+def generate(db, scale, now=None):
+    """
+    Fill an empty database. scale: the DEFAULTS keys (argparse namespace
+    or dict). Returns the world a load test needs: ids by role, schedule
+    windows per doctor and the upcoming booked appointments.
+    """
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models import (
+        User, Doctor, DoctorSchedule, Booking, Prescription,
+        Notification, Notification_win
+    )
+
+    if isinstance(scale, dict):
+        scale = argparse.Namespace(**dict(DEFAULTS, **scale))
+    rng = random.Random(scale.seed)
+    now = (now or datetime.now()).replace(second=0, microsecond=0)
+    today = now.replace(hour=0, minute=0)
+    password_hash = generate_password_hash(PASSWORD)   # hashed once
+
+    # ---------- users and doctors ----------
+    users = [{"id": 1, "username": "admin", "email": "admin@bench.local",
+              "password_hash": password_hash, "role": "admin"}]
+    patient_ids = []
+    for i in range(scale.patients):
+        users.append({
+            "id": len(users) + 1, "username": f"patient{i}",
+            "email": f"patient{i}@bench.local", "phone": f"555{i:07d}",
+            "address": f"{i} Bench Street", "password_hash": password_hash,
+            "role": "user"
+        })
+        patient_ids.append(len(users))
+
+    doctors = []
+    for i in range(scale.doctors):
+        users.append({
+            "id": len(users) + 1, "username": f"doctor{i}",
+            "email": f"doctor{i}@bench.local", "password_hash": password_hash,
+            "role": "doctor"
+        })
+        doctors.append({
+            "id": i + 1, "user_id": len(users), "name": f"Bench {i}",
+            "department": DEPARTMENTS[i % len(DEPARTMENTS)],
+            "experience_years": rng.randint(1, 30)
+        })
+
+    # ---------- schedules ----------
+    days = [today + timedelta(days=d)
+            for d in range(-scale.past_days, scale.future_days)]
+    schedules = []
+    slots = {}                 # doctor id -> every 30-minute start
+    windows = {}               # doctor id -> [(start, end)]
+    for doctor in doctors:
+        slots[doctor["id"]] = []
+        windows[doctor["id"]] = []
+        for day in days:
+            for start, end in _windows(day):
+                schedules.append({
+                    "id": len(schedules) + 1, "doctor_id": doctor["id"],
+                    "start_time": start, "end_time": end
+                })
+                windows[doctor["id"]].append((start, end))
+                t = start
+                while t + SLOT <= end:
+                    slots[doctor["id"]].append(t)
+                    t += SLOT
+
+    # ---------- bookings (no overlaps per doctor) ----------
+    total_slots = sum(len(s) for s in slots.values())
+    if scale.bookings > total_slots:
+        raise SystemExit(
+            f"{scale.bookings} bookings do not fit in {total_slots} slots; "
+            "add --doctors or days"
+        )
+    per_doctor = [scale.bookings // len(doctors)] * len(doctors)
+    for i in range(scale.bookings % len(doctors)):
+        per_doctor[i] += 1
+
+    bookings = []
+    for doctor, count in zip(doctors, per_doctor):
+        taken = sorted(rng.sample(slots[doctor["id"]], min(count, len(slots[doctor["id"]]))))
+        for token, start in enumerate(taken, 1):
+            status = _status(start, now, rng)
+            bookings.append({
+                "id": len(bookings) + 1,
+                "user_id": rng.choice(patient_ids),
+                "doctor_id": doctor["id"],
+                "start_time": start,
+                "end_time": start + SLOT,
+                "session_type": rng.choice(["offline", "online"]),
+                "issue_description": rng.choice(ISSUES),
+                "status": status,
+                "cancel_reason": "Generated" if status == "cancelled" else None,
+                "token_number": token % 40 + 1,
+                "created_at": start - timedelta(days=rng.randint(1, 14))
+            })
+
+    prescribed = [
+        b for b in bookings if b["status"] == "completed" and rng.random() < 0.5
+    ]
+    prescriptions = [
+        {"id": i, "booking_id": b["id"], "doctor_id": b["doctor_id"],
+         "report_text": "Rest and fluids", "created_at": b["end_time"]}
+        for i, b in enumerate(prescribed, 1)
+    ]
+
+    # ---------- notifications ----------
+    popups = []
+    for user_id in patient_ids:
+        for _ in range(rng.randint(0, scale.notifications)):
+            popups.append({
+                "user_id": user_id,
+                "message": "1 booking transferred from Dr. Bench 0 to Dr. Bench 1.",
+                "is_read": rng.random() < 0.5,
+                "created_at": now - timedelta(hours=rng.randint(1, 500))
+            })
+    cancellations = [
+        {"user_id": b["user_id"], "title": "Booking Cancelled",
+         "message": b["cancel_reason"], "is_read": False,
+         "created_at": b["start_time"] - timedelta(days=1)}
+        for b in bookings if b["status"] == "cancelled"
+    ]
+
+    for model, rows in [
+        (User, users), (Doctor, doctors), (DoctorSchedule, schedules),
+        (Booking, bookings), (Prescription, prescriptions),
+        (Notification_win, popups), (Notification, cancellations),
+    ]:
+        for i in range(0, len(rows), 5000):
+            db.session.execute(insert(model), rows[i:i + 5000])
+    db.session.commit()
+
+    upcoming = [b for b in bookings if b["status"] == "booked"]
+    return {
+        "now": now,
+        "admin": 1,
+        "patients": patient_ids,
+        "doctors": {d["id"]: d for d in doctors},
+        "windows": windows,
+        "upcoming": [
+            (b["id"], b["user_id"], b["doctor_id"]) for b in upcoming
+        ],
+        "counts": {
+            "users": len(users), "doctors": len(doctors),
+            "schedules": len(schedules), "bookings": len(bookings),
+            "prescriptions": len(prescriptions),
+            "notifications": len(popups) + len(cancellations),
+            **{
+                status: sum(b["status"] == status for b in bookings)
+                for status in ("booked", "ongoing", "completed", "cancelled")
+            }
+        }
+    }
+
+
+# ================= CLI ================= #
+
+def main():
+    args = parse_args()
+    path = os.path.abspath(args.database)
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    os.environ.setdefault("LLAMA_BACKEND", "fake")
+    os.environ.setdefault("WHISPER_BACKEND", "stub")
+
+    from app import app, init_schema
+    from models import db, User
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+            db.session.execute(db.text("DROP TABLE IF EXISTS alembic_version"))
+            db.session.commit()
+        init_schema()
+        if db.session.query(User.id).first() is not None:
+            print(f"{path} already has users; use --reset to replace them")
+            sys.exit(1)
+
+        world = generate(db, args)
+
+    print(f"filled {path}")
+    for name, count in world["counts"].items():
+        print(f"  {name:<14}{count:>8}")
+    print(f'log in as "admin", "patient0" or "doctor0" with password "{PASSWORD}"')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/identity_loader.py
+#
+# SQL statements and latency per request for frequent login_required
+# routes, with the flask_login user loader uncached (one user SELECT per
+# request, as before identity_cache.py) and cached. Ends by checking
+# that a role change is seen on the very next request.
+#
+#     python -m benchmarks.identity_loader
+#     python -m benchmarks.identity_loader --requests 500
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.query_budget import QueryCounter, seed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per route and mode")
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=300)
+    parser.add_argument("--bookings", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def routes(ids):
+    slot = ids["day"].strftime("%Y-%m-%d %H:%M")
+    return [
+        ("POST /api/check_slot", lambda c: c.post("/api/check_slot", json={
+            "doctor_id": ids["doctor_id"], "booking_time": slot})),
+        ("POST /api/parse_booking_time", lambda c: c.post(
+            "/api/parse_booking_time", json={"spoken": "tomorrow at 10 am"})),
+        ("GET /api/bookings", lambda c: c.get("/api/bookings?limit=20")),
+        ("POST /api/notifications/mark_read", lambda c: c.post(
+            "/api/notifications/mark_read")),
+        ("GET /user/dashboard", lambda c: c.get("/user/dashboard")),
+    ]
+
+
+def main():
+    args = parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="identity_loader_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+    os.environ.setdefault("LLAMA_BACKEND", "fake")
+    os.environ.setdefault("WHISPER_BACKEND", "stub")
+
+    from app import app
+    from models import (
+        db, User, Doctor, Booking, Prescription, Notification_win
+    )
+    from identity_cache import identity
+
+    day = (datetime.now() + timedelta(days=3)).replace(
+        hour=10, minute=0, second=0, microsecond=0
+    )
+    with app.app_context():
+        db.create_all()
+        logins = seed(args, db, User, Doctor, Booking, Prescription,
+                      Notification_win)
+        ids = {"day": day, "doctor_id": Doctor.query.first().id}
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(logins["user"])
+        sess["_fresh"] = True
+
+    # warm the doctor directory, availability index and date parser
+    for _, call in routes(ids):
+        call(client)
+
+    cached_size = identity.max_size
+    results = {}
+    for mode, size in [("uncached", 0), ("cached", cached_size)]:
+        identity.max_size = size
+        identity.invalidate()
+        for label, call in routes(ids):
+            counts, times = [], []
+            for _ in range(args.requests):
+                with counter:
+                    t0 = time.perf_counter()
+                    res = call(client)
+                    times.append((time.perf_counter() - t0) * 1000)
+                if res.status_code != 200:
+                    raise SystemExit(f"{label}: HTTP {res.status_code}")
+                counts.append(counter.count)
+            results[mode, label] = (sum(counts) / len(counts), times)
+
+    print(f"{args.requests} requests per route, logged in as a patient")
+    print(f"{'route':<36}{'SQL before':>11}{'SQL after':>10}"
+          f"{'p50 before':>12}{'p50 after':>11}{'p95 before':>12}{'p95 after':>11}   (ms)")
+    for label, _ in routes(ids):
+        before_sql, before = results["uncached", label]
+        after_sql, after = results["cached", label]
+        print(f"{label:<36}{before_sql:>11.2f}{after_sql:>10.2f}"
+              f"{percentile(before, 50):>12.2f}{percentile(after, 50):>11.2f}"
+              f"{percentile(before, 95):>12.2f}{percentile(after, 95):>11.2f}")
+    print("identity cache:", identity.stats())
+
+    # a role change must not wait for the TTL
+    with app.app_context():
+        user = db.session.get(User, logins["user"])
+        user.role = "doctor"
+        db.session.commit()
+    res = client.get("/user/dashboard")
+    seen = res.status_code == 302
+    print("role change seen on next request:", "yes" if seen else "NO")
+    if not seen:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/llama_backends.py
+#
+# Latency / throughput of the TinyLLaMA backends: the old llama-cli
+# spawn per call versus the warm llama-server pool.
+#
+#     python -m benchmarks.llama_backends --requests 20 --concurrency 2
+#     python -m benchmarks.llama_backends --fake      # no binaries needed
+#
+# --fake only exercises this script: both rows are FakeLlamaBackend
+# sleeping for the --load-delay / --gen-delay it was given, so their
+# numbers restate those delays and say nothing about the real backends.
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tinyllama_client import (
+    SpawnBackend, ServerPoolBackend, FakeLlamaBackend, build_prompt
+)
+
+PROMPTS = [
+    "What are the visiting hours?",
+    "How do I book an appointment?",
+    "Ask only the patient's name.",
+    "Ask booking date and time. Example: 10 December 12 PM.",
+    "Ask whether the session is online or offline.",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--timeout", type=int, default=120)
+    parser.add_argument("--fake", action="store_true",
+                        help="simulate model load / generation times")
+    parser.add_argument("--load-delay", type=float, default=2.0,
+                        help="simulated model load (seconds, --fake)")
+    parser.add_argument("--gen-delay", type=float, default=0.3,
+                        help="simulated generation (seconds, --fake)")
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def run(backend, args):
+    prompts = [
+        build_prompt("You are a hospital assistant.", PROMPTS[i % len(PROMPTS)])
+        for i in range(args.requests)
+    ]
+
+    def one(prompt):
+        t0 = time.perf_counter()
+        backend.generate(prompt, timeout=args.timeout)
+        return time.perf_counter() - t0
+
+    # warm-up (starts the server pool; not timed)
+    backend.generate(prompts[0], timeout=args.timeout)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = list(pool.map(one, prompts))
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "mean": statistics.mean(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "rps": len(latencies) / elapsed,
+    }
+
+
+def main():
+    args = parse_args()
+
+    if args.fake:
+        backends = [
+            ("spawn (sim)", FakeLlamaBackend(
+                args.gen_delay, args.load_delay, reload_each_call=True)),
+            ("server (sim)", FakeLlamaBackend(
+                args.gen_delay, args.load_delay)),
+        ]
+    else:
+        backends = [
+            ("spawn", SpawnBackend()),
+            ("server", ServerPoolBackend(workers=args.concurrency)),
+        ]
+
+    if args.fake:
+        print(f"SIMULATION: sleep stubs ({args.load_delay}s load, {args.gen_delay}s "
+              "generation), not a measurement of llama-cli or llama-server")
+    print(f"{'backend':<16}{'mean':>9}{'p50':>9}{'p95':>9}{'req/s':>9}")
+    for name, backend in backends:
+        if not backend.available():
+            print(f"{name:<16}  skipped (binary or model not found)")
+            continue
+        r = run(backend, args)
+        print(f"{name:<16}{r['mean']:>8.2f}s{r['p50']:>8.2f}s"
+              f"{r['p95']:>8.2f}s{r['rps']:>9.2f}")
+        if isinstance(backend, ServerPoolBackend):
+            backend.pool.stop()
+
+
+if __name__ == "__main__":
+    main()
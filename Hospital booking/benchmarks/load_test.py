@@ -0,0 +1,373 @@
+# benchmarks/load_test.py
+#
+# Reproducible load test over the real Flask routes. A synthetic
+# hospital (benchmarks/datagen.py) is generated into a throwaway SQLite
+# file, the AI backends are swapped for deterministic stubs
+# (benchmarks/stubs.py), and --clients concurrent clients run a weighted
+# mix of scenarios for --seconds. Each client is a patient, a doctor and
+# the admin at once, all logged in through the session.
+#
+# Reports count, throughput and p50/p95/p99 latency per scenario.
+# "errors" are HTTP >= 400 or exceptions; "rejected" are handled
+# refusals such as a taken slot ({"success": false}).
+#
+#     python -m benchmarks.load_test
+#     python -m benchmarks.load_test --clients 32 --seconds 30
+#     python -m benchmarks.load_test --mix check_slot=5,book=2,assistant=1
+#     python -m benchmarks.load_test --json results.json
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import datagen, stubs
+
+# scenario -> weight; the AI scenarios hit the stubs and are off by default
+DEFAULT_MIX = {
+    "user_dashboard": 3,
+    "doctor_dashboard": 2,
+    "admin_dashboard": 1,
+    "check_slot": 6,
+    "book": 3,
+    "cancel": 1,
+    "transfer": 1,
+    "mark_read": 2,
+    "parse_time": 0,
+    "assistant": 0,
+    "tts": 0,
+}
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    if text:
+        mix = {name: 0 for name in DEFAULT_MIX}
+        for part in text.split(","):
+            name, _, weight = part.partition("=")
+            name = name.strip()
+            if name not in mix:
+                raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+            mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3,
+                        help="seconds run before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="name=weight,... (only the listed scenarios run)")
+    parser.add_argument("--ai-delay", type=float, default=0.0,
+                        help="simulated llama / whisper time in seconds")
+    parser.add_argument("--json", help="also write the results here")
+    datagen.add_arguments(parser)
+    parser.set_defaults(patients=500, doctors=24, bookings=8000)
+    return parser.parse_args()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# ================= SHARED STATE ================= #
+
+class World:
+    """
+    Generated ids plus the upcoming bookings still available to cancel
+    or transfer, handed out once each across all clients.
+    """
+
+    def __init__(self, generated):
+        self.now = generated["now"]
+        self.admin = generated["admin"]
+        self.patients = generated["patients"]
+        self.doctors = generated["doctors"]
+        self.windows = generated["windows"]
+        self.by_department = {}
+        for doctor in self.doctors.values():
+            self.by_department.setdefault(doctor["department"], []).append(doctor["id"])
+
+        self._lock = threading.Lock()
+        self._by_patient = {}
+        self._by_doctor = {}
+        for booking_id, user_id, doctor_id in generated["upcoming"]:
+            self._by_patient.setdefault(user_id, []).append(booking_id)
+            self._by_doctor.setdefault(doctor_id, []).append(booking_id)
+        self._used = set()
+
+    def _take(self, ids):
+        with self._lock:
+            while ids:
+                booking_id = ids.pop()
+                if booking_id not in self._used:
+                    self._used.add(booking_id)
+                    return booking_id
+        return None
+
+    def take_for_patient(self, user_id):
+        return self._take(self._by_patient.get(user_id, []))
+
+    def take_for_doctor(self, doctor_id):
+        return self._take(self._by_doctor.get(doctor_id, []))
+
+    def future_slot(self, doctor_id, rng):
+        """A random 30-minute start inside one of the doctor's windows."""
+        ahead = [w for w in self.windows[doctor_id] if w[0] > self.now]
+        start, end = rng.choice(ahead)
+        steps = int((end - start) / datagen.SLOT)
+        return start + datagen.SLOT * rng.randrange(steps)
+
+
+# ================= SCENARIOS ================= #
+
+class Client:
+    """One virtual user: a patient, a doctor and the admin sessions."""
+
+    def __init__(self, app, world, number, seed, stride):
+        self.world = world
+        self.rng = random.Random(seed * 1000 + number)
+        self.number = number
+        self.stride = stride
+        self.patient = world.patients[number % len(world.patients)]
+        doctor_ids = sorted(world.doctors)
+        self.doctor = world.doctors[doctor_ids[number % len(doctor_ids)]]
+        self.sessions = {
+            "patient": self._login(app, self.patient),
+            "doctor": self._login(app, self.doctor["user_id"]),
+            "admin": self._login(app, world.admin),
+        }
+
+    @staticmethod
+    def _login(app, user_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+        return client
+
+    def _slot(self):
+        doctor_id = self.rng.choice(list(self.world.doctors))
+        return doctor_id, self.world.future_slot(doctor_id, self.rng)
+
+    # each returns (response or None if there was nothing to do)
+
+    def user_dashboard(self):
+        return self.sessions["patient"].get("/user/dashboard")
+
+    def doctor_dashboard(self):
+        return self.sessions["doctor"].get("/doctor/dashboard")
+
+    def admin_dashboard(self):
+        return self.sessions["admin"].get("/admin/dashboard")
+
+    def check_slot(self):
+        doctor_id, start = self._slot()
+        return self.sessions["patient"].post("/api/check_slot", json={
+            "doctor_id": doctor_id,
+            "booking_time": start.strftime("%Y-%m-%d %H:%M")
+        })
+
+    def book(self):
+        doctor_id, start = self._slot()
+        return self.sessions["patient"].post("/api/book", json={
+            "doctor_id": doctor_id,
+            "booking_time": start.strftime("%Y-%m-%d %H:%M"),
+            "issue_description": "Load test"
+        })
+
+    def _next_patient(self):
+        """This patient has nothing left to cancel: become another one."""
+        self.number += self.stride
+        self.patient = self.world.patients[self.number % len(self.world.patients)]
+        with self.sessions["patient"].session_transaction() as sess:
+            sess["_user_id"] = str(self.patient)
+
+    def cancel(self):
+        for _ in range(len(self.world.patients) // self.stride + 1):
+            booking_id = self.world.take_for_patient(self.patient)
+            if booking_id is not None:
+                break
+            self._next_patient()
+        else:
+            return None
+        return self.sessions["patient"].post(
+            f"/api/booking/{booking_id}/cancel", json={"reason": "Load test"}
+        )
+
+    def transfer(self):
+        peers = [
+            d for d in self.world.by_department[self.doctor["department"]]
+            if d != self.doctor["id"]
+        ]
+        booking_id = self.world.take_for_doctor(self.doctor["id"])
+        if booking_id is None or not peers:
+            return None
+        return self.sessions["doctor"].post(
+            f"/api/doctor/booking/{booking_id}/transfer",
+            json={"new_doctor_id": self.rng.choice(peers)}
+        )
+
+    def mark_read(self):
+        return self.sessions["patient"].post("/api/notifications/mark_read")
+
+    def parse_time(self):
+        hour = self.rng.randint(9, 16)
+        return self.sessions["patient"].post("/api/parse_booking_time", json={
+            "spoken": f"tomorrow at {hour}:00"
+        })
+
+    def assistant(self):
+        topic = self.rng.choice(datagen.ISSUES)
+        return self.sessions["patient"].post(
+            "/api/tinyllama/assistant", json={"message": f"What should I do about {topic}?"}
+        )
+
+    def tts(self):
+        return self.sessions["patient"].post("/api/tts", json={
+            "text": f"Your token number is {self.rng.randint(1, 40)}."
+        })
+
+
+def outcome(res):
+    if res.status_code >= 400:
+        return "error"
+    body = res.get_json(silent=True)
+    if isinstance(body, dict) and (
+        body.get("success") is False or body.get("ok") is False
+    ):
+        return "rejected"
+    return "ok"
+
+
+# ================= RUNNER ================= #
+
+def run(app, world, args):
+    names = [n for n, w in args.mix.items() if w > 0]
+    weights = [args.mix[n] for n in names]
+    if not names:
+        raise SystemExit("empty --mix")
+
+    results = {n: {"ms": [], "error": 0, "rejected": 0, "skipped": 0} for n in names}
+    lock = threading.Lock()
+    clients = [
+        Client(app, world, i, args.seed, args.clients) for i in range(args.clients)
+    ]
+    barrier = threading.Barrier(args.clients + 1)
+    timing = {}
+
+    def loop(client):
+        barrier.wait()
+        measure_from = timing["start"] + args.warmup
+        stop_at = measure_from + args.seconds
+        while True:
+            name = client.rng.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            if t0 >= stop_at:
+                return
+            try:
+                res = getattr(client, name)()
+                result = "skipped" if res is None else outcome(res)
+            except Exception as e:
+                print(f"{name}: {e!r}")
+                result = "error"
+            elapsed = (time.perf_counter() - t0) * 1000
+            if t0 < measure_from:
+                continue
+            with lock:
+                entry = results[name]
+                if result == "skipped":
+                    entry["skipped"] += 1
+                    continue
+                entry["ms"].append(elapsed)
+                if result != "ok":
+                    entry[result] += 1
+
+    threads = [threading.Thread(target=loop, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    timing["start"] = time.perf_counter()
+    barrier.wait()
+    for t in threads:
+        t.join()
+    return results
+
+
+def report(results, args, counts):
+    rows = []
+    print(f"{args.clients} clients, {args.seconds:.0f}s measured after "
+          f"{args.warmup:.0f}s warm-up; {counts['bookings']} bookings, "
+          f"{counts['users']} users, {counts['doctors']} doctors")
+    print(f"{'scenario':<18}{'count':>7}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}"
+          f"{'errors':>8}{'rejected':>10}   (ms)")
+    total = 0
+    for name, entry in results.items():
+        ms = entry["ms"]
+        total += len(ms)
+        row = {
+            "scenario": name,
+            "count": len(ms),
+            "rps": len(ms) / args.seconds,
+            "p50": percentile(ms, 50),
+            "p95": percentile(ms, 95),
+            "p99": percentile(ms, 99),
+            "errors": entry["error"],
+            "rejected": entry["rejected"],
+            "skipped": entry["skipped"],
+        }
+        rows.append(row)
+        print(f"{name:<18}{row['count']:>7}{row['rps']:>8.1f}{row['p50']:>8.1f}"
+              f"{row['p95']:>8.1f}{row['p99']:>8.1f}{row['errors']:>8}{row['rejected']:>10}"
+              + (f"   ({row['skipped']} skipped)" if row["skipped"] else ""))
+
+    everything = [v for entry in results.values() for v in entry["ms"]]
+    print(f"{'total':<18}{total:>7}{total / args.seconds:>8.1f}"
+          f"{percentile(everything, 50):>8.1f}{percentile(everything, 95):>8.1f}"
+          f"{percentile(everything, 99):>8.1f}")
+    return rows, total
+
+
+def main():
+    args = parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="load_test_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+    stubs.stub_environment()
+
+    from app import app, init_schema
+    from models import db
+
+    stubs.install(os.path.join(tmp, "tts"), ai_delay=args.ai_delay)
+
+    with app.app_context():
+        init_schema()
+        generated = datagen.generate(db, args)
+    world = World(generated)
+
+    results = run(app, world, args)
+    rows, total = report(results, args, generated["counts"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "args": {k: v for k, v in vars(args).items() if k != "json"},
+                "counts": generated["counts"],
+                "throughput": total / args.seconds,
+                "scenarios": rows
+            }, f, indent=2, default=str)
+
+    if any(row["errors"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/metrics_overhead.py
+#
+# Cost of the metrics instrumentation (metrics.py) on a cheap, frequent
+# route: the same requests with metrics off, sampled and fully on.
+#
+#     python -m benchmarks.metrics_overhead
+#     python -m benchmarks.metrics_overhead --requests 5000
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.query_budget import seed
+
+MODES = [("off", False, 0.0), ("sampled 10%", True, 0.1), ("all", True, 1.0)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="alternate the modes this many times")
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=300)
+    parser.add_argument("--bookings", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    args = parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="metrics_overhead_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+    os.environ.setdefault("LLAMA_BACKEND", "fake")
+    os.environ.setdefault("WHISPER_BACKEND", "stub")
+
+    from app import app
+    from models import db, User, Doctor, Booking, Prescription, Notification_win
+    from metrics import metrics
+
+    with app.app_context():
+        db.create_all()
+        logins = seed(args, db, User, Doctor, Booking, Prescription,
+                      Notification_win)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(logins["user"])
+        sess["_fresh"] = True
+    for _ in range(50):
+        client.get("/api/bookings?limit=20")
+
+    times = {label: [] for label, _, _ in MODES}
+    for _ in range(args.rounds):
+        for label, enabled, rate in MODES:
+            metrics.enabled, metrics.sample_rate = enabled, rate
+            for _ in range(args.requests // args.rounds):
+                t0 = time.perf_counter()
+                client.get("/api/bookings?limit=20")
+                times[label].append((time.perf_counter() - t0) * 1000)
+
+    base = sum(times["off"]) / len(times["off"])
+    print(f"GET /api/bookings?limit=20, {args.requests} requests per mode")
+    print(f"{'metrics':<14}{'mean':>8}{'p50':>8}{'p95':>8}{'overhead':>10}   (ms)")
+    for label, _, _ in MODES:
+        values = times[label]
+        mean = sum(values) / len(values)
+        print(f"{label:<14}{mean:>8.3f}{percentile(values, 50):>8.3f}"
+              f"{percentile(values, 95):>8.3f}{(mean - base) / base:>+10.1%}")
+
+
+if __name__ == "__main__":
+    main()
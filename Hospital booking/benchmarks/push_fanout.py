@@ -0,0 +1,180 @@
+# benchmarks/push_fanout.py
+#
+# Opens many /api/push/stream connections (several per user), publishes
+# events to random users and measures publish -> received latency and
+# how many connections the hub held.
+#
+#   local    events published in this process (direct fan-out)
+#   sqlite   events published by a second process and relayed through
+#            the SQLite broker (what other gunicorn workers see)
+#
+#     python -m benchmarks.push_fanout --users 200 --per-user 2
+#     python -m benchmarks.push_fanout --broker sqlite
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+STOP = "__bench_stop__"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--per-user", type=int, default=2,
+                        help="open streams per user (tabs / devices)")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500,
+                        help="events per second")
+    parser.add_argument("--broker", choices=["local", "sqlite"], default="local")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--publisher", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def publish_events(args, publish):
+    rng = random.Random(args.seed)
+    interval = 1.0 / args.rate
+    next_at = time.perf_counter()
+    for i in range(args.events):
+        publish(rng.randint(1, args.users), "notification",
+                {"message": f"bench {i}"})
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    for user_id in range(1, args.users + 1):
+        publish(user_id, "notification", {"message": STOP})
+
+
+def publisher(args):
+    """Child process: publish through the SQLite broker only."""
+    from push import SqliteBroker
+
+    broker = SqliteBroker(args.publisher)
+    broker._deliver = lambda message: None   # no local streams here
+
+    def publish(user_id, event, data):
+        broker.publish({"user_id": user_id, "event": event,
+                        "data": data, "ts": time.time()})
+
+    publish_events(args, publish)
+
+
+def main():
+    args = parse_args()
+    if args.publisher:
+        publisher(args)
+        return
+
+    tmp = tempfile.mkdtemp(prefix="push_bench_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+    os.environ["PUSH_BROKER"] = args.broker
+    os.environ.setdefault("LLAMA_BACKEND", "fake")
+    os.environ.setdefault("WHISPER_BACKEND", "stub")
+    broker_path = os.path.join(tmp, "push.sqlite")
+
+    from app import app
+    from config import Config
+    from models import db, User
+    from push import push, create_broker
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username=f"patient{i}", email=f"p{i}@bench.local",
+                 password_hash="x", role="user")
+            for i in range(args.users)
+        ])
+        db.session.commit()
+
+    connections = args.users * args.per_user
+    push.max_connections = max(push.max_connections, connections)
+    push.max_stream = 3600
+    if args.broker == "sqlite":
+        push.set_broker(create_broker({
+            "PUSH_BROKER": "sqlite",
+            "PUSH_BROKER_PATH": broker_path,
+            "PUSH_POLL_INTERVAL": Config.PUSH_POLL_INTERVAL
+        }))
+
+    latencies = []
+    received = [0]
+    lock = threading.Lock()
+    opened = threading.Barrier(connections + 1)
+
+    def reader(user_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+        res = client.get("/api/push/stream", buffered=False)
+        chunks = iter(res.response)
+        next(chunks)          # "retry:" line, the stream is subscribed
+        opened.wait()
+        try:
+            for chunk in chunks:
+                text = chunk.decode() if isinstance(chunk, bytes) else chunk
+                if not text.startswith("event:"):
+                    continue
+                data = json.loads(text.split("data: ", 1)[1])
+                if data["message"] == STOP:
+                    return
+                with lock:
+                    received[0] += 1
+                    latencies.append((time.time() - data["ts"]) * 1000)
+        finally:
+            res.close()
+
+    threads = [
+        threading.Thread(target=reader, args=(user_id,), daemon=True)
+        for user_id in range(1, args.users + 1)
+        for _ in range(args.per_user)
+    ]
+    for t in threads:
+        t.start()
+    opened.wait()
+    held = push.stats()["connections"]
+
+    t0 = time.perf_counter()
+    if args.broker == "local":
+        publish_events(args, push.publish)
+    else:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.push_fanout",
+             "--publisher", broker_path,
+             "--users", str(args.users), "--events", str(args.events),
+             "--rate", str(args.rate), "--seed", str(args.seed)],
+            check=True
+        )
+    for t in threads:
+        t.join(timeout=30)
+    elapsed = time.perf_counter() - t0
+
+    stats = push.stats()
+    print(f"broker:            {args.broker}")
+    print(f"connections:       {held} ({args.users} users × {args.per_user})")
+    print(f"events published:  {args.events}")
+    print(f"events received:   {received[0]}")
+    print(f"deliveries/sec:    {received[0] / elapsed:.0f}")
+    print(f"latency p50/p95/p99: {percentile(latencies, 50):.2f} / "
+          f"{percentile(latencies, 95):.2f} / {percentile(latencies, 99):.2f} ms")
+    print(f"dropped:           {stats['dropped']}")
+    print(f"open after run:    {stats['connections']}")
+
+
+if __name__ == "__main__":
+    main()
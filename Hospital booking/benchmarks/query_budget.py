@@ -0,0 +1,240 @@
+# benchmarks/query_budget.py
+#
+# Counts the SQL statements each dashboard / list API route issues and fails when a
+# route goes over its budget. The budgets do not depend on how many
+# bookings exist, so an N+1 (one SELECT per row) shows up immediately.
+#
+#     python -m benchmarks.query_budget
+#     python -m benchmarks.query_budget --bookings 20000 --verbose
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# (role, path) -> max statements. The doctor directory and the logged-in
+# user (identity_cache.py) are cached and loaded while the cursors are
+# collected, so they do not count here; the user dashboard still loads
+# the full user row for its profile form.
+BUDGETS = {
+    ("user", "/user/dashboard"): 3,
+    ("user", "/user/dashboard?after={user_after}"): 3,
+    ("doctor", "/doctor/dashboard"): 2,
+    ("doctor", "/doctor/dashboard?after={doctor_after}"): 2,
+    ("admin", "/admin/dashboard"): 2,
+    ("admin", "/admin/dashboard?bookings_after={bookings_after}"): 2,
+    ("user", "/api/bookings"): 1,
+    ("user", "/api/bookings?cursor={user_after}"): 1,
+    ("doctor", "/api/bookings?status=booked,completed"): 2,
+    ("doctor", "/api/bookings?order=asc&cursor={doctor_after}"): 2,
+    ("doctor", "/api/bookings?order=desc&cursor={doctor_earlier}"): 2,
+    ("admin", "/api/bookings?cursor={bookings_after}"): 1,
+    ("admin", "/api/admin/users?role=user"): 1,
+    ("user", "/api/doctors"): 0,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=300)
+    parser.add_argument("--bookings", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true",
+                        help="print every statement")
+    return parser.parse_args()
+
+
+class QueryCounter:
+    """
+    Counts statements executed on `engine` by the current thread only,
+    so background workers sharing the engine are not included.
+    """
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.engine = engine
+        self.statements = []
+        self._thread = None
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._thread == threading.get_ident():
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        self._thread = threading.get_ident()
+        return self
+
+    def __exit__(self, *exc):
+        self._thread = None
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+def seed(args, db, User, Doctor, Booking, Prescription, Notification_win,
+         page_size=None):
+    from config import Config
+
+    page_size = page_size or Config.DASHBOARD_PAGE_SIZE
+    random.seed(args.seed)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    admin = User(username="admin", email="admin@bench.local",
+                 password_hash="x", role="admin")
+    db.session.add(admin)
+
+    patients = [
+        User(username=f"patient{i}", email=f"p{i}@bench.local",
+             password_hash="x", role="user")
+        for i in range(args.patients)
+    ]
+    db.session.add_all(patients)
+    db.session.flush()
+
+    doctors = []
+    for i in range(args.doctors):
+        u = User(username=f"doctor{i}", email=f"d{i}@bench.local",
+                 password_hash="x", role="doctor")
+        db.session.add(u)
+        db.session.flush()
+        doctors.append(Doctor(user_id=u.id, name=f"Doctor {i}",
+                              department=f"Dept {i % 5}", experience_years=i))
+    db.session.add_all(doctors)
+    db.session.flush()
+
+    statuses = ["booked", "completed", "cancelled", "completed"]
+    bookings = []
+    for i in range(args.bookings):
+        start = now + timedelta(minutes=30 * random.randint(-2000, 2000))
+        bookings.append(Booking(
+            user_id=random.choice(patients).id,
+            doctor_id=random.choice(doctors).id,
+            start_time=start,
+            end_time=start + timedelta(minutes=30),
+            status=random.choice(statuses),
+            issue_description="Checkup",
+            token_number=i % 40 + 1
+        ))
+    # one regular patient with more than a page of bookings, so the user
+    # routes have a second page at any --bookings / --patients
+    regular = patients[0]
+    for i in range(page_size + 10):
+        start = now - timedelta(days=7 * (i + 1))
+        bookings.append(Booking(
+            user_id=regular.id,
+            doctor_id=random.choice(doctors).id,
+            start_time=start,
+            end_time=start + timedelta(minutes=30),
+            status=random.choice(statuses),
+            issue_description="Follow-up",
+            token_number=i % 40 + 1
+        ))
+    db.session.add_all(bookings)
+    db.session.flush()
+
+    db.session.add_all([
+        Prescription(booking_id=b.id, doctor_id=b.doctor_id, report_text="ok")
+        for b in bookings if b.status == "completed" and random.random() < 0.5
+    ])
+    db.session.add_all([
+        Notification_win(user_id=p.id, message="Your booking was moved")
+        for p in patients[:50]
+    ])
+    db.session.commit()
+
+    # the busiest patient / doctor, so every page is full
+    busiest_user = max(patients, key=lambda p: sum(b.user_id == p.id for b in bookings))
+    busiest_doctor = max(doctors, key=lambda d: sum(b.doctor_id == d.id for b in bookings))
+    return {
+        "user": busiest_user.id,
+        "doctor": busiest_doctor.user_id,
+        "admin": admin.id,
+    }
+
+
+def main():
+    args = parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="query_budget_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+
+    # import after DATABASE_URL is set
+    from app import app
+    from config import Config
+    from models import (
+        db, User, Doctor, Booking, Prescription, Notification_win
+    )
+
+    with app.app_context():
+        db.create_all()
+        logins = seed(args, db, User, Doctor, Booking, Prescription,
+                      Notification_win)
+        counter = QueryCounter(db.engine)
+
+    clients = {}
+    for role, user_id in logins.items():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+        clients[role] = client
+
+    # cursors for the second pages, taken from the "load more" buttons
+    cursors = {}
+    missing = []
+    for role, path, key, button in [
+        ("user", "/user/dashboard", "user_after", "btn-more-bookings"),
+        ("doctor", "/doctor/dashboard", "doctor_after", "btn-more-appointments"),
+        ("doctor", "/doctor/dashboard", "doctor_earlier", "btn-earlier-appointments"),
+        ("admin", "/admin/dashboard", "bookings_after", "btn-more-bookings"),
+    ]:
+        html = clients[role].get(path).get_data(as_text=True)
+        match = re.search(
+            rf'id="{button}"[^>]*data-cursor="([A-Za-z0-9_\-]+)"', html
+        )
+        cursors[key] = match.group(1) if match else ""
+        if not match:
+            missing.append(path)
+
+    if missing:
+        # the second-page budgets would measure an empty page
+        print(f"no second page for {', '.join(missing)} (add --bookings)")
+        sys.exit(1)
+
+    print(f"{args.bookings} bookings, {args.patients} patients, "
+          f"{args.doctors} doctors, page size {Config.DASHBOARD_PAGE_SIZE}")
+    print(f"{'role':<8}{'route':<52}{'SQL':>5}{'budget':>8}{'ms':>8}")
+
+    over = []
+    for (role, path), budget in BUDGETS.items():
+        url = path.format(**cursors)
+        with counter:
+            t0 = time.perf_counter()
+            res = clients[role].get(url)
+            elapsed = (time.perf_counter() - t0) * 1000
+        ok = res.status_code == 200 and counter.count <= budget
+        mark = "" if ok else "   <-- OVER" if res.status_code == 200 else f"   <-- HTTP {res.status_code}"
+        print(f"{role:<8}{path:<52}{counter.count:>5}{budget:>8}{elapsed:>8.1f}{mark}")
+        if args.verbose or not ok:
+            for statement in counter.statements:
+                print("         ", " ".join(statement.split())[:150])
+        if not ok:
+            over.append(path)
+
+    if over:
+        print(f"{len(over)} route(s) over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# benchmarks/query_plans.py
+#
+# EXPLAIN QUERY PLAN regression check. Runs the hot routes (dashboards,
+# list APIs, slot checks, booking, cancel, transfer, mark_read) and the
+# booking status engine against a seeded SQLite database, records every
+# statement they issue, and fails if any plan falls back to a full table
+# scan ("SCAN <table>" without an index) that is not allow-listed below.
+#
+#     python -m benchmarks.query_plans
+#     python -m benchmarks.query_plans --verbose      # print every plan
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from benchmarks.query_budget import QueryCounter, seed
+
+# full scans that are intended: table -> reason
+ALLOWED_SCANS = {
+    "doctor": "directory cache load, the whole table once per invalidation",
+    "user": "admin user list, keyset pages walk the primary key",
+}
+
+SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=300)
+    parser.add_argument("--bookings", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args()
+
+
+class StatementRecorder(QueryCounter):
+    """QueryCounter that also keeps the parameters of each statement."""
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._thread is not None and not executemany:
+            self.statements.append((statement, parameters))
+
+
+def scenario(app, clients, ids):
+    """(label, callable) pairs; each issues the queries of one hot path."""
+    from booking_status import status_engine
+    from availability import availability
+
+    slot = ids["day"].strftime("%Y-%m-%d %H:%M")
+    later = (ids["day"] + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M")
+
+    def in_app(fn):
+        def run():
+            with app.app_context():
+                fn()
+        return run
+
+    user, doctor, admin = clients["user"], clients["doctor"], clients["admin"]
+    return [
+        ("user dashboard", lambda: user.get("/user/dashboard")),
+        ("doctor dashboard", lambda: doctor.get("/doctor/dashboard")),
+        ("admin dashboard", lambda: admin.get("/admin/dashboard")),
+        ("api bookings (user)", lambda: user.get("/api/bookings?status=booked")),
+        ("api bookings (doctor)", lambda: doctor.get(
+            "/api/bookings?date_from=2020-01-01&order=asc")),
+        ("api bookings (admin)", lambda: admin.get(
+            f"/api/bookings?doctor_id={ids['doctor_id']}")),
+        ("api admin users", lambda: admin.get("/api/admin/users?role=doctor")),
+        ("check_slot (cold index)", lambda: (
+            availability.invalidate(),
+            user.post("/api/check_slot", json={
+                "doctor_id": ids["doctor_id"], "booking_time": slot})
+        )),
+        ("free_slots", lambda: user.post("/api/free_slots", json={
+            "department": "Dept 0", "date_from": ids["day"].strftime("%Y-%m-%d")})),
+        ("book", lambda: user.post("/api/book", json={
+            "doctor_id": ids["doctor_id"], "booking_time": later})),
+        ("cancel", lambda: user.post(
+            f"/api/booking/{ids['booking_id']}/cancel", json={"reason": "plan"})),
+        ("transfer", lambda: doctor.post(
+            f"/api/doctor/booking/{ids['doctor_booking_id']}/transfer",
+            json={"new_doctor_id": ids["other_doctor_id"]})),
+        ("mark_read", lambda: user.post("/api/notifications/mark_read")),
+        ("status engine", in_app(lambda: (
+            status_engine._refill(datetime.now()),
+            status_engine.run_due()
+        ))),
+    ]
+
+
+def explain(conn, statement, parameters):
+    cur = conn.cursor()
+    try:
+        cur.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[3] for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def full_scans(plan):
+    tables = []
+    for detail in plan:
+        match = SCAN.match(detail.strip())
+        if match:
+            # joined tables are aliased doctor_1, user_1, ...
+            tables.append(re.sub(r"_\d+$", "", match.group(1)))
+    return tables
+
+
+def main():
+    args = parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="query_plans_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+
+    # import after DATABASE_URL is set
+    from app import app
+    from models import (
+        db, User, Doctor, DoctorSchedule, Booking, Prescription,
+        Notification_win
+    )
+
+    day = (datetime.now() + timedelta(days=3)).replace(
+        hour=10, minute=0, second=0, microsecond=0
+    )
+    with app.app_context():
+        db.create_all()
+        logins = seed(args, db, User, Doctor, Booking, Prescription,
+                      Notification_win)
+        doctor = Doctor.query.filter_by(user_id=logins["doctor"]).one()
+        other = Doctor.query.filter(Doctor.id != doctor.id).first()
+        db.session.add(DoctorSchedule(
+            doctor_id=doctor.id, start_time=day, end_time=day + timedelta(hours=8)
+        ))
+        db.session.add(Notification_win(user_id=logins["user"], message="plan"))
+        own = Booking.query.filter_by(user_id=logins["user"]).first()
+        doctors_booking = Booking.query.filter_by(doctor_id=doctor.id).first()
+        ids = {
+            "day": day,
+            "doctor_id": doctor.id,
+            "other_doctor_id": other.id,
+            "booking_id": own.id,
+            "doctor_booking_id": doctors_booking.id,
+        }
+        db.session.commit()
+        recorder = StatementRecorder(db.engine)
+
+    clients = {}
+    for role, user_id in logins.items():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+        clients[role] = client
+
+    failures = []
+    checked = 0
+    for label, run in scenario(app, clients, ids):
+        with recorder:
+            run()
+
+        with app.app_context():
+            conn = db.engine.raw_connection()
+            try:
+                for statement, parameters in recorder.statements:
+                    if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                        continue
+                    checked += 1
+                    plan = explain(conn, statement, parameters)
+                    bad = [t for t in full_scans(plan) if t not in ALLOWED_SCANS]
+                    if args.verbose or bad:
+                        print(f"[{label}] {' '.join(statement.split())[:140]}")
+                        for detail in plan:
+                            print("      ", detail)
+                    if bad:
+                        failures.append((label, bad))
+            finally:
+                conn.close()
+
+    print(f"{checked} statements checked, {len(failures)} full table scan(s)")
+    for label, tables in failures:
+        print(f"  {label}: SCAN {', '.join(tables)}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
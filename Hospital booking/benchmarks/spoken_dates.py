@@ -0,0 +1,170 @@
+# benchmarks/spoken_dates.py
+#
+# Accuracy and speed of the booking-time parser (spoken_dates.py)
+# against plain dateparser, on a hand-labelled corpus of spoken phrases.
+# Every phrase is resolved against the same base time, a Monday
+# afternoon, so the expected answers are fixed. Exits 1 when
+# spoken_dates gets a phrase wrong or the fast path raises.
+#
+#   dateparser   services.get("dateparser").parse, as the route used to
+#   cold         spoken_dates.parse with the memo cleared before each call
+#   warm         spoken_dates.parse with the memo filled
+#
+#     python -m benchmarks.spoken_dates
+#     python -m benchmarks.spoken_dates --rounds 20 --verbose
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+BASE = datetime(2026, 10, 19, 14, 37, 21, 123456)     # Monday
+
+# phrase -> expected "YYYY-mm-dd HH:MM" (None: should not parse)
+CORPUS = [
+    ("tomorrow at 10 am", "2026-10-20 10:00"),
+    ("Tomorrow at 10 AM.", "2026-10-20 10:00"),
+    ("tomorrow at 4 pm", "2026-10-20 16:00"),
+    ("tomorrow 9:30 am", "2026-10-20 09:30"),
+    ("tomorrow at 10.30 a.m.", "2026-10-20 10:30"),
+    ("tomorrow at 10", "2026-10-20 10:00"),
+    ("tomorrow at 3", "2026-10-20 15:00"),
+    ("tomorrow at 10 o'clock", "2026-10-20 10:00"),
+    ("tomorrow at 6 in the evening", "2026-10-20 18:00"),
+    ("tomorrow at 9 in the morning", "2026-10-20 09:00"),
+    ("ten thirty am tomorrow", "2026-10-20 10:30"),
+    ("10:30 pm tomorrow", "2026-10-20 22:30"),
+    ("noon tomorrow", "2026-10-20 12:00"),
+    ("tomorrow at noon", "2026-10-20 12:00"),
+    ("half past 3 tomorrow", "2026-10-20 15:30"),
+    ("tomorrow", "2026-10-20 14:37"),
+    ("at 10 am", "2026-10-20 10:00"),
+    ("4 pm", "2026-10-19 16:00"),
+    ("at 4:30 pm", "2026-10-19 16:30"),
+    ("14:00", "2026-10-20 14:00"),
+    ("today at 5 pm", "2026-10-19 17:00"),
+    ("day after tomorrow at 11 am", "2026-10-21 11:00"),
+    ("the day after tomorrow at 5 pm", "2026-10-21 17:00"),
+    ("in 3 days at 10 am", "2026-10-22 10:00"),
+    ("monday", "2026-10-26 00:00"),
+    ("monday at 9 am", "2026-10-26 09:00"),
+    ("next monday at 9 am", "2026-10-26 09:00"),
+    ("tuesday 10am", "2026-10-20 10:00"),
+    ("on friday at 2 pm", "2026-10-23 14:00"),
+    ("3 pm on friday", "2026-10-23 15:00"),
+    ("this thursday at 11 am", "2026-10-22 11:00"),
+    ("quarter to 11 on wednesday", "2026-10-21 10:45"),
+    ("quarter to 1 tomorrow", "2026-10-20 12:45"),
+    ("quarter to 8 on friday", "2026-10-23 07:45"),
+    ("10 december at 4 pm", "2026-12-10 16:00"),
+    ("December 10th at 9 am", "2026-12-10 09:00"),
+    ("the 5th of november at 10:30 am", "2026-11-05 10:30"),
+    ("at 4 p.m. on the 2nd of november", "2026-11-02 16:00"),
+    ("19 october at 3 pm", "2026-10-19 15:00"),
+    ("19 october at 2 pm", "2027-10-19 14:00"),
+    ("2026-12-10 at 10 am", "2026-12-10 10:00"),
+    # left to dateparser
+    ("next week", "2026-10-26 14:37"),
+    ("in two weeks", "2026-11-02 14:37"),
+    ("whenever the doctor is free", None),
+    ("as soon as possible", None),
+    ("10:75 am", None),
+]
+
+# out-of-range clock values: the fast path must decline them (None) and
+# leave the phrase to dateparser, not raise
+INVALID = ["10:75 am", "tomorrow at 10:75 am", "tomorrow at 10.99 pm",
+           "13 pm on friday", "25:10", "quarter to 0 tomorrow"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=10,
+                        help="passes over the corpus per timing")
+    parser.add_argument("--verbose", action="store_true",
+                        help="list every phrase either parser gets wrong")
+    return parser.parse_args()
+
+
+def label(dt):
+    return dt.strftime("%Y-%m-%d %H:%M") if dt else None
+
+
+def timed(parse, rounds, before=None):
+    """Mean microseconds per phrase over the corpus."""
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for phrase, _ in CORPUS:
+            if before:
+                before()
+            parse(phrase)
+    return (time.perf_counter() - t0) / (rounds * len(CORPUS)) * 1e6
+
+
+def main():
+    args = parse_args()
+
+    from services import services
+    from spoken_dates import spoken_dates, normalise, fast_parse, DATEPARSER_SETTINGS
+
+    dateparser = services.get("dateparser")
+    settings = dict(DATEPARSER_SETTINGS, RELATIVE_BASE=BASE)
+
+    def plain(phrase):
+        return dateparser.parse(phrase, settings=settings)
+
+    def engine(phrase):
+        return spoken_dates.parse(phrase, now=BASE)
+
+    plain("tomorrow at 10 am")      # dateparser loads its locale data lazily
+
+    right = {"dateparser": 0, "spoken_dates": 0}
+    fast = 0
+    for phrase, expected in CORPUS:
+        spoken_dates.clear()
+        got = {"dateparser": label(plain(phrase)), "spoken_dates": label(engine(phrase))}
+        fast += fast_parse(normalise(phrase), BASE) is not None
+        for name, value in got.items():
+            right[name] += value == expected
+        if args.verbose and any(v != expected for v in got.values()):
+            print(f"  {phrase!r:<38} expected {expected}  dateparser {got['dateparser']}"
+                  f"  spoken_dates {got['spoken_dates']}")
+
+    invalid = []
+    for phrase in INVALID:
+        try:
+            result = fast_parse(normalise(phrase), BASE)
+        except Exception as e:
+            result = e
+        if result is not None:
+            invalid.append(f"{phrase!r}: {result!r}")
+
+    spoken_dates.clear()
+    times = {
+        "dateparser": timed(plain, args.rounds),
+        "cold": timed(engine, args.rounds, before=spoken_dates.clear),
+    }
+    spoken_dates.clear()
+    timed(engine, 1)                # fill the memo
+    times["warm"] = timed(engine, args.rounds)
+
+    total = len(CORPUS)
+    print(f"{total} phrases, base {BASE:%a %Y-%m-%d %H:%M}; "
+          f"fast path covers {fast}/{total}")
+    print(f"{'parser':<14}{'correct':>10}")
+    for name, count in right.items():
+        print(f"{name:<14}{count:>6}/{total}")
+    print(f"{'timing':<14}{'us/phrase':>10}{'speed-up':>10}")
+    for name, us in times.items():
+        print(f"{name:<14}{us:>10.1f}{times['dateparser'] / us:>9.1f}x")
+
+    for line in invalid:
+        print(f"fast path accepted an invalid time: {line}")
+    if right["spoken_dates"] < total or invalid:
+        print(f"spoken_dates got {total - right['spoken_dates']} phrase(s) wrong"
+              + ("" if args.verbose else " (see --verbose)"))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# benchmarks/sqlite_profile.py
+#
+# Concurrent read/write load against one SQLite file from several worker
+# processes (like gunicorn), once per database profile:
+#
+#   default      driver defaults: rollback journal, no pragmas
+#   production   WAL, synchronous=NORMAL, busy_timeout, mmap, cache, pool
+#
+# Each process runs --threads request threads for --seconds. Reads are
+# GET /api/bookings; writes are POST /api/book and POST
+# /api/booking/<id>/cancel. "locked" counts requests that failed with
+# "database is locked" (HTTP 500 or the reservation's "Server busy").
+#
+#     python -m benchmarks.sqlite_profile
+#     python -m benchmarks.sqlite_profile --processes 8 --writes 0.3
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+PROFILES = ["default", "production"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", nargs="*", default=PROFILES)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writes", type=float, default=0.2,
+                        help="fraction of requests that write")
+    parser.add_argument("--doctors", type=int, default=10)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", choices=["seed", "load"], help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--worker", type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# ================= CHILD: SEED ================= #
+
+def seed(args):
+    from app import app
+    from models import db, User, Doctor, DoctorSchedule, Booking
+
+    random.seed(args.seed)
+    day = (datetime.now() + timedelta(days=7)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+    with app.app_context():
+        db.create_all()
+
+        patients = [
+            User(username=f"patient{i}", email=f"p{i}@bench.local",
+                 password_hash="x", role="user")
+            for i in range(args.patients)
+        ]
+        db.session.add_all(patients)
+        db.session.flush()
+
+        doctors = []
+        for i in range(args.doctors):
+            u = User(username=f"doctor{i}", email=f"d{i}@bench.local",
+                     password_hash="x", role="doctor")
+            db.session.add(u)
+            db.session.flush()
+            d = Doctor(user_id=u.id, name=f"Bench {i}", department="Bench")
+            db.session.add(d)
+            db.session.flush()
+            # a long schedule, so bookings rarely run out of slots
+            db.session.add(DoctorSchedule(
+                doctor_id=d.id, start_time=day, end_time=day + timedelta(days=60)
+            ))
+            doctors.append(d)
+
+        db.session.add_all([
+            Booking(
+                user_id=random.choice(patients).id,
+                doctor_id=random.choice(doctors).id,
+                start_time=(start := day - timedelta(minutes=30 * random.randint(1, 5000))),
+                end_time=start + timedelta(minutes=30),
+                status="booked",
+                issue_description="Checkup",
+                token_number=i % 40 + 1
+            )
+            for i in range(args.bookings)
+        ])
+        db.session.commit()
+
+        owned = {}
+        for booking_id, user_id in db.session.query(Booking.id, Booking.user_id):
+            owned.setdefault(user_id, []).append(booking_id)
+
+        world = {
+            "patients": [p.id for p in patients if p.id in owned],
+            "owned": owned,
+            "doctors": [d.id for d in doctors],
+            "day": day.isoformat()
+        }
+
+    print(json.dumps(world))
+
+
+# ================= CHILD: LOAD ================= #
+
+def load(args, world):
+    from app import app
+
+    rng = random.Random(args.seed * 1000 + args.worker)
+    day = datetime.fromisoformat(world["day"])
+    results = {"read": [], "write": [], "locked": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def run(thread_no):
+        local_rng = random.Random(rng.random())
+        user_id = world["patients"][
+            (args.worker * args.threads + thread_no) % len(world["patients"])
+        ]
+        owned = world["owned"][str(user_id)]
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+
+        time.sleep(max(0.0, args.start_at - time.time()))
+        deadline = args.start_at + args.seconds
+        while time.time() < deadline:
+            write = local_rng.random() < args.writes
+            t0 = time.perf_counter()
+            try:
+                if not write:
+                    res = client.get("/api/bookings?limit=20")
+                elif local_rng.random() < 0.5:
+                    slot = day + timedelta(minutes=30 * local_rng.randrange(60 * 48))
+                    res = client.post("/api/book", json={
+                        "doctor_id": local_rng.choice(world["doctors"]),
+                        "booking_time": slot.strftime("%Y-%m-%d %H:%M")
+                    })
+                else:
+                    res = client.post(
+                        f"/api/booking/{local_rng.choice(owned)}/cancel",
+                        json={"reason": "benchmark"}
+                    )
+                body = res.get_json(silent=True) or {}
+                locked = res.status_code >= 500 or body.get("message") == "Server busy, please try again"
+                failed = False
+            except Exception as e:
+                locked = "locked" in str(e).lower()
+                failed = not locked
+            elapsed = (time.perf_counter() - t0) * 1000
+
+            with lock:
+                if locked:
+                    results["locked"] += 1
+                elif failed:
+                    results["errors"] += 1
+                else:
+                    results["write" if write else "read"].append(elapsed)
+
+    threads = [
+        threading.Thread(target=run, args=(i,)) for i in range(args.threads)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(json.dumps(results))
+
+
+# ================= PARENT ================= #
+
+def run_profile(args, profile):
+    tmp = tempfile.mkdtemp(prefix="sqlite_profile_")
+    env = dict(os.environ)
+    env["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+    env["DB_PROFILE"] = profile
+    env.setdefault("LLAMA_BACKEND", "fake")
+    env.setdefault("WHISPER_BACKEND", "stub")
+
+    base = [sys.executable, "-m", "benchmarks.sqlite_profile",
+            "--seed", str(args.seed)]
+    out = subprocess.run(
+        base + ["--child", "seed",
+                "--doctors", str(args.doctors),
+                "--patients", str(args.patients),
+                "--bookings", str(args.bookings)],
+        capture_output=True, text=True, env=env
+    )
+    lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+    if not lines:
+        print(f"{profile}: seeding failed\n{out.stderr[-2000:]}")
+        return None
+    env["SQLITE_PROFILE_WORLD"] = lines[-1]
+
+    # every worker starts its clock at the same moment, after imports
+    start_at = time.time() + 5
+    procs = [
+        subprocess.Popen(
+            base + ["--child", "load",
+                    "--worker", str(i),
+                    "--threads", str(args.threads),
+                    "--seconds", str(args.seconds),
+                    "--writes", str(args.writes),
+                    "--start-at", str(start_at)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env
+        )
+        for i in range(args.processes)
+    ]
+
+    total = {"read": [], "write": [], "locked": 0, "errors": 0}
+    for p in procs:
+        stdout, stderr = p.communicate()
+        lines = [l for l in stdout.splitlines() if l.startswith("{")]
+        if not lines:
+            print(f"{profile}: worker failed\n{stderr[-2000:]}")
+            return None
+        part = json.loads(lines[-1])
+        total["read"] += part["read"]
+        total["write"] += part["write"]
+        total["locked"] += part["locked"]
+        total["errors"] += part["errors"]
+    return total
+
+
+def main():
+    args = parse_args()
+    if args.child == "seed":
+        seed(args)
+        return
+    if args.child == "load":
+        load(args, json.loads(os.environ["SQLITE_PROFILE_WORLD"]))
+        return
+
+    print(f"{args.processes} processes × {args.threads} threads, "
+          f"{args.seconds:.0f}s, {args.writes:.0%} writes")
+    print(f"{'profile':<12}{'req/s':>8}{'reads':>8}{'writes':>8}{'locked':>8}"
+          f"{'read p50':>10}{'read p95':>10}{'write p50':>11}{'write p95':>11}   (ms)")
+    for profile in args.profiles:
+        r = run_profile(args, profile)
+        if r is None:
+            continue
+        done = len(r["read"]) + len(r["write"])
+        print(f"{profile:<12}{done / args.seconds:>8.0f}"
+              f"{len(r['read']):>8}{len(r['write']):>8}{r['locked']:>8}"
+              f"{percentile(r['read'], 50):>10.1f}{percentile(r['read'], 95):>10.1f}"
+              f"{percentile(r['write'], 50):>11.1f}{percentile(r['write'], 95):>11.1f}"
+              + (f"   ({r['errors']} other errors)" if r["errors"] else ""))
+
+
+if __name__ == "__main__":
+    main()
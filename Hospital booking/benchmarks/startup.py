@@ -0,0 +1,171 @@
+# benchmarks/startup.py
+#
+# Time to first request with lazily loaded AI services versus warming
+# them at startup. Every measurement runs in a fresh interpreter:
+#
+#   import    importing app.py (Flask, models, routes)
+#   warm-up   services.warm_up([service])  (warm runs only)
+#   first     first request that needs the service
+#   second    the same kind of request again (steady state)
+#
+#     python -m benchmarks.startup                 # fake llama / stub whisper
+#     python -m benchmarks.startup --real          # configured backends
+#     python -m benchmarks.startup --services dateparser tts
+
+import argparse
+import io
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+SERVICES = ["dateparser", "tts", "whisper", "llama"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--services", nargs="*", default=SERVICES)
+    parser.add_argument("--runs", type=int, default=3,
+                        help="fresh processes per measurement (median kept)")
+    parser.add_argument("--real", action="store_true",
+                        help="use the configured Whisper / TinyLLaMA backends")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def silent_wav(seconds=1.0, rate=16000):
+    frames = int(seconds * rate)
+    samples = b"\0\0" * frames
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(samples), b"WAVE", b"fmt ", 16, 1, 1,
+        rate, rate * 2, 2, 16, b"data", len(samples)
+    )
+    return header + samples
+
+
+def request_for(client, service):
+    """One request that needs `service`; unique input so nothing is cached."""
+    tag = uuid.uuid4().hex[:8]
+    if service == "dateparser":
+        return client.post("/api/parse_booking_time",
+                           json={"spoken": "10 December 12 PM"})
+    if service == "tts":
+        return client.post("/api/tts", json={"text": f"Please wait {tag}."})
+    if service == "whisper":
+        return client.post(
+            "/api/stt/whisper",
+            data={"audio": (io.BytesIO(silent_wav()), "recording.wav")},
+            content_type="multipart/form-data"
+        )
+    if service == "llama":
+        return client.post("/api/tinyllama/assistant",
+                           json={"message": f"Visiting hours {tag}?"})
+    raise ValueError(service)
+
+
+def child(service, warm):
+    tmp = tempfile.mkdtemp(prefix="startup_bench_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+
+    t0 = time.perf_counter()
+    from app import app
+    import_ms = (time.perf_counter() - t0) * 1000
+
+    from models import db, User
+    from services import services
+    from tts_engine import tts
+
+    tts.folder = os.path.join(tmp, "tts")
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", email="bench@bench.local",
+                    password_hash="x", role="user")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    warm_ms = 0.0
+    if warm:
+        t0 = time.perf_counter()
+        services.warm_up([service])
+        warm_ms = (time.perf_counter() - t0) * 1000
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+    timings = []
+    status = []
+    for _ in range(2):
+        t0 = time.perf_counter()
+        res = request_for(client, service)
+        timings.append((time.perf_counter() - t0) * 1000)
+        status.append(res.status_code)
+
+    tts.stop()
+    print(json.dumps({
+        "import": import_ms,
+        "warm": warm_ms,
+        "first": timings[0],
+        "second": timings[1],
+        "ok": all(code < 500 for code in status)
+    }))
+
+
+def measure(service, warm, runs, env):
+    results = []
+    for _ in range(runs):
+        cmd = [sys.executable, "-m", "benchmarks.startup", "--child", service]
+        if warm:
+            cmd.append("--warm")
+        out = subprocess.run(cmd, capture_output=True, text=True, env=env)
+        lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+        if not lines:
+            print(f"{service}: child failed\n{out.stderr[-2000:]}")
+            return None
+        results.append(json.loads(lines[-1]))
+
+    def median(key):
+        values = sorted(r[key] for r in results)
+        return values[len(values) // 2]
+
+    return {
+        key: median(key) for key in ("import", "warm", "first", "second")
+    } | {"ok": all(r["ok"] for r in results)}
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        child(args.child, args.warm)
+        return
+
+    env = dict(os.environ)
+    env["WARM_UP_SERVICES"] = ""   # the child warms explicitly
+    if not args.real:
+        env.setdefault("LLAMA_BACKEND", "fake")
+        env.setdefault("WHISPER_BACKEND", "stub")
+
+    print(f"{'service':<11}{'mode':<6}{'import':>9}{'warm-up':>9}"
+          f"{'first':>9}{'second':>9}{'to 1st':>9}   (ms)")
+    for service in args.services:
+        for warm in (False, True):
+            r = measure(service, warm, args.runs, env)
+            if r is None:
+                continue
+            total = r["import"] + r["warm"] + r["first"]
+            flag = "" if r["ok"] else "   (request failed)"
+            print(f"{service:<11}{'warm' if warm else 'lazy':<6}"
+                  f"{r['import']:>9.0f}{r['warm']:>9.0f}"
+                  f"{r['first']:>9.0f}{r['second']:>9.0f}{total:>9.0f}{flag}")
+
+
+if __name__ == "__main__":
+    main()
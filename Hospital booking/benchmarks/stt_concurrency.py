@@ -0,0 +1,166 @@
+# benchmarks/stt_concurrency.py
+#
+# Posts many dictations to /api/stt/whisper at the same time and checks
+# that every caller gets the transcript of its own recording (no
+# cross-talk) and that nothing is left behind in static/uploads.
+#
+#     python -m benchmarks.stt_concurrency --requests 200 --threads 16
+#     python -m benchmarks.stt_concurrency --backend server --audio a.wav b.wav
+#
+# The default stub backend answers with a hash of the audio bytes, so
+# every request can be checked exactly. With a real backend, each file
+# is first transcribed alone and the parallel results must match it.
+
+import argparse
+import io
+import os
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--backend", default="stub",
+                        choices=["stub", "server", "cli"])
+    parser.add_argument("--delay", type=float, default=0.05,
+                        help="simulated transcription time (stub)")
+    parser.add_argument("--audio", nargs="*", default=[],
+                        help="wav files to send (default: random noise)")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def noise_wav(seconds=1.0, rate=16000):
+    """Random 16-bit mono PCM, different for every call."""
+    frames = int(seconds * rate)
+    samples = struct.pack(
+        f"<{frames}h", *(random.randint(-2000, 2000) for _ in range(frames))
+    )
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(samples), b"WAVE", b"fmt ", 16, 1, 1,
+        rate, rate * 2, 2, 16, b"data", len(samples)
+    )
+    return header + samples
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+
+    tmp = tempfile.mkdtemp(prefix="stt_bench_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+
+    # import after DATABASE_URL is set
+    from app import app
+    from config import Config
+    from models import db
+    from admission import admission
+    import whisper_stt_processor as stt
+
+    with app.app_context():
+        db.create_all()   # keeps the background workers quiet
+
+    # this checks isolation, not admission control: let every thread in
+    admission.configure("whisper", args.threads, args.requests, 60.0)
+    admission.ai_slots = max(admission.ai_slots, args.threads)
+
+    if args.backend == "stub":
+        stt.set_backend(stt.StubWhisperBackend(delay=args.delay))
+    else:
+        stt.set_backend(stt.create_backend(args.backend))
+
+    clips = [open(path, "rb").read() for path in args.audio]
+    if not clips:
+        clips = [noise_wav() for _ in range(min(args.requests, 50))]
+
+    def post(audio):
+        client = app.test_client()
+        t0 = time.perf_counter()
+        res = client.post(
+            "/api/stt/whisper",
+            data={"audio": (io.BytesIO(audio), "recording.wav")},
+            content_type="multipart/form-data"
+        )
+        return res.status_code, res.get_json() or {}, time.perf_counter() - t0
+
+    # expected transcript per clip, each request on its own
+    expected = []
+    for audio in clips:
+        status, body, _ = post(audio)
+        if status != 200:
+            print("baseline failed:", body.get("error"))
+            sys.exit(1)
+        expected.append(body["text"])
+
+    uploads_before = set(os.listdir(Config.UPLOAD_FOLDER)) \
+        if os.path.isdir(Config.UPLOAD_FOLDER) else set()
+
+    order = [i % len(clips) for i in range(args.requests)]
+    random.shuffle(order)
+    start_barrier = threading.Barrier(min(args.threads, args.requests))
+    ready = threading.local()
+
+    def one(index):
+        # line every thread up once so the first wave really overlaps
+        if not getattr(ready, "done", False):
+            ready.done = True
+            start_barrier.wait()
+        status, body, latency = post(clips[index])
+        return index, status, body, latency
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(one, order))
+    elapsed = time.perf_counter() - t0
+
+    rejected = sum(status == 503 for _, status, _, _ in results)
+    errors = [body.get("error") for _, status, body, _ in results
+              if status not in (200, 503)]
+    mismatches = [
+        (index, body.get("text"))
+        for index, status, body, _ in results
+        if status == 200 and body.get("text") != expected[index]
+    ]
+    uploads_after = set(os.listdir(Config.UPLOAD_FOLDER)) \
+        if os.path.isdir(Config.UPLOAD_FOLDER) else set()
+    leftovers = sorted(uploads_after - uploads_before)
+    latencies = [latency for _, _, _, latency in results]
+
+    print(f"backend:     {stt.get_backend().name}")
+    print(f"requests:    {len(results)} over {args.threads} threads"
+          f" ({len(clips)} distinct clips)")
+    print(f"throughput:  {len(results) / elapsed:.1f} req/s")
+    print(f"latency:     p50 {percentile(latencies, 50) * 1000:.0f} ms"
+          f"  p95 {percentile(latencies, 95) * 1000:.0f} ms"
+          f"  mean {statistics.mean(latencies) * 1000:.0f} ms")
+    print(f"errors:      {len(errors)}")
+    print(f"rejected:    {rejected} (503 busy)")
+    print(f"cross-talk:  {len(mismatches)}")
+    print(f"leftover files in uploads: {len(leftovers)}")
+
+    for error in errors[:5]:
+        print("  error:", error)
+    for index, text in mismatches[:5]:
+        print(f"  clip {index}: expected {expected[index]!r}, got {text!r}")
+
+    if errors or mismatches or leftovers:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
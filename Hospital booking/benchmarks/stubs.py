@@ -0,0 +1,68 @@
+# benchmarks/stubs.py
+#
+# Deterministic local stand-ins for the AI backends, so load tests run
+# offline and their numbers do not depend on models being installed:
+#
+#   llama     FakeLlamaBackend (answer derived from the prompt)
+#   whisper   StubWhisperBackend (transcript derived from the audio)
+#   tts       an in-process pyttsx3 stand-in writing a short silent WAV
+#
+# Set the environment (stub_environment) before the app is imported and
+# call install() after.
+
+import os
+import wave
+
+STUB_ENV = {
+    "LLAMA_BACKEND": "fake",
+    "WHISPER_BACKEND": "stub",
+    "WARM_UP_SERVICES": "",
+}
+
+
+def stub_environment():
+    for key, value in STUB_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+class SilentSpeechEngine:
+    """The two pyttsx3 engine calls tts_engine._render() makes."""
+
+    SAMPLE_RATE = 16000
+
+    def __init__(self, seconds=0.5):
+        self.frames = b"\0\0" * int(self.SAMPLE_RATE * seconds)
+        self._queued = []
+
+    def save_to_file(self, text, path):
+        self._queued.append(path)
+
+    def runAndWait(self):
+        for path in self._queued:
+            with wave.open(path, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(self.SAMPLE_RATE)
+                wav.writeframes(self.frames)
+        self._queued = []
+
+
+def install(tts_folder, ai_delay=0.0):
+    """
+    Swap every AI backend for its stub. ai_delay (seconds) simulates
+    model time for llama and whisper.
+    """
+    import tinyllama_client
+    import tts_engine
+    import whisper_stt_processor
+
+    tinyllama_client.set_backend(tinyllama_client.FakeLlamaBackend(delay=ai_delay))
+    whisper_stt_processor.set_backend(
+        whisper_stt_processor.StubWhisperBackend(delay=ai_delay)
+    )
+
+    # synthesise inline with the silent engine instead of pyttsx3 workers
+    tts_engine.tts.stop()
+    tts_engine.tts.workers = 0
+    tts_engine.tts.folder = tts_folder
+    tts_engine._engine = SilentSpeechEngine()
@@ -0,0 +1,205 @@
+# booking_status.py
+#
+# Background booking status transitions (booked → ongoing → completed).
+# Dashboards no longer write: a single thread per process sleeps until
+# the next booking boundary and then applies bulk UPDATEs. The thread
+# starts once the booking table exists (at init_app, or after
+# app.init_schema() on a fresh database).
+
+import heapq
+import threading
+from datetime import datetime
+
+from models import db, Booking
+
+# ================= CONFIG ================= #
+
+# Safety net: re-scan for the next boundary at least this often (seconds),
+# so bookings written by other processes are picked up.
+DEFAULT_POLL_INTERVAL = 60
+
+
+class BookingStatusEngine:
+    """
+    Keeps a time-ordered heap of upcoming booking start/end times.
+    When a boundary is crossed, all due rows are moved with two
+    set-based UPDATEs instead of loading and saving each Booking.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.poll_interval = DEFAULT_POLL_INTERVAL
+
+        self._boundaries = []          # heap of datetimes
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        # counters
+        self.transitioned = {"ongoing": 0, "completed": 0}
+        self.runs = 0
+        self.last_run = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get(
+            "BOOKING_STATUS_POLL_INTERVAL", DEFAULT_POLL_INTERVAL
+        )
+        app.extensions["booking_status"] = self
+
+        self.enabled = app.config.get("BOOKING_STATUS_ENGINE", True)
+        self.start_when_ready()
+
+    # ---------- scheduling ----------
+
+    def schedule(self, start_time, end_time):
+        """
+        Register the boundaries of a new / moved booking so the
+        worker wakes up in time even if it is earlier than anything
+        already queued.
+        """
+        with self._cond:
+            heapq.heappush(self._boundaries, start_time)
+            heapq.heappush(self._boundaries, end_time)
+            self._cond.notify()
+
+    def _refill(self, now):
+        """
+        Ask the database for the next start and end boundary.
+        Both are MIN() lookups, not full scans of the table.
+        """
+        next_start = db.session.query(db.func.min(Booking.start_time)).filter(
+            Booking.status == "booked",
+            Booking.start_time > now
+        ).scalar()
+
+        next_end = db.session.query(db.func.min(Booking.end_time)).filter(
+            Booking.status.in_(["booked", "ongoing"]),
+            Booking.end_time > now
+        ).scalar()
+
+        with self._cond:
+            for t in (next_start, next_end):
+                if t is not None and t not in self._boundaries:
+                    heapq.heappush(self._boundaries, t)
+
+    # ---------- transitions ----------
+
+    def run_due(self, now=None):
+        """
+        Apply every transition that is due at `now`.
+        Returns (n_ongoing, n_completed).
+        """
+        now = now or datetime.now()
+
+        # booked → ongoing
+        n_ongoing = Booking.query.filter(
+            Booking.status == "booked",
+            Booking.start_time <= now,
+            Booking.end_time > now
+        ).update({Booking.status: "ongoing"}, synchronize_session=False)
+
+        # booked / ongoing → completed
+        n_completed = Booking.query.filter(
+            Booking.status.in_(["booked", "ongoing"]),
+            Booking.end_time <= now
+        ).update({Booking.status: "completed"}, synchronize_session=False)
+
+        db.session.commit()
+
+        self.transitioned["ongoing"] += n_ongoing
+        self.transitioned["completed"] += n_completed
+        self.runs += 1
+        self.last_run = now
+
+        return n_ongoing, n_completed
+
+    def _pop_due(self, now):
+        """
+        Pop every boundary at or before `now`.
+        Returns True if at least one boundary was crossed.
+        """
+        crossed = False
+        while self._boundaries and self._boundaries[0] <= now:
+            heapq.heappop(self._boundaries)
+            crossed = True
+        return crossed
+
+    def _next_wait(self, now):
+        if not self._boundaries:
+            return self.poll_interval
+
+        wait = (self._boundaries[0] - now).total_seconds()
+        return max(0.0, min(wait, self.poll_interval))
+
+    def _loop(self):
+        due = True  # catch up once on boot
+
+        while not self._stopped:
+            now = datetime.now()
+            failed = False
+            try:
+                with self.app.app_context():
+                    if due:
+                        self.run_due(now)
+                    self._refill(now)
+            except Exception as e:
+                # e.g. database briefly unavailable; retry later
+                print("Booking status engine error:", e)
+                failed = True
+
+            with self._cond:
+                if self._stopped:
+                    break
+                self._cond.wait(timeout=self._next_wait(datetime.now()))
+                due = self._pop_due(datetime.now()) or failed
+
+    # ---------- lifecycle ----------
+
+    def start_when_ready(self):
+        """
+        Start the worker if the engine is enabled and the booking table
+        exists. Returns True if it is running.
+        """
+        if not self.enabled or self.app is None:
+            return False
+        try:
+            with self.app.app_context():
+                ready = db.inspect(db.engine).has_table(Booking.__tablename__)
+        except Exception:
+            ready = False   # database not reachable yet
+        if ready:
+            self.start()
+        return ready
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="booking-status-engine",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def stats(self):
+        return {
+            "transitioned": dict(self.transitioned),
+            "transitioned_total": sum(self.transitioned.values()),
+            "runs": self.runs,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "queued_boundaries": len(self._boundaries)
+        }
+
+
+status_engine = BookingStatusEngine()
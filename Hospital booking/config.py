@@ -7,10 +7,149 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 class Config:
     SECRET_KEY = "offline-ai-hospital-secret"
     
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "database.db")
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "DATABASE_URL",
+        "sqlite:///" + os.path.join(BASE_DIR, "database.db")
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Database profile (models.configure_database). "default" leaves the
+    # driver defaults (rollback journal, no pragmas); "production" opts in
+    # to the SQLite pragmas and pool settings below. It has not shown a
+    # consistent win yet: compare both on the target machine with
+    # python -m benchmarks.sqlite_profile before switching.
+    # Any non-SQLite DATABASE_URL (postgresql://, mysql+pymysql://, ...)
+    # skips the pragmas and uses the pool settings only.
+    DB_PROFILE = os.environ.get("DB_PROFILE", "default")
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",         # readers no longer block the writer
+        "synchronous": "NORMAL",       # fsync at checkpoints, safe with WAL
+        "busy_timeout": 5000,          # ms to wait for the write lock
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,      # negative = KiB, so 64 MB per connection
+        "temp_store": "MEMORY",
+    }
+    DB_POOL_SIZE = 10             # connections kept open per worker
+    DB_MAX_OVERFLOW = 20          # extra connections under bursts
+    DB_POOL_TIMEOUT = 10          # seconds to wait for a pooled connection
+    DB_POOL_RECYCLE = 1800        # seconds, server databases only
+
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "static", "uploads")
     TTS_FOLDER = os.path.join(BASE_DIR, "static", "tts")
 
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB
+
+    # Background booked → ongoing → completed transitions
+    BOOKING_STATUS_ENGINE = True
+    BOOKING_STATUS_POLL_INTERVAL = 60  # seconds
+
+    # Per-doctor availability index (availability.py)
+    SLOT_MINUTES = 30
+    AVAILABILITY_INDEX_TTL = 300  # seconds before a doctor is reloaded from DB
+    FREE_SLOT_MAX_DAYS = 14       # max date range for /api/free_slots
+
+    # Rows per page on the dashboards (dashboard_data.py)
+    DASHBOARD_PAGE_SIZE = 50
+    API_MAX_PAGE_SIZE = 200       # ?limit= cap for the JSON list APIs
+
+    # Doctor directory cache (directory_cache.py)
+    DIRECTORY_CACHE_TTL = 600     # seconds, reload even without invalidation
+    # set to a file path so every gunicorn worker sees invalidations, e.g.
+    # os.path.join(BASE_DIR, "instance", "directory_cache.sqlite")
+    DIRECTORY_CACHE_PATH = os.environ.get("DIRECTORY_CACHE_PATH")
+    DIRECTORY_CACHE_CHECK_INTERVAL = 1.0  # seconds between shared checks
+
+    # Logged-in user snapshots (identity_cache.py): id, role and username
+    # per user, so login_required routes skip the user SELECT
+    IDENTITY_CACHE_SIZE = 10000   # users per worker (0 = always query)
+    IDENTITY_CACHE_TTL = 300      # seconds, bounds staleness across workers
+    # set to a file path so role changes reach every gunicorn worker at once
+    IDENTITY_CACHE_PATH = os.environ.get("IDENTITY_CACHE_PATH")
+    IDENTITY_CACHE_CHECK_INTERVAL = 1.0   # seconds between shared checks
+
+    # Spoken booking times (spoken_dates.py, /api/parse_booking_time)
+    SPOKEN_DATE_MEMO_SIZE = 2048  # parsed phrases kept per day (0 = off)
+
+    # TinyLLaMA backend: "server" (warm llama-server pool), "spawn"
+    # (llama-cli per call) or "fake" (tests / benchmarks)
+    LLAMA_BACKEND = os.environ.get("LLAMA_BACKEND", "server")
+    LLAMA_WORKERS = 2             # warm llama-server processes
+    # 0: each server gets a free port (safe with several gunicorn
+    # workers); a fixed base port only suits a single worker process
+    LLAMA_BASE_PORT = 0
+    LLAMA_TIMEOUT = 60            # seconds per generation
+    LLAMA_QUEUE_TIMEOUT = 10      # seconds to wait for a free worker
+    LLAMA_HEALTH_INTERVAL = 30    # seconds between health checks
+
+    # Assistant reply cache (response_cache.py)
+    LLAMA_CACHE_SIZE = 256        # entries kept (memory and disk)
+    LLAMA_CACHE_TTL = 24 * 3600   # seconds
+    # set to a file path to keep cached replies across restarts, e.g.
+    # os.path.join(BASE_DIR, "instance", "llama_cache.sqlite")
+    LLAMA_CACHE_PATH = None
+
+    # Background jobs (jobs.py) for prescription analysis
+    JOB_WORKERS = 1
+    JOB_MAX_IN_FLIGHT = 20        # queued + running before uploads get 503
+    JOB_MAX_ATTEMPTS = 3
+    JOB_RETRY_DELAY = 5           # seconds × attempt number
+    JOB_TIMEOUT = 300             # seconds before a running job is retried
+                                  # (checked by the reaper; a hung handler is not stopped)
+
+    # Whisper speech-to-text backend: "server" (warm whisper-server pool),
+    # "cli" (whisper-cli per recording) or "stub" (tests / benchmarks)
+    WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "server")
+    WHISPER_WORKERS = 1           # warm whisper-server processes
+    WHISPER_BASE_PORT = 0         # 0: a free port per server, as LLAMA_BASE_PORT
+    WHISPER_TIMEOUT = 120         # seconds per transcription
+    WHISPER_QUEUE_TIMEOUT = 10    # seconds to wait for a free worker
+    WHISPER_HEALTH_INTERVAL = 30  # seconds between health checks
+
+    # Streaming dictation (stt_stream.py)
+    STT_STREAM_SILENCE_MS = 600       # pause that ends an utterance
+    STT_STREAM_ENDPOINT_MS = 1200     # pause that ends the whole dictation
+    STT_STREAM_PARTIAL_MS = 1500      # audio between partial transcripts
+    STT_STREAM_MAX_SEGMENT_MS = 15000
+    STT_STREAM_SESSION_TTL = 60       # seconds before an idle stream is dropped
+    STT_STREAM_MAX_SESSIONS = 50
+
+    # Push channel (push.py, GET /api/push/stream): "local" fans out in
+    # this process only; "sqlite" relays through PUSH_BROKER_PATH so every
+    # gunicorn worker's streams get the event
+    PUSH_BROKER = os.environ.get("PUSH_BROKER", "local")
+    PUSH_BROKER_PATH = os.path.join(BASE_DIR, "instance", "push_events.sqlite")
+    PUSH_POLL_INTERVAL = 0.25     # seconds between broker polls (sqlite)
+    PUSH_MAX_CONNECTIONS = 500    # open streams per worker before 503
+    PUSH_QUEUE_SIZE = 100         # undelivered events kept per stream
+    PUSH_HEARTBEAT = 15           # seconds between keep-alive comments
+    PUSH_MAX_STREAM_SECONDS = 300 # then the browser reconnects
+
+    # Text-to-speech (tts_engine.py): WAVs in TTS_FOLDER are reused by
+    # content hash and evicted by age / total size
+    TTS_WORKERS = 2                   # synthesis processes (0 = inline)
+    TTS_TIMEOUT = 60                  # seconds per synthesis
+    TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024
+    TTS_CACHE_MAX_AGE = 7 * 24 * 3600 # seconds since a file was last served
+
+    # Metrics (metrics.py, GET /metrics in Prometheus text format). Route
+    # latency and SQL per request are recorded for a random share of
+    # requests; AI backend calls are always counted
+    METRICS_ENABLED = True
+    METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", "1.0"))
+    METRICS_ALLOWED_IPS = ("127.0.0.1", "::1")   # who may scrape /metrics
+
+    # Admission control (admission.py) for the AI backends, per worker.
+    # backend: (calls at once, callers allowed to wait, seconds they wait);
+    # beyond that requests get 503 + Retry-After
+    ADMISSION_BUDGETS = {
+        "llama": (2, 4, 5.0),
+        "whisper": (1, 4, 5.0),
+        "tts": (2, 8, 5.0),
+    }
+    ADMISSION_RESERVED_CPUS = 1   # cores kept free of AI work for bookings
+    ADMISSION_AI_SLOTS = None     # AI calls at once overall (None = CPUs - reserved)
+
+    # AI services (services.py) load on first use. Production workers can
+    # warm some up at startup, e.g. WARM_UP_SERVICES="dateparser,tts" or "all"
+    WARM_UP_SERVICES = os.environ.get("WARM_UP_SERVICES", "")
+    WARM_UP_BACKGROUND = True         # serve requests while warming
@@ -0,0 +1,233 @@
+# dashboard_data.py
+#
+# Queries behind the user, doctor and admin dashboards.
+# Related rows the templates reach through (booking.doctor, booking.user,
+# booking.prescription) are loaded eagerly in the same round trip, only
+# the columns the templates render are selected, and long tables are
+# cut into keyset pages so a dashboard never loads the whole system.
+# The doctor directory comes from directory_cache, not the database.
+
+import base64
+import json
+from datetime import datetime, time
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from directory_cache import directory
+from models import User, Doctor, Booking, Prescription, Notification_win
+
+# ================= CONFIG ================= #
+
+DEFAULT_PAGE_SIZE = 50
+
+BOOKING_COLUMNS = (
+    Booking.id, Booking.user_id, Booking.doctor_id,
+    Booking.start_time, Booking.end_time, Booking.status,
+    Booking.session_type, Booking.issue_description,
+    Booking.cancel_reason, Booking.token_number
+)
+
+
+class BadCursor(ValueError):
+    """The page cursor could not be decoded."""
+
+
+# ================= KEYSET PAGING ================= #
+
+def encode_cursor(*values):
+    raw = json.dumps([
+        v.isoformat() if isinstance(v, datetime) else v for v in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, *types):
+    """
+    types: one per cursor value (datetime or int).
+    Raises BadCursor for anything that is not one of our cursors.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw.decode("utf-8"))
+        if len(values) != len(types):
+            raise ValueError()
+        return [
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(values, types)
+        ]
+    except (ValueError, TypeError):
+        raise BadCursor(token)
+
+
+def keyset_page(query, columns, cursor_values, limit, descending=False):
+    """
+    Rows strictly after cursor_values in (columns...) order, plus the
+    cursor of the last row when another page exists.
+    columns must end with a unique column (the primary key).
+    """
+    if cursor_values:
+        query = query.filter(_after(columns, cursor_values, descending))
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*[getattr(last, c.key) for c in columns])
+    return rows, next_cursor
+
+
+def _after(columns, values, descending):
+    # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), portable to any DB
+    col, value = columns[0], values[0]
+    beyond = col < value if descending else col > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(col == value, _after(columns[1:], values[1:], descending)))
+
+
+# ================= DASHBOARD QUERIES ================= #
+
+def doctor_directory():
+    """Doctor cards / pickers, served from the directory cache."""
+    return directory.doctors()
+
+
+def bookings_page(user_id=None, doctor_id=None, statuses=None,
+                  date_from=None, date_to=None, cursor=None,
+                  limit=DEFAULT_PAGE_SIZE, descending=True,
+                  with_user=False, with_doctor=False, with_prescription=False):
+    """
+    One keyset page of bookings ordered by (start_time, id).
+    Filters are optional; with_* eager-load what the caller renders.
+    """
+    options = [load_only(*BOOKING_COLUMNS)]
+    if with_user:
+        options.append(joinedload(Booking.user).load_only(User.id, User.username))
+    if with_doctor:
+        options.append(joinedload(Booking.doctor).load_only(Doctor.id, Doctor.name))
+    if with_prescription:
+        options.append(selectinload(Booking.prescription).load_only(
+            Prescription.id, Prescription.booking_id
+        ))
+
+    query = Booking.query.options(*options)
+    if user_id is not None:
+        query = query.filter(Booking.user_id == user_id)
+    if doctor_id is not None:
+        query = query.filter(Booking.doctor_id == doctor_id)
+    if statuses:
+        query = query.filter(Booking.status.in_(statuses))
+    if date_from is not None:
+        query = query.filter(Booking.start_time >= date_from)
+    if date_to is not None:
+        query = query.filter(Booking.start_time < date_to)
+
+    return keyset_page(
+        query, (Booking.start_time, Booking.id),
+        decode_cursor(cursor, datetime, int) if cursor else None,
+        limit, descending=descending
+    )
+
+
+def user_bookings(user_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """A patient's bookings, newest first, with the doctor's name."""
+    return bookings_page(
+        user_id=user_id, cursor=cursor, limit=limit, with_doctor=True
+    )
+
+
+def doctor_bookings(doctor_id, cursor=None, limit=DEFAULT_PAGE_SIZE, now=None):
+    """
+    A doctor's appointments from today on, in time order, with the
+    patient's name and whether a prescription exists (one extra SELECT
+    for the whole page). Returns (rows, later_cursor, earlier_cursor);
+    the earlier cursor pages back from midnight, newest first, through
+    /api/bookings?order=desc.
+    """
+    today = datetime.combine((now or datetime.now()).date(), time.min)
+    rows, later = bookings_page(
+        doctor_id=doctor_id, date_from=None if cursor else today,
+        cursor=cursor, limit=limit, descending=False,
+        with_user=True, with_prescription=True
+    )
+    # (midnight, id 0) in descending order: everything before today
+    return rows, later, encode_cursor(today, 0)
+
+
+def admin_bookings(cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Every booking, newest first, with patient and doctor names."""
+    return bookings_page(
+        cursor=cursor, limit=limit, with_user=True, with_doctor=True
+    )
+
+
+def admin_users(cursor=None, limit=DEFAULT_PAGE_SIZE, role=None):
+    query = User.query.options(
+        load_only(User.id, User.username, User.email, User.role)
+    )
+    if role:
+        query = query.filter(User.role == role)
+
+    return keyset_page(
+        query, (User.id,),
+        decode_cursor(cursor, int) if cursor else None,
+        limit
+    )
+
+
+def doctors_page(cursor=None, limit=DEFAULT_PAGE_SIZE, department=None):
+    """Same keyset contract as the other pages, over the cached directory."""
+    after = decode_cursor(cursor, int)[0] if cursor else None
+    rows, last_id = directory.page(after, limit, department)
+    return rows, encode_cursor(last_id) if last_id is not None else None
+
+
+def unread_notifications(user_id):
+    return Notification_win.query.filter_by(
+        user_id=user_id,
+        is_read=False
+    ).order_by(Notification_win.id).all()
+
+
+# ================= JSON ================= #
+
+def _fmt(dt):
+    return dt.strftime("%Y-%m-%d %H:%M") if dt else None
+
+
+def booking_to_dict(b, with_user=False, with_doctor=False, with_prescription=False):
+    data = {
+        "id": b.id,
+        "start_time": _fmt(b.start_time),
+        "end_time": _fmt(b.end_time),
+        "status": b.status,
+        "session_type": b.session_type,
+        "issue_description": b.issue_description,
+        "cancel_reason": b.cancel_reason,
+        "token_number": b.token_number,
+        "doctor_id": b.doctor_id
+    }
+    if with_user:
+        data["user"] = {"id": b.user.id, "username": b.user.username}
+    if with_doctor:
+        data["doctor"] = {"id": b.doctor.id, "name": b.doctor.name}
+    if with_prescription:
+        data["has_prescription"] = b.prescription is not None
+    return data
+
+
+def user_to_dict(u):
+    return {"id": u.id, "username": u.username, "email": u.email, "role": u.role}
+
+
+def doctor_to_dict(d):
+    return {
+        "id": d.id,
+        "name": d.name,
+        "department": d.department,
+        "experience_years": d.experience_years
+    }
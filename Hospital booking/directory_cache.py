@@ -0,0 +1,294 @@
+# directory_cache.py
+#
+# Read-through cache of the doctor directory (doctors and departments).
+# Every dashboard, the transfer popup, /api/doctors and the department
+# slot search need the same small list, and it only changes when an
+# admin adds (or later edits) a doctor. Those routes must call
+# directory.invalidate() after committing.
+#
+# The cache holds an immutable snapshot stamped with a generation number.
+# By default the generation is local to the process; set
+# DIRECTORY_CACHE_PATH to share it through a small SQLite file so an
+# invalidation in one gunicorn worker makes every worker reload.
+
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from sqlalchemy.orm import load_only
+
+from models import Doctor
+
+# ================= CONFIG ================= #
+
+DEFAULT_TTL = 600              # seconds, safety net for missed invalidations
+DEFAULT_CHECK_INTERVAL = 1.0   # seconds between shared generation reads
+
+DoctorEntry = namedtuple(
+    "DoctorEntry", "id user_id name department experience_years"
+)
+
+
+# ================= GENERATION BACKENDS ================= #
+
+class LocalGeneration:
+    """Generation counter for a single process."""
+
+    shared = False
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def current(self):
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+class SqliteGeneration:
+    """
+    Generation counter in a SQLite file shared by every worker.
+    A connection is opened per call, so it is safe across forks.
+    """
+
+    shared = True
+
+    def __init__(self, path, name="doctor_directory"):
+        self.path = path
+        self.name = name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation ("
+                " name TEXT PRIMARY KEY,"
+                " value INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO generation VALUES (?, 0)", (self.name,)
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def current(self):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value FROM generation WHERE name = ?", (self.name,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+    def bump(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE generation SET value = value + 1 WHERE name = ?",
+                    (self.name,)
+                )
+            row = conn.execute(
+                "SELECT value FROM generation WHERE name = ?", (self.name,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0]
+
+
+# ================= SNAPSHOT ================= #
+
+class DirectorySnapshot:
+    def __init__(self, doctors, generation):
+        self.doctors = tuple(doctors)          # ordered by id
+        self.ids = [d.id for d in self.doctors]
+        self.by_id = {d.id: d for d in self.doctors}
+        self.by_user = {d.user_id: d for d in self.doctors}
+        self.departments = tuple(sorted(
+            {d.department for d in self.doctors if d.department},
+            key=str.lower
+        ))
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+
+
+# ================= CACHE ================= #
+
+class DirectoryCache:
+    """
+    Process-level read-through cache. Readers get DoctorEntry tuples,
+    which templates use exactly like Doctor rows (d.id, d.name, ...).
+    """
+
+    def __init__(self, app=None):
+        self.ttl = DEFAULT_TTL
+        self.check_interval = DEFAULT_CHECK_INTERVAL
+        self.backend = LocalGeneration()
+
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.load_ms_last = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("DIRECTORY_CACHE_TTL", DEFAULT_TTL)
+        self.check_interval = app.config.get(
+            "DIRECTORY_CACHE_CHECK_INTERVAL", DEFAULT_CHECK_INTERVAL
+        )
+        path = app.config.get("DIRECTORY_CACHE_PATH")
+        if path:
+            self.backend = SqliteGeneration(path)
+        app.extensions["directory"] = self
+
+    # ---------- loading ----------
+
+    def _load(self, generation):
+        t0 = time.perf_counter()
+        rows = Doctor.query.options(load_only(
+            Doctor.id, Doctor.user_id, Doctor.name,
+            Doctor.department, Doctor.experience_years
+        )).order_by(Doctor.id).all()
+        snapshot = DirectorySnapshot(
+            [
+                DoctorEntry(d.id, d.user_id, d.name, d.department,
+                            d.experience_years)
+                for d in rows
+            ],
+            generation
+        )
+        self.load_ms_last = round((time.perf_counter() - t0) * 1000, 2)
+        return snapshot
+
+    def _is_current(self, snapshot, now):
+        if now - snapshot.loaded_at > self.ttl:
+            return False
+        if not self.backend.shared:
+            return snapshot.generation == self.backend.current()
+        if now - self._checked_at < self.check_interval:
+            return True
+        self._checked_at = now
+        return snapshot.generation == self.backend.current()
+
+    def snapshot(self):
+        """
+        The current snapshot, loading it on a miss. Must be called
+        inside an app context. The generation is read before the
+        query, so a load racing an invalidation is stamped with the
+        old generation and replaced on the next check.
+        """
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and self._is_current(snapshot, now):
+            with self._lock:
+                self.hits += 1
+            return snapshot
+
+        return self._reload(now)
+
+    def _reload(self, now):
+        generation = self.backend.current()
+        snapshot = self._load(generation)
+        with self._lock:
+            self.misses += 1
+            self._snapshot = snapshot
+            self._checked_at = now
+        return snapshot
+
+    def _find(self, index, key):
+        """
+        Look up one doctor. An unknown key reloads once (at most every
+        check_interval): the doctor may have been added by another
+        worker that this process has not heard about yet.
+        """
+        snapshot = self.snapshot()
+        entry = getattr(snapshot, index).get(key)
+        now = time.monotonic()
+        if entry is None and now - snapshot.loaded_at > self.check_interval:
+            entry = getattr(self._reload(now), index).get(key)
+        return entry
+
+    def invalidate(self):
+        """Call after committing any change to doctors."""
+        self.backend.bump()
+        with self._lock:
+            self._snapshot = None
+            self.invalidations += 1
+
+    # ---------- lookups ----------
+
+    def doctors(self):
+        return list(self.snapshot().doctors)
+
+    def departments(self):
+        return list(self.snapshot().departments)
+
+    def get(self, doctor_id):
+        try:
+            doctor_id = int(doctor_id)
+        except (TypeError, ValueError):
+            return None
+        return self._find("by_id", doctor_id)
+
+    def by_user(self, user_id):
+        return self._find("by_user", user_id)
+
+    def in_department(self, department):
+        """Doctors of one department (case-insensitive), by name."""
+        wanted = (department or "").strip().lower()
+        return sorted(
+            (d for d in self.snapshot().doctors
+             if (d.department or "").lower() == wanted),
+            key=lambda d: d.name
+        )
+
+    def page(self, after_id=None, limit=50, department=None):
+        """Keyset page over the cached list: (doctors, last_id or None)."""
+        snapshot = self.snapshot()
+        start = bisect_right(snapshot.ids, after_id) if after_id is not None else 0
+        wanted = department.lower() if department else None
+
+        rows = []
+        for d in snapshot.doctors[start:]:
+            if wanted is not None and (d.department or "").lower() != wanted:
+                continue
+            rows.append(d)
+            if len(rows) > limit:
+                break
+
+        if len(rows) > limit:
+            return rows[:limit], rows[limit - 1].id
+        return rows, None
+
+    def stats(self):
+        with self._lock:
+            snapshot = self._snapshot
+            lookups = self.hits + self.misses
+            return {
+                "doctors": len(snapshot.doctors) if snapshot else None,
+                "departments": len(snapshot.departments) if snapshot else None,
+                "generation": snapshot.generation if snapshot else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+                "load_ms_last": self.load_ms_last,
+                "shared": self.backend.shared
+            }
+
+
+directory = DirectoryCache()
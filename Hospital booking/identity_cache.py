@@ -0,0 +1,203 @@
+# identity_cache.py
+#
+# Cached flask_login user loader. Every login_required request used to
+# SELECT the whole user row; most routes only look at current_user.id
+# and current_user.role. The loader now returns a small immutable
+# UserSnapshot (id, role, username) from a bounded TTL cache, and routes
+# that need more (email, phone, relationships) call full_user().
+#
+# Any committed change to a User row (role change, rename, delete)
+# invalidates that user. Bulk UPDATE/DELETE statements on the user
+# table clear the whole cache. Set IDENTITY_CACHE_PATH to share
+# invalidations between gunicorn workers (same scheme as the doctor
+# directory); otherwise other workers notice after IDENTITY_CACHE_TTL.
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import g
+from flask_login import UserMixin, current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from directory_cache import LocalGeneration, SqliteGeneration
+from models import db, User
+
+# ================= CONFIG ================= #
+
+DEFAULT_SIZE = 10000           # users kept per process (0 disables the cache)
+DEFAULT_TTL = 300              # seconds before a user is re-read
+DEFAULT_CHECK_INTERVAL = 1.0   # seconds between shared generation reads
+
+ALL = "all"                    # pending invalidation of every user
+
+
+# ================= SNAPSHOT ================= #
+
+class UserSnapshot(namedtuple("UserSnapshot", "id role username"), UserMixin):
+    """What current_user is on most requests. Read-only, safe to share."""
+
+    __slots__ = ()
+
+
+def full_user():
+    """The logged-in User row, loaded once per request when needed."""
+    if not current_user.is_authenticated:
+        return None
+    user = current_user._get_current_object()
+    if isinstance(user, User):
+        return user          # just logged in with the full row
+    if "full_user" not in g:
+        g.full_user = db.session.get(User, current_user.id)
+    return g.full_user
+
+
+# ================= CACHE ================= #
+
+class IdentityCache:
+    def __init__(self, app=None):
+        self.max_size = DEFAULT_SIZE
+        self.ttl = DEFAULT_TTL
+        self.check_interval = DEFAULT_CHECK_INTERVAL
+        self.backend = LocalGeneration()
+
+        self._entries = OrderedDict()   # user_id -> (snapshot, loaded_at)
+        self._generation = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_size = app.config.get("IDENTITY_CACHE_SIZE", DEFAULT_SIZE)
+        self.ttl = app.config.get("IDENTITY_CACHE_TTL", DEFAULT_TTL)
+        self.check_interval = app.config.get(
+            "IDENTITY_CACHE_CHECK_INTERVAL", DEFAULT_CHECK_INTERVAL
+        )
+        path = app.config.get("IDENTITY_CACHE_PATH")
+        if path:
+            self.backend = SqliteGeneration(path, name="identity")
+            self._generation = self.backend.current()
+        app.extensions["identity"] = self
+
+    # ---------- loading ----------
+
+    def _load(self, user_id):
+        row = db.session.query(
+            User.id, User.role, User.username
+        ).filter_by(id=user_id).first()
+        return UserSnapshot(*row) if row else None
+
+    def _check_generation(self, now):
+        """Another worker changed a user: drop everything."""
+        if not self.backend.shared or now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        generation = self.backend.current()
+        if generation != self._generation:
+            with self._lock:
+                self._entries.clear()
+                self._generation = generation
+
+    def load(self, user_id):
+        """The flask_login user_loader: a UserSnapshot, or None if gone."""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        if self.max_size <= 0:
+            return self._load(user_id)
+
+        now = time.monotonic()
+        self._check_generation(now)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        snapshot = self._load(user_id)
+        if snapshot is not None:
+            with self._lock:
+                self._entries[user_id] = (snapshot, now)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id=None):
+        """Forget one user (or everyone). Called after commit."""
+        if self.backend.shared:
+            self._generation = self.backend.bump()
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+                "shared": self.backend.shared
+            }
+
+
+identity = IdentityCache()
+
+
+# ================= INVALIDATION ================= #
+# Changed users are collected during flush and forgotten after the
+# commit, so a concurrent request cannot re-cache the old row.
+
+def _pending(session):
+    return session.info.setdefault("identity_changed", set())
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _pending(session).add(target.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_user_change(state):
+    if (state.is_update or state.is_delete) and any(
+        m.class_ is User for m in state.all_mappers
+    ):
+        _pending(state.session).add(ALL)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_changed(session):
+    changed = session.info.pop("identity_changed", None)
+    if not changed:
+        return
+    if ALL in changed:
+        identity.invalidate()
+    else:
+        for user_id in changed:
+            identity.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed(session):
+    session.info.pop("identity_changed", None)
@@ -0,0 +1,303 @@
+# jobs.py
+#
+# Small background job queue backed by the AnalysisJob table.
+# Slow work (OCR + TinyLLaMA analysis of uploaded prescriptions) runs on
+# worker threads instead of inside the HTTP request; the endpoint only
+# enqueues a job and returns its id for the client to poll.
+#
+# The job timeout is not enforced while a handler runs: a Python thread
+# cannot be interrupted. The reaper re-queues (or fails) a job once it
+# has been "running" longer than the timeout, and a handler that returns
+# after that has its result discarded. A hung handler keeps its worker
+# thread busy until it returns; handlers that call out to slow tools
+# should pass their own timeouts.
+
+import json
+import multiprocessing
+import threading
+from datetime import datetime, timedelta
+
+from models import db, AnalysisJob
+
+# ================= CONFIG ================= #
+
+DEFAULT_WORKERS = 1
+DEFAULT_MAX_IN_FLIGHT = 20     # queued + running jobs before we refuse
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 5        # seconds, multiplied by the attempt number
+DEFAULT_TIMEOUT = 300          # seconds before the reaper retries a "running" job
+POLL_INTERVAL = 2              # seconds between idle queue scans
+REAP_INTERVAL = 10             # seconds between stale job scans
+
+
+class QueueFull(Exception):
+    """Too many jobs in flight; the client should retry later."""
+
+
+class JobError(Exception):
+    """Raised by a handler to mark the attempt as failed (and retry)."""
+
+
+class JobQueue:
+    """
+    Handlers are plain functions registered per job kind:
+
+        @jobs.handler("prescription_analysis")
+        def analyse(payload):
+            return "result text"
+
+    They run inside an app context on one of the worker threads.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = DEFAULT_WORKERS
+        self.max_in_flight = DEFAULT_MAX_IN_FLIGHT
+        self.max_attempts = DEFAULT_MAX_ATTEMPTS
+        self.retry_delay = DEFAULT_RETRY_DELAY
+        self.timeout = DEFAULT_TIMEOUT
+
+        self._handlers = {}
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stopped = False
+        self._halt = threading.Event()
+
+        # counters
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get("JOB_WORKERS", DEFAULT_WORKERS)
+        self.max_in_flight = app.config.get("JOB_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)
+        self.max_attempts = app.config.get("JOB_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+        self.retry_delay = app.config.get("JOB_RETRY_DELAY", DEFAULT_RETRY_DELAY)
+        self.timeout = app.config.get("JOB_TIMEOUT", DEFAULT_TIMEOUT)
+        app.extensions["jobs"] = self
+
+        # not in child processes (TTS workers re-import the app module)
+        if self.workers > 0 and multiprocessing.parent_process() is None:
+            self.start()
+
+    def handler(self, kind):
+        def register(fn):
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    # ---------- producer side ----------
+
+    def in_flight(self):
+        return AnalysisJob.query.filter(
+            AnalysisJob.status.in_(["queued", "running"])
+        ).count()
+
+    def submit(self, kind, payload, user_id=None):
+        """
+        Add a job to the current session (the caller commits).
+        Raises QueueFull when the backlog is at its limit.
+        """
+        if self.in_flight() >= self.max_in_flight:
+            self.rejected += 1
+            raise QueueFull()
+
+        job = AnalysisJob(
+            kind=kind,
+            payload=json.dumps(payload),
+            user_id=user_id,
+            status="queued",
+            run_after=datetime.utcnow()
+        )
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        """Wake an idle worker (call after committing a new job)."""
+        with self._wakeup:
+            self._wakeup.notify()
+
+    # ---------- worker side ----------
+
+    def _claim(self):
+        """
+        Pick the oldest runnable job and flip it to running with a
+        conditional UPDATE, so two workers never take the same job.
+        """
+        now = datetime.utcnow()
+        candidate = db.session.query(AnalysisJob.id).filter(
+            AnalysisJob.status == "queued",
+            AnalysisJob.run_after <= now
+        ).order_by(AnalysisJob.id).first()
+
+        if candidate is None:
+            return None
+
+        claimed = AnalysisJob.query.filter(
+            AnalysisJob.id == candidate.id,
+            AnalysisJob.status == "queued"
+        ).update({
+            AnalysisJob.status: "running",
+            AnalysisJob.attempts: AnalysisJob.attempts + 1,
+            AnalysisJob.started_at: now
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if not claimed:
+            return None  # another worker won the race
+        return db.session.get(AnalysisJob, candidate.id)
+
+    def _reap_stale(self):
+        """
+        Jobs left in "running" longer than the timeout (worker crashed
+        or hung) are retried or failed like any other failed attempt.
+        """
+        limit = datetime.utcnow() - timedelta(seconds=self.timeout)
+        stale = db.session.query(AnalysisJob.id, AnalysisJob.attempts).filter(
+            AnalysisJob.status == "running",
+            AnalysisJob.started_at < limit
+        ).all()
+        for job_id, attempt in stale:
+            self._fail(job_id, attempt, "Timed out")
+        if stale:
+            db.session.commit()
+
+    def _settle(self, job_id, attempt, values):
+        """
+        Write the outcome of one attempt with a conditional UPDATE. A
+        late attempt that was reaped meanwhile (and maybe claimed
+        again, which bumps attempts) matches no row and changes nothing.
+        """
+        return AnalysisJob.query.filter(
+            AnalysisJob.id == job_id,
+            AnalysisJob.status == "running",
+            AnalysisJob.attempts == attempt
+        ).update(values, synchronize_session=False)
+
+    def _fail(self, job_id, attempt, error, final=False):
+        now = datetime.utcnow()
+        retry = not final and attempt < self.max_attempts
+        if retry:
+            values = {
+                AnalysisJob.status: "queued",
+                AnalysisJob.run_after: now + timedelta(
+                    seconds=self.retry_delay * attempt
+                )
+            }
+        else:
+            values = {AnalysisJob.status: "failed", AnalysisJob.finished_at: now}
+        values[AnalysisJob.error] = error
+
+        if not self._settle(job_id, attempt, values):
+            return
+        if retry:
+            self.retried += 1
+        else:
+            self.failed += 1
+
+    def _run(self, job):
+        job_id, attempt, started_at = job.id, job.attempts, job.started_at
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            self._fail(job_id, attempt, f"No handler for {job.kind}", final=True)
+            db.session.commit()
+            return
+
+        try:
+            result = handler(json.loads(job.payload or "{}"))
+        except Exception as e:
+            db.session.rollback()
+            self._fail(job_id, attempt, str(e) or e.__class__.__name__)
+            db.session.commit()
+            return
+
+        if datetime.utcnow() - started_at > timedelta(seconds=self.timeout):
+            # finished, but too late: treat like the reaper would
+            db.session.rollback()
+            self._fail(job_id, attempt, "Timed out")
+        elif self._settle(job_id, attempt, {
+            AnalysisJob.status: "done",
+            AnalysisJob.result: result,
+            AnalysisJob.error: None,
+            AnalysisJob.finished_at: datetime.utcnow()
+        }):
+            self.completed += 1
+        else:
+            # reaped while running: keep none of this attempt's writes
+            db.session.rollback()
+            return
+        db.session.commit()
+
+    def _loop(self):
+        while not self._stopped:
+            job = None
+            try:
+                with self.app.app_context():
+                    job = self._claim()
+                    if job is not None:
+                        self._run(job)
+            except Exception as e:
+                # e.g. table not created yet
+                print("Job worker error:", e)
+
+            if job is None:
+                with self._wakeup:
+                    if not self._stopped:
+                        self._wakeup.wait(timeout=POLL_INTERVAL)
+
+    def _reap_loop(self):
+        # its own thread: with every worker stuck in a hung handler the
+        # worker loops would never get round to reaping
+        while not self._stopped:
+            try:
+                with self.app.app_context():
+                    self._reap_stale()
+            except Exception as e:
+                print("Job reaper error:", e)
+
+            # not self._wakeup: notify() must reach a worker, not this
+            self._halt.wait(timeout=REAP_INTERVAL)
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopped = False
+        self._halt.clear()
+        for i in range(self.workers):
+            t = threading.Thread(
+                target=self._loop,
+                name=f"job-worker-{i}",
+                daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+        t = threading.Thread(target=self._reap_loop, name="job-reaper", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self):
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify_all()
+        self._halt.set()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rejected": self.rejected
+        }
+
+
+jobs = JobQueue()
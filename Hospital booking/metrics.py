@@ -0,0 +1,331 @@
+# metrics.py
+#
+# Instrumentation exported in Prometheus text format at GET /metrics:
+#
+#   hospital_http_request_duration_seconds   per route, method and status
+#   hospital_http_request_sql_statements     SQL statements per request
+#   hospital_http_request_sql_seconds        time spent in SQL per request
+#   hospital_ai_calls_total                  AI calls by service and outcome
+#   hospital_ai_call_duration_seconds        AI call time by service and outcome
+#   hospital_admission_total                 AI admissions and refusals (admission.py)
+#   hospital_admission_wait_seconds          queue wait of admitted AI calls
+#   hospital_admission_active / _queue_depth slots in use and callers waiting
+#
+# Request and SQL metrics are taken for a random METRICS_SAMPLE_RATE
+# share of requests (1.0 = all), so they can stay on in production;
+# unsampled requests cost one random() call. AI calls are always counted,
+# they are slow enough that the bookkeeping does not matter.
+#
+# Metrics live in the worker process. With several gunicorn workers,
+# scrape each one or sum them; a scrape only sees the worker it hit.
+
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ================= CONFIG ================= #
+
+PREFIX = "hospital_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+SQL_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+AI_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+INF = 'le="+Inf"'
+UNMATCHED = "<unmatched>"
+SKIP_ENDPOINTS = {"metrics_export"}   # the scrape itself
+
+
+# ================= PRIMITIVES ================= #
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}      # labels -> [per-bucket counts..., +Inf], sum
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted(
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._values.items()
+            )
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}"
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket{_labels(self.labels, labels, INF)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help, read, labels=()):
+        self.name = PREFIX + name
+        self.help = help
+        self.read = read       # () -> number, or {label values: number}
+        self.labels = tuple(labels)
+
+    def samples(self):
+        if not self.labels:
+            yield f"{self.name} {_number(self.read())}"
+            return
+        for labels, value in sorted(self.read().items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+# ================= AI CALLS ================= #
+
+class AICall:
+    """Handle for metrics.ai_call(); set .outcome before leaving."""
+
+    def __init__(self):
+        self.outcome = "ok"
+
+
+# ================= METRICS ================= #
+
+class Metrics:
+    def __init__(self, app=None):
+        self.enabled = True
+        self.sample_rate = 1.0
+        self.allowed_ips = ("127.0.0.1", "::1")
+        self._local = threading.local()
+        self._started = time.time()
+
+        self.requests = Histogram(
+            "http_request_duration_seconds",
+            "Time until the response is returned (streams: until headers).",
+            ("method", "route", "status")
+        )
+        self.sql_statements = Histogram(
+            "http_request_sql_statements",
+            "SQL statements executed while handling a request.",
+            ("route",), SQL_COUNT_BUCKETS
+        )
+        self.sql_seconds = Histogram(
+            "http_request_sql_seconds",
+            "Time spent executing SQL while handling a request.",
+            ("route",), SQL_TIME_BUCKETS
+        )
+        self.ai_calls = Counter(
+            "ai_calls_total",
+            "AI backend calls by outcome (cached and unavailable included).",
+            ("service", "backend", "outcome")
+        )
+        self.ai_seconds = Histogram(
+            "ai_call_duration_seconds",
+            "AI backend call time by outcome.",
+            ("service", "backend", "outcome"), AI_BUCKETS
+        )
+        self.admissions = Counter(
+            "admission_total",
+            "AI calls admitted or refused (queue_full, timeout) by backend.",
+            ("backend", "outcome")
+        )
+        self.admission_wait = Histogram(
+            "admission_wait_seconds",
+            "Time admitted AI calls waited for a slot.",
+            ("backend",), WAIT_BUCKETS
+        )
+        self._collectors = [
+            self.requests, self.sql_statements, self.sql_seconds,
+            self.ai_calls, self.ai_seconds, self.admissions, self.admission_wait,
+            Gauge("metrics_sample_rate",
+                  "Share of requests with request and SQL metrics.",
+                  lambda: self.sample_rate),
+            Gauge("process_start_time_seconds",
+                  "Start time of the worker since the epoch.",
+                  lambda: self._started),
+        ]
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", True)
+        self.sample_rate = app.config.get("METRICS_SAMPLE_RATE", 1.0)
+        self.allowed_ips = tuple(app.config.get("METRICS_ALLOWED_IPS", self.allowed_ips))
+        app.extensions["metrics"] = self
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+        # every engine, so the per-app engine needs no app context here
+        if not event.contains(Engine, "before_cursor_execute", self._before_cursor):
+            event.listen(Engine, "before_cursor_execute", self._before_cursor)
+            event.listen(Engine, "after_cursor_execute", self._after_cursor)
+
+    # ---------- requests ----------
+
+    def _before_request(self):
+        self._local.sql = None
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        if request.endpoint in SKIP_ENDPOINTS:
+            return
+        g._metrics_started = time.perf_counter()
+        self._local.sql = [0, 0.0]
+
+    def _observe_request(self, status):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            self.requests.observe(
+                time.perf_counter() - started,
+                request.method, self._route(), str(status)
+            )
+
+    def _route(self):
+        return request.url_rule.rule if request.url_rule else UNMATCHED
+
+    def _after_request(self, response):
+        self._observe_request(response.status_code)
+        return response
+
+    def _teardown_request(self, exc):
+        # unhandled exception: after_request did not run
+        self._observe_request(500)
+
+        # SQL is counted until here, so streamed bodies are included
+        sql = getattr(self._local, "sql", None)
+        self._local.sql = None
+        if sql is not None:
+            self.sql_statements.observe(sql[0], self._route())
+            self.sql_seconds.observe(sql[1], self._route())
+
+    # ---------- SQL ----------
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None and getattr(self._local, "sql", None) is not None:
+            context._metrics_started = time.perf_counter()
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        sql = getattr(self._local, "sql", None)
+        started = getattr(context, "_metrics_started", None)
+        if sql is None or started is None:
+            return
+        sql[0] += 1
+        sql[1] += time.perf_counter() - started
+
+    # ---------- AI backends ----------
+
+    def observe_ai(self, service, backend, outcome, seconds=None):
+        """Count one AI call; seconds=None for calls that did no work."""
+        if not self.enabled:
+            return
+        self.ai_calls.inc(service, backend, outcome)
+        if seconds is not None:
+            self.ai_seconds.observe(seconds, service, backend, outcome)
+
+    @contextmanager
+    def ai_call(self, service, backend):
+        """
+        Time a block that calls an AI backend. Outcome "ok" unless the
+        block sets call.outcome; an escaping exception counts as "error".
+        """
+        call = AICall()
+        started = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            if call.outcome == "ok":
+                call.outcome = "error"
+            raise
+        finally:
+            self.observe_ai(service, backend, call.outcome,
+                            time.perf_counter() - started)
+
+    def observe_admission(self, backend, outcome, waited=None):
+        """Count one admission decision; waited only for admitted calls."""
+        if not self.enabled:
+            return
+        self.admissions.inc(backend, outcome)
+        if waited is not None:
+            self.admission_wait.observe(waited, backend)
+
+    # ---------- export ----------
+
+    def allowed(self, remote_addr):
+        return self.enabled and remote_addr in self.allowed_ips
+
+    def register(self, collector):
+        """Export a collector owned by another module (e.g. a Gauge)."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for collector in self._collectors:
+            lines.append(f"# HELP {collector.name} {collector.help}")
+            lines.append(f"# TYPE {collector.name} {collector.kind}")
+            lines.extend(collector.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
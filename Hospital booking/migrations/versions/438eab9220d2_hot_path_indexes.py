@@ -0,0 +1,43 @@
+"""hot path indexes
+
+Composite indexes matched to the hot query shapes (see the comments in
+models.py and benchmarks/query_plans.py). IF NOT EXISTS because
+databases set up with create_missing_indexes() may already have some.
+
+Revision ID: 438eab9220d2
+Revises: 96fdb1d6021c
+Create Date: 2026-10-17 02:47:57.051871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '438eab9220d2'
+down_revision = '96fdb1d6021c'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('booking', 'ix_booking_doctor_status_time', ['doctor_id', 'status', 'start_time', 'end_time']),
+    ('booking', 'ix_booking_user_time', ['user_id', 'start_time']),
+    ('booking', 'ix_booking_status_start', ['status', 'start_time']),
+    ('booking', 'ix_booking_status_end', ['status', 'end_time']),
+    ('booking', 'ix_booking_start_time', ['start_time']),
+    ('doctor', 'ix_doctor_user_id', ['user_id']),
+    ('notification_win', 'ix_notification_win_user_read', ['user_id', 'is_read']),
+    ('prescription', 'ix_prescription_booking_id', ['booking_id']),
+    ('user', 'ix_user_role', ['role']),
+]
+
+
+def upgrade():
+    for table, name, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for table, name, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,46 @@
+"""analysis job table
+
+Background job queue (jobs.py). Skipped when the table exists, as in
+databases created by an earlier version of the baseline revision.
+
+Revision ID: bc08c833e731
+Revises: f5b5d39c3243
+Create Date: 2026-10-17 03:31:40.915562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bc08c833e731'
+down_revision = 'f5b5d39c3243'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('analysis_job'):
+        op.create_table('analysis_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.String(length=40), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('run_after', sa.DateTime(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index('ix_job_status_run_after', 'analysis_job', ['status', 'run_after'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_job_status_run_after', table_name='analysis_job', if_exists=True)
+    op.drop_table('analysis_job')
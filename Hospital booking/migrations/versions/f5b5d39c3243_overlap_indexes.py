@@ -0,0 +1,36 @@
+"""overlap indexes
+
+(doctor_id, start_time, end_time) indexes behind the booking and
+schedule overlap checks. IF NOT EXISTS because databases created
+by an earlier version of the baseline revision already have them.
+
+Revision ID: f5b5d39c3243
+Revises: 438eab9220d2
+Create Date: 2026-10-17 03:31:12.408113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b5d39c3243'
+down_revision = '438eab9220d2'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('booking', 'ix_booking_doctor_time', ['doctor_id', 'start_time', 'end_time']),
+    ('doctor_schedule', 'ix_schedule_doctor_time', ['doctor_id', 'start_time', 'end_time']),
+]
+
+
+def upgrade():
+    for table, name, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for table, name, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
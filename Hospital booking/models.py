@@ -2,6 +2,8 @@
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -20,7 +22,7 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(200), nullable=False)
 
     # user | doctor | admin
-    role = db.Column(db.String(20), default="user")
+    role = db.Column(db.String(20), default="user", index=True)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -35,7 +37,7 @@ class User(db.Model, UserMixin):
 class Doctor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
 
     name = db.Column(db.String(120), nullable=False)
     department = db.Column(db.String(120))
@@ -61,6 +63,10 @@ class DoctorSchedule(db.Model):
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_schedule_doctor_time", "doctor_id", "start_time", "end_time"),
+    )
+
 
 # =========================
 # BOOKING TABLE
@@ -88,6 +94,23 @@ class Booking(db.Model):
 
     prescription = db.relationship("Prescription", backref="booking", uselist=False)
 
+    # Each index matches one hot query shape; see
+    # benchmarks/query_plans.py, which fails on a full table scan.
+    __table_args__ = (
+        # doctor dashboard pages (doctor_id, ordered by start_time)
+        db.Index("ix_booking_doctor_time", "doctor_id", "start_time", "end_time"),
+        # slot conflict checks, availability index, department free slots
+        db.Index("ix_booking_doctor_status_time",
+                 "doctor_id", "status", "start_time", "end_time"),
+        # patient dashboard pages
+        db.Index("ix_booking_user_time", "user_id", "start_time"),
+        # status engine: next boundary and booked -> ongoing -> completed
+        db.Index("ix_booking_status_start", "status", "start_time"),
+        db.Index("ix_booking_status_end", "status", "end_time"),
+        # admin booking pages (all bookings, ordered by start_time)
+        db.Index("ix_booking_start_time", "start_time"),
+    )
+
 
 # =========================
 # PRESCRIPTION TABLE
@@ -95,7 +118,7 @@ class Booking(db.Model):
 class Prescription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
-    booking_id = db.Column(db.Integer, db.ForeignKey("booking.id"), nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey("booking.id"), nullable=False, index=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey("doctor.id"), nullable=False)
 
     report_text = db.Column(db.Text)
@@ -126,3 +149,126 @@ class Notification_win(db.Model):
     message = db.Column(db.String(500))
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # unread badge and mark_read
+        db.Index("ix_notification_win_user_read", "user_id", "is_read"),
+    )
+
+
+# =========================
+# BACKGROUND JOBS
+# =========================
+class AnalysisJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+
+    # e.g. "prescription_analysis"
+    kind = db.Column(db.String(40), nullable=False)
+    payload = db.Column(db.Text)          # JSON
+
+    # queued | running | done | failed
+    status = db.Column(db.String(20), default="queued", nullable=False)
+
+    attempts = db.Column(db.Integer, default=0)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("ix_job_status_run_after", "status", "run_after"),
+    )
+
+
+# =========================
+# INDEX HELPERS
+# =========================
+def create_missing_indexes():
+    """
+    db.create_all() skips tables that already exist, so indexes
+    added to an existing database are created here (IF NOT EXISTS).
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+# =========================
+# DATABASE PROFILE
+# =========================
+def normalise_database_uri(uri):
+    # Heroku-style "postgres://" is not accepted by SQLAlchemy 1.4+
+    if uri.startswith("postgres://"):
+        return "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the configured URI and DB_PROFILE.
+    Options already set in SQLALCHEMY_ENGINE_OPTIONS win.
+    """
+    options = {}
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+
+    if config.get("DB_PROFILE") == "production" and not _is_memory_sqlite(url):
+        options.update(
+            pool_size=config.get("DB_POOL_SIZE", 10),
+            max_overflow=config.get("DB_MAX_OVERFLOW", 20),
+            pool_timeout=config.get("DB_POOL_TIMEOUT", 10),
+        )
+        if url.get_backend_name() == "sqlite":
+            # busy waiting is done by PRAGMA busy_timeout; the pool is
+            # shared by the request threads of one worker
+            options["connect_args"] = {"check_same_thread": False}
+        else:
+            # drop connections the server closed while idle
+            options["pool_pre_ping"] = True
+            options["pool_recycle"] = config.get("DB_POOL_RECYCLE", 1800)
+
+    options.update(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    return options
+
+
+def _apply_sqlite_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def configure_database(app):
+    """
+    Use instead of db.init_app(app): applies the DB_PROFILE engine
+    options, then sets the SQLite pragmas on every new connection.
+    """
+    app.config["SQLALCHEMY_DATABASE_URI"] = normalise_database_uri(
+        app.config["SQLALCHEMY_DATABASE_URI"]
+    )
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+    db.init_app(app)
+
+    if app.config.get("DB_PROFILE") != "production":
+        return
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == "sqlite":
+            event.listen(
+                engine, "connect",
+                _apply_sqlite_pragmas(app.config.get("SQLITE_PRAGMAS") or {})
+            )
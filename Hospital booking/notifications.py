@@ -0,0 +1,53 @@
+# notifications.py
+#
+# Set-based writes for the patient notification popup (Notification_win).
+# Marking as read is one UPDATE, and fanning out to many patients is
+# one executemany INSERT, instead of loading and saving row by row.
+# Nothing here commits: callers decide the transaction.
+
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import insert, update
+
+from models import db, Notification_win
+
+
+def mark_read(user_id):
+    """Mark every unread notification of a user as read. Returns the count."""
+    result = db.session.execute(
+        update(Notification_win)
+        .filter_by(user_id=user_id, is_read=False)
+        .values(is_read=True)
+    )
+    return result.rowcount
+
+
+def notify_many(rows):
+    """
+    Bulk insert notifications. rows: iterable of (user_id, message).
+    Returns the number of rows inserted.
+    """
+    now = datetime.utcnow()
+    values = [
+        {"user_id": user_id, "message": message, "is_read": False, "created_at": now}
+        for user_id, message in rows
+    ]
+    if values:
+        db.session.execute(insert(Notification_win), values)
+    return len(values)
+
+
+def per_patient(user_ids, make_message):
+    """
+    One notification per patient instead of one per booking.
+    make_message(n) builds the text for a patient with n bookings.
+    """
+    return [
+        (user_id, make_message(n))
+        for user_id, n in Counter(user_ids).items()
+    ]
+
+
+def bookings_phrase(n):
+    return f"{n} booking{'' if n == 1 else 's'}"
@@ -0,0 +1,305 @@
+# push.py
+#
+# Per-user push channel over Server-Sent Events (GET /api/push/stream).
+# Routes publish events after they commit (a transfer, a cancellation)
+# and every open stream of that user receives them at once, so patients
+# no longer have to reload the dashboard to see changes.
+#
+# The hub fans out in-process. A broker decides how events reach the
+# hub: "local" delivers directly (one worker), "sqlite" relays through a
+# small SQLite file that every worker polls (several gunicorn workers).
+# Each open stream holds one worker thread, so run gunicorn with
+# threaded (gthread) or async workers.
+
+import json
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+# ================= CONFIG ================= #
+
+DEFAULT_MAX_CONNECTIONS = 500
+DEFAULT_QUEUE_SIZE = 100       # undelivered events kept per connection
+DEFAULT_HEARTBEAT = 15         # seconds between keep-alive comments
+DEFAULT_MAX_STREAM = 300       # seconds before the client is asked to reconnect
+DEFAULT_POLL_INTERVAL = 0.25   # seconds, sqlite broker
+RETRY_MS = 3000                # EventSource reconnect delay
+
+LATENCY_SAMPLES = 1000
+
+
+class TooManyConnections(Exception):
+    pass
+
+
+# ================= BROKERS ================= #
+
+class LocalBroker:
+    """Single process: published events go straight to the hub."""
+
+    name = "local"
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, message):
+        self._deliver(message)
+
+    def stop(self):
+        pass
+
+
+class SqliteBroker:
+    """
+    Several processes: events are appended to a SQLite table and every
+    process polls for rows it has not seen. The publishing process
+    delivers its own events directly and skips them when polling.
+    """
+
+    name = "sqlite"
+    KEEP_SECONDS = 60
+
+    def __init__(self, path, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.origin = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._last_id = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS push_event ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " origin TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " message TEXT NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def start(self, deliver):
+        self._deliver = deliver
+        # not in child processes (TTS workers re-import the app module)
+        if multiprocessing.parent_process() is not None:
+            return
+        with self._connect() as conn:
+            # only events published from now on
+            self._last_id = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM push_event"
+            ).fetchone()[0]
+        threading.Thread(
+            target=self._poll, name="push-broker", daemon=True
+        ).start()
+
+    def publish(self, message):
+        self._deliver(message)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO push_event (origin, created_at, message)"
+                    " VALUES (?, ?, ?)",
+                    (self.origin, time.time(), json.dumps(message))
+                )
+        finally:
+            conn.close()
+
+    def _poll(self):
+        conn = self._connect()
+        last_prune = 0.0
+        try:
+            while not self._stop.wait(self.poll_interval):
+                rows = conn.execute(
+                    "SELECT id, origin, message FROM push_event"
+                    " WHERE id > ? ORDER BY id",
+                    (self._last_id,)
+                ).fetchall()
+                for row_id, origin, message in rows:
+                    self._last_id = row_id
+                    if origin != self.origin:
+                        self._deliver(json.loads(message))
+
+                now = time.time()
+                if now - last_prune > self.KEEP_SECONDS:
+                    last_prune = now
+                    with conn:
+                        conn.execute(
+                            "DELETE FROM push_event WHERE created_at < ?",
+                            (now - self.KEEP_SECONDS,)
+                        )
+        except Exception as e:
+            print("Push broker stopped:", e)
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+def create_broker(config):
+    kind = config.get("PUSH_BROKER", "local")
+    if kind == "local":
+        return LocalBroker()
+    if kind == "sqlite":
+        return SqliteBroker(
+            config["PUSH_BROKER_PATH"],
+            poll_interval=config.get("PUSH_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+        )
+    raise ValueError(f"Unknown PUSH_BROKER: {kind}")
+
+
+# ================= HUB ================= #
+
+class Subscription:
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.opened_at = time.monotonic()
+
+
+class PushHub:
+    def __init__(self, app=None):
+        self.max_connections = DEFAULT_MAX_CONNECTIONS
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        self.heartbeat = DEFAULT_HEARTBEAT
+        self.max_stream = DEFAULT_MAX_STREAM
+        self.broker = None
+
+        self._subs = {}               # user_id -> set of Subscription
+        self._count = 0
+        self._lock = threading.Lock()
+
+        # stats
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.peak_connections = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_connections = app.config.get("PUSH_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)
+        self.queue_size = app.config.get("PUSH_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+        self.heartbeat = app.config.get("PUSH_HEARTBEAT", DEFAULT_HEARTBEAT)
+        self.max_stream = app.config.get("PUSH_MAX_STREAM_SECONDS", DEFAULT_MAX_STREAM)
+        self.set_broker(create_broker(app.config))
+        app.extensions["push"] = self
+
+    def set_broker(self, broker):
+        if self.broker is not None:
+            self.broker.stop()
+        self.broker = broker
+        broker.start(self._deliver)
+
+    # ---------- connections ----------
+
+    def subscribe(self, user_id):
+        sub = Subscription(user_id, self.queue_size)
+        with self._lock:
+            if self._count >= self.max_connections:
+                self.rejected += 1
+                raise TooManyConnections()
+            self._subs.setdefault(user_id, set()).add(sub)
+            self._count += 1
+            self.peak_connections = max(self.peak_connections, self._count)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.user_id)
+            if subs and sub in subs:
+                subs.discard(sub)
+                self._count -= 1
+                if not subs:
+                    del self._subs[sub.user_id]
+
+    # ---------- events ----------
+
+    def publish(self, user_id, event, data):
+        """Send an event to every open stream of one user."""
+        if self.broker is None:
+            self.set_broker(LocalBroker())
+        with self._lock:
+            self.published += 1
+        self.broker.publish({
+            "user_id": user_id,
+            "event": event,
+            "data": data,
+            "ts": time.time()
+        })
+
+    def _deliver(self, message):
+        with self._lock:
+            subs = list(self._subs.get(message["user_id"], ()))
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                # a stalled client; it reloads its state on reconnect
+                with self._lock:
+                    self.dropped += 1
+
+    def stream(self, sub):
+        """
+        SSE body for one subscription. Ends after max_stream seconds
+        (EventSource reconnects) and always unsubscribes.
+        """
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            deadline = sub.opened_at + self.max_stream
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    message = sub.queue.get(timeout=min(self.heartbeat, remaining))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                latency = (time.time() - message["ts"]) * 1000
+                with self._lock:
+                    self.delivered += 1
+                    self._latencies.append(latency)
+
+                data = dict(message["data"], ts=message["ts"])
+                yield f"event: {message['event']}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "broker": self.broker.name if self.broker else None,
+                "connections": self._count,
+                "users": len(self._subs),
+                "peak_connections": self.peak_connections,
+                "max_connections": self.max_connections,
+                "published": self.published,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "fanout_ms_avg": (
+                    round(sum(latencies) / len(latencies), 2) if latencies else None
+                ),
+                "fanout_ms_p95": (
+                    round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+                    if latencies else None
+                )
+            }
+
+
+push = PushHub()
@@ -0,0 +1,300 @@
+# reservation.py
+#
+# Atomic slot reservation for /api/book.
+# The schedule check, the conflict check and the INSERT run inside one
+# write transaction, so two patients can no longer both pass the checks
+# and double-book the same doctor.
+# Single booking transfers go through the same checks against the new
+# doctor. Also the admin bulk operations: transfer or cancel all of a
+# doctor's bookings in a date range, with patient notifications, in one
+# transaction.
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from sqlalchemy import text, update
+from sqlalchemy.exc import OperationalError
+
+from availability import DoctorAvailability, slot_refusal
+from directory_cache import directory
+from models import db, Doctor, DoctorSchedule, Booking
+from notifications import notify_many, per_patient, bookings_phrase
+
+# ================= CONFIG ================= #
+
+ACTIVE_STATUSES = ("booked", "ongoing")
+
+# Retries when SQLite reports "database is locked" (another process holds
+# the write lock longer than the driver's busy timeout).
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.05  # seconds, doubled per attempt
+
+BUSY_REASON = "Server busy, please try again"
+
+# ids per "WHERE id IN (...)" statement in the bulk operations
+BULK_BATCH_SIZE = 500
+
+# ================= PER DOCTOR LOCKS ================= #
+
+_locks = defaultdict(threading.Lock)
+_locks_guard = threading.Lock()
+
+
+def _doctor_lock(doctor_id):
+    with _locks_guard:
+        return _locks[doctor_id]
+
+
+def _begin_write(doctor_id):
+    """
+    Take the database write lock before reading anything.
+    SQLite: BEGIN IMMEDIATE (one writer at a time across processes).
+    Server databases: lock the doctor row for the rest of the transaction.
+    """
+    if db.engine.dialect.name == "sqlite":
+        db.session.execute(text("BEGIN IMMEDIATE"))
+    else:
+        Doctor.query.filter_by(id=doctor_id).with_for_update().first()
+
+
+def _begin_write_many(doctor_ids):
+    """_begin_write for several doctors; rows are locked in id order."""
+    if db.engine.dialect.name == "sqlite":
+        db.session.execute(text("BEGIN IMMEDIATE"))
+    else:
+        Doctor.query.filter(Doctor.id.in_(doctor_ids)).order_by(
+            Doctor.id
+        ).with_for_update().all()
+
+
+# ================= RESERVE ================= #
+
+def reserve_booking(user_id, doctor_id, start_time, end_time, **fields):
+    """
+    Check the doctor's schedule and existing bookings, then insert,
+    all while holding the write lock.
+    Returns (booking, None) on success or (None, reason) on failure.
+    """
+    lock = _doctor_lock(doctor_id)
+
+    for attempt in range(MAX_RETRIES):
+        # end any implicit read transaction left by earlier queries in
+        # this request (e.g. the user loader) and hand its pooled
+        # connection back before waiting on the doctor lock
+        db.session.commit()
+
+        with lock:
+            try:
+                _begin_write(doctor_id)
+
+                reason = slot_refusal(doctor_id, start_time, end_time)
+                if reason:
+                    db.session.rollback()
+                    return None, reason
+
+                booking = Booking(
+                    user_id=user_id,
+                    doctor_id=doctor_id,
+                    start_time=start_time,
+                    end_time=end_time,
+                    status="booked",
+                    **fields
+                )
+                db.session.add(booking)
+                db.session.commit()
+                return booking, None
+
+            except OperationalError as e:
+                db.session.rollback()
+                if "locked" not in str(e).lower():
+                    raise
+
+        time.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+    return None, BUSY_REASON
+
+
+# ================= BULK TRANSFER / CANCEL ================= #
+
+def _run_locked(doctor_ids, work):
+    """
+    Run work() inside one write transaction holding the per-doctor
+    locks (taken in id order) and commit. Retries on "database is
+    locked" like reserve_booking. Returns (result, None) or (None, reason).
+    """
+    doctor_ids = sorted(set(doctor_ids))
+
+    for attempt in range(MAX_RETRIES):
+        db.session.commit()
+
+        with ExitStack() as stack:
+            for doctor_id in doctor_ids:
+                stack.enter_context(_doctor_lock(doctor_id))
+            try:
+                _begin_write_many(doctor_ids)
+                result = work()
+                db.session.commit()
+                return result, None
+
+            except OperationalError as e:
+                db.session.rollback()
+                if "locked" not in str(e).lower():
+                    raise
+
+        time.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+    return None, BUSY_REASON
+
+
+def reassign_booking(booking_id, to_doctor_id):
+    """
+    Move one booking to another doctor. An active booking must pass the
+    new doctor's schedule and conflict check, like reserve_booking.
+    The patient is notified in the same transaction.
+    Returns ({"from_doctor_id", "user_id", "status", "message"}, None)
+    or (None, reason).
+    """
+    booking = db.session.get(Booking, booking_id)
+    if booking is None:
+        return None, "Booking not found"
+    from_doctor_id = booking.doctor_id
+    old_doctor = directory.get(from_doctor_id)
+    old_name = old_doctor.name if old_doctor is not None else "(removed)"
+    new_name = directory.get(to_doctor_id).name
+
+    def work():
+        # re-read under the lock: it may have been cancelled or moved
+        db.session.refresh(booking)
+        if booking.doctor_id != from_doctor_id:
+            return None, "Booking was changed, please reload"
+        if booking.status in ACTIVE_STATUSES:
+            reason = slot_refusal(
+                to_doctor_id, booking.start_time, booking.end_time,
+                ignore_booking_id=booking.id
+            )
+            if reason:
+                return None, reason
+
+        booking.doctor_id = to_doctor_id
+        message = f"1 booking transferred from Dr. {old_name} to Dr. {new_name}."
+        notify_many([(booking.user_id, message)])
+        return {
+            "from_doctor_id": from_doctor_id,
+            "user_id": booking.user_id,
+            "status": booking.status,
+            "message": message
+        }, None
+
+    result, error = _run_locked([from_doctor_id, to_doctor_id], work)
+    if error:
+        return None, error
+    return result
+
+
+def _booked_in_range(doctor_id, date_from, date_to):
+    """Booked (not yet started) appointments starting in [date_from, date_to)."""
+    return db.session.query(
+        Booking.id, Booking.user_id, Booking.start_time, Booking.end_time
+    ).filter(
+        Booking.doctor_id == doctor_id,
+        Booking.status == "booked",
+        Booking.start_time >= date_from,
+        Booking.start_time < date_to
+    ).order_by(Booking.start_time).all()
+
+
+def _update_in_batches(ids, **values):
+    for i in range(0, len(ids), BULK_BATCH_SIZE):
+        db.session.execute(
+            update(Booking)
+            .where(Booking.id.in_(ids[i:i + BULK_BATCH_SIZE]))
+            .values(**values)
+        )
+
+
+def bulk_cancel(doctor_id, date_from, date_to, reason):
+    """
+    Cancel every booked appointment of a doctor in the range and send
+    each affected patient one notification.
+    Returns ({"cancelled": [ids], "notified": n, "notices": [(user_id,
+    message)]}, None) or (None, reason).
+    """
+    doctor_name = directory.get(doctor_id).name
+
+    def work():
+        rows = _booked_in_range(doctor_id, date_from, date_to)
+        ids = [r.id for r in rows]
+        _update_in_batches(ids, status="cancelled", cancel_reason=reason)
+        notices = per_patient(
+            [r.user_id for r in rows],
+            lambda n: f"{bookings_phrase(n)} with Dr. {doctor_name} cancelled: {reason}"
+        )
+        return {"cancelled": ids, "notified": notify_many(notices), "notices": notices}
+
+    return _run_locked([doctor_id], work)
+
+
+def bulk_transfer(from_doctor_id, to_doctor_id, date_from, date_to):
+    """
+    Move every booked appointment of a doctor in the range to another
+    doctor and send each affected patient one notification.
+    Appointments outside the new doctor's schedule or overlapping their
+    active bookings stay where they are and are returned as conflicts.
+    Returns ({"moved": [ids], "conflicts": [ids], "notified": n,
+    "notices": [(user_id, message)]}, None) or (None, reason).
+    """
+    old_name = directory.get(from_doctor_id).name
+    new_name = directory.get(to_doctor_id).name
+
+    def work():
+        rows = _booked_in_range(from_doctor_id, date_from, date_to)
+        if not rows:
+            return {"moved": [], "conflicts": [], "notified": 0, "notices": []}
+
+        # the new doctor's schedule and bookings around the range,
+        # checked in memory
+        range_start = rows[0].start_time
+        range_end = max(r.end_time for r in rows)
+        windows = db.session.query(
+            DoctorSchedule.start_time, DoctorSchedule.end_time
+        ).filter(
+            DoctorSchedule.doctor_id == to_doctor_id,
+            DoctorSchedule.start_time < range_end,
+            DoctorSchedule.end_time > range_start
+        ).all()
+        busy = db.session.query(
+            Booking.start_time, Booking.end_time, Booking.id
+        ).filter(
+            Booking.doctor_id == to_doctor_id,
+            Booking.status.in_(ACTIVE_STATUSES),
+            Booking.start_time < range_end,
+            Booking.end_time > range_start
+        ).all()
+        target = DoctorAvailability(
+            schedules=[tuple(w) for w in windows],
+            bookings=[tuple(b) for b in busy]
+        )
+
+        moved, conflicts = [], []
+        for r in rows:
+            if not target.is_free(r.start_time, r.end_time):
+                conflicts.append(r)
+            else:
+                target.add_booking(r.id, r.start_time, r.end_time)
+                moved.append(r)
+
+        _update_in_batches([r.id for r in moved], doctor_id=to_doctor_id)
+        notices = per_patient(
+            [r.user_id for r in moved],
+            lambda n: f"{bookings_phrase(n)} transferred from Dr. {old_name} to Dr. {new_name}."
+        )
+        return {
+            "moved": [r.id for r in moved],
+            "conflicts": [r.id for r in conflicts],
+            "notified": notify_many(notices),
+            "notices": notices
+        }
+
+    return _run_locked([from_doctor_id, to_doctor_id], work)
@@ -0,0 +1,170 @@
+# response_cache.py
+#
+# LRU + TTL cache for assistant replies. Patients ask the same few
+# questions over and over and generation runs at a low temperature,
+# so a repeated prompt can reuse the previous answer.
+# Optionally mirrored to a small SQLite file so answers survive restarts.
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ================= CONFIG ================= #
+
+DEFAULT_SIZE = 256
+DEFAULT_TTL = 24 * 3600   # seconds
+
+
+def normalise_prompt(text):
+    """
+    Case, spacing and trailing punctuation do not change the answer:
+    "What are visiting hours?" == "  what are visiting hours "
+    """
+    text = " ".join((text or "").lower().split())
+    return re.sub(r"[\s.!?,;:]+$", "", text)
+
+
+def cache_key(system_prompt, user_prompt, variant="chat"):
+    raw = "\0".join([variant, system_prompt or "", normalise_prompt(user_prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    In-memory OrderedDict LRU with per-entry expiry.
+    If `path` is set every entry is also written to SQLite and
+    memory misses fall through to it.
+    """
+
+    def __init__(self, max_size=DEFAULT_SIZE, ttl=DEFAULT_TTL, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+
+        self._items = OrderedDict()   # key -> (reply, expires_at)
+        self._lock = threading.Lock()
+        self._db = None
+
+        # stats
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            self._open_disk(path)
+
+    # ---------- disk ----------
+
+    def _open_disk(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " reply TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "DELETE FROM responses WHERE expires_at <= ?", (time.time(),)
+        )
+        self._db.commit()
+
+    def _disk_get(self, key):
+        row = self._db.execute(
+            "SELECT reply, expires_at FROM responses"
+            " WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        if row:
+            self._db.execute(
+                "UPDATE responses SET used_at = ? WHERE key = ?",
+                (time.time(), key)
+            )
+            self._db.commit()
+        return row
+
+    def _disk_put(self, key, reply, expires_at):
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+            (key, reply, expires_at, now)
+        )
+        # keep the file bounded like the memory side: drop expired
+        # rows and the least recently used beyond max_size
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        cur = self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY used_at DESC"
+            " LIMIT -1 OFFSET ?)",
+            (self.max_size,)
+        )
+        self.evictions += max(cur.rowcount, 0)
+        self._db.commit()
+
+    # ---------- API ----------
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                reply, expires_at = item
+                if expires_at > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return reply
+                del self._items[key]
+
+            if self._db is not None:
+                row = self._disk_get(key)
+                if row:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, reply):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, reply, expires_at)
+            if self._db is not None:
+                self._disk_put(key, reply, expires_at)
+
+    def _remember(self, key, reply, expires_at):
+        self._items[key] = (reply, expires_at)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            if self._db is None:
+                # with a disk mirror the entry is still reachable
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "persistent": self._db is not None
+            }
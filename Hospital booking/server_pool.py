@@ -0,0 +1,435 @@
+# server_pool.py
+#
+# Small pool of long-lived local inference servers (llama-server,
+# whisper-server, ...). Each worker is one process listening on its own
+# localhost port with the model already loaded; callers borrow a worker,
+# talk HTTP to it and give it back. Every app worker process has its
+# own pool on its own ports.
+
+import atexit
+import json
+import queue
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from contextlib import contextmanager
+
+# ================= CONFIG ================= #
+
+HOST = "127.0.0.1"
+STARTUP_TIMEOUT = 120     # seconds to wait for a model to load
+HEALTH_INTERVAL = 30      # seconds between health checks
+PORT_RELEASE_WAIT = 5     # seconds a fixed port may take to free up
+STOP_TIMEOUT = 5          # seconds a server gets to exit before it is killed
+
+
+class PoolBusy(Exception):
+    """All workers are busy and the queue wait timed out."""
+
+
+class PoolUnavailable(Exception):
+    """No worker could be started (missing binary / model)."""
+
+
+# ================= HTTP HELPERS ================= #
+
+def http_json(url, payload=None, timeout=60):
+    """
+    GET (payload=None) or POST JSON to a local server.
+    Returns the decoded JSON body.
+    """
+    data = None
+    headers = {}
+    if payload is not None:
+        data = json.dumps(payload).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+
+    req = urllib.request.Request(url, data=data, headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as res:
+        return json.loads(res.read().decode("utf-8") or "{}")
+
+
+def http_stream_lines(url, payload, timeout=60):
+    """
+    POST JSON and yield the response body line by line as it arrives
+    (Server-Sent Events from llama-server). Closing the generator
+    closes the connection, which makes the server stop generating.
+    """
+    data = json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    res = urllib.request.urlopen(req, timeout=timeout)
+    try:
+        for raw in res:
+            yield raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+    finally:
+        res.close()
+
+
+def http_multipart(url, fields, files, timeout=60):
+    """
+    POST a multipart/form-data body (whisper-server /inference).
+    files: {field: (filename, bytes, content_type)}.
+    Returns the decoded JSON body.
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f'{value}\r\n'.encode("utf-8")
+        )
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode("utf-8")
+        )
+        parts.append(content)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+
+    req = urllib.request.Request(
+        url,
+        data=b"".join(parts),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as res:
+        return json.loads(res.read().decode("utf-8") or "{}")
+
+
+# ================= PORTS ================= #
+
+def free_port(port=0):
+    """
+    Bind-test a localhost port and return it, or None if something
+    already listens there. port=0 asks the OS for an unused one.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind((HOST, port))
+        except OSError:
+            return None
+        return sock.getsockname()[1]
+
+
+# ================= WORKER ================= #
+
+class ServerWorker:
+    def __init__(self, index):
+        self.index = index
+        self.port = None
+        self.proc = None
+        self.base_url = None
+        self.requests = 0
+
+    def use_port(self, port):
+        self.port = port
+        self.base_url = f"http://{HOST}:{port}"
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+
+# ================= POOL ================= #
+
+class ServerProcessPool:
+    """
+    command_fn(port) -> argv list used to start one worker.
+    size workers are started lazily on first acquire(); callers that
+    find every worker busy wait up to queue_timeout seconds.
+
+    base_port=0 (the default) gives every server a port the OS reports
+    free, so several gunicorn workers can each run their own pool. A
+    fixed base_port (base_port + i per server) only suits one process:
+    if the port is already taken the pool refuses to start rather than
+    talk to a server it did not start.
+
+    Dead workers are restarted by the health thread, and the first
+    acquire() starts the pool on a background thread: a request never
+    waits longer than queue_timeout for a model to load, it takes an
+    idle worker or gets PoolBusy. The servers are stopped at exit.
+    """
+
+    def __init__(self, name, command_fn, size=1, base_port=0,
+                 health_path="/health", queue_timeout=10,
+                 startup_timeout=STARTUP_TIMEOUT,
+                 health_interval=HEALTH_INTERVAL):
+        self.name = name
+        self.command_fn = command_fn
+        self.size = size
+        self.base_port = base_port
+        self.health_path = health_path
+        self.queue_timeout = queue_timeout
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+
+        self._idle = queue.Queue()
+        self._dead = queue.Queue()     # handed to the health thread
+        self._workers = []
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()    # held while models load
+        self._started = False
+        self._starting = False
+        self._start_done = threading.Event()
+        self._start_error = None
+        self._stopped = False
+
+        # stats
+        self.waiting = 0
+        self.restarts = 0
+        self.busy_rejections = 0
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        """Start every worker and wait until all are ready (blocking)."""
+        with self._start_lock:
+            if self._started:
+                return
+            try:
+                for i in range(self.size):
+                    worker = ServerWorker(i)
+                    self._workers.append(worker)
+                    self._spawn(worker)
+
+                for worker in self._workers:
+                    self._wait_ready(worker)
+                    self._idle.put(worker)
+
+                self._started = True
+                # children would outlive the app (reloader restarts,
+                # recycled gunicorn workers) and hold their ports
+                atexit.register(self.stop)
+            except PoolUnavailable as e:
+                self._start_error = e
+                self.stop()
+                self._workers = []
+                while not self._idle.empty():
+                    self._idle.get_nowait()
+                self._stopped = False
+                raise
+            finally:
+                self._start_done.set()
+
+        threading.Thread(
+            target=self._health_loop,
+            name=f"{self.name}-health",
+            daemon=True
+        ).start()
+
+    def start_background(self):
+        """start() on its own thread; acquire() uses this."""
+        with self._lock:
+            if self._started or self._starting:
+                return
+            self._starting = True
+            self._start_error = None
+            self._start_done.clear()
+
+        def run():
+            try:
+                self.start()
+            except PoolUnavailable as e:
+                print(e)
+            finally:
+                self._starting = False
+
+        threading.Thread(target=run, name=f"{self.name}-start", daemon=True).start()
+
+    def stop(self):
+        """Terminate every server and wait for it to exit."""
+        self._stopped = True
+        for worker in self._workers:
+            if worker.alive():
+                worker.proc.terminate()
+        for worker in self._workers:
+            if worker.proc is None:
+                continue
+            try:
+                worker.proc.wait(timeout=STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                worker.proc.kill()
+                worker.proc.wait()
+
+    def _pick_port(self, worker):
+        if not self.base_port:
+            return free_port()
+
+        # a killed server's port can take a moment to be released
+        port = self.base_port + worker.index
+        deadline = time.monotonic() + PORT_RELEASE_WAIT
+        while free_port(port) is None:
+            if time.monotonic() >= deadline:
+                raise PoolUnavailable(
+                    f"{self.name}: port {port} is already in use "
+                    "(another process? use base_port=0)"
+                )
+            time.sleep(0.25)
+        return port
+
+    def _spawn(self, worker):
+        # the port was free a moment ago, so whatever answers on it
+        # below is the process started here
+        worker.use_port(self._pick_port(worker))
+        try:
+            worker.proc = subprocess.Popen(
+                self.command_fn(worker.port),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise PoolUnavailable(f"{self.name}: cannot start server: {e}")
+
+    def _healthy(self, worker, timeout=2):
+        if not worker.alive():
+            return False
+        try:
+            http_json(worker.base_url + self.health_path, timeout=timeout)
+        except (urllib.error.URLError, OSError, ValueError):
+            return False
+        # a server that failed to bind exits; never trust an answer
+        # that may have come from another process on the port
+        return worker.alive()
+
+    def _wait_ready(self, worker):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if not worker.alive():
+                raise PoolUnavailable(
+                    f"{self.name}: server on port {worker.port} exited on start "
+                    f"(code {worker.proc.returncode}; port taken or model missing?)"
+                )
+            if self._healthy(worker):
+                return
+            time.sleep(0.25)
+        raise PoolUnavailable(f"{self.name}: server did not become ready")
+
+    def _restart(self, worker):
+        # health thread only: this waits up to startup_timeout
+        if worker.alive():
+            worker.proc.kill()
+        if worker.proc is not None:
+            worker.proc.wait()
+        self.restarts += 1
+        self._spawn(worker)
+        self._wait_ready(worker)
+
+    def _health_loop(self):
+        """
+        Restart workers handed over as dead, and every health_interval
+        check the idle ones. Busy workers are checked when released.
+        Workers that fail to restart are retried at the next check.
+        """
+        failed = []
+        next_check = time.monotonic() + self.health_interval
+        while not self._stopped:
+            try:
+                worker = self._dead.get(
+                    timeout=max(0.0, next_check - time.monotonic())
+                )
+            except queue.Empty:
+                worker = None
+
+            if worker is not None:
+                self._revive(worker, failed)
+                continue
+
+            next_check = time.monotonic() + self.health_interval
+            retry, failed = failed, []
+            for worker in retry:
+                self._revive(worker, failed)
+
+            checked = []
+            while True:
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self._healthy(worker):
+                    checked.append(worker)
+                else:
+                    self._revive(worker, failed)
+
+            for worker in checked:
+                self._idle.put(worker)
+
+    def _revive(self, worker, failed):
+        try:
+            self._restart(worker)
+        except PoolUnavailable as e:
+            print(e)
+            failed.append(worker)
+            return
+        self._idle.put(worker)
+
+    # ---------- borrowing ----------
+
+    def acquire(self, timeout=None):
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        if not self._started:
+            # models load in the background; wait no longer than a busy pool
+            self.start_background()
+            self._start_done.wait(max(0.0, deadline - time.monotonic()))
+            if not self._started and self._start_error is not None:
+                raise PoolUnavailable(str(self._start_error))
+
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                try:
+                    worker = self._idle.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    self.busy_rejections += 1
+                    raise PoolBusy(
+                        f"{self.name}: all {self.size} workers busy, "
+                        "restarting or still starting"
+                    )
+                if worker.alive():
+                    break
+                # crashed while idle: restart it in the background
+                self._dead.put(worker)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        worker.requests += 1
+        return worker
+
+    def release(self, worker):
+        if worker.alive():
+            self._idle.put(worker)
+        else:
+            self._dead.put(worker)
+
+    @contextmanager
+    def worker(self, timeout=None):
+        worker = self.acquire(timeout)
+        try:
+            yield worker
+        finally:
+            self.release(worker)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "started": self._started,
+            "idle": self._idle.qsize(),
+            "down": sum(not w.alive() for w in self._workers),
+            "waiting": self.waiting,
+            "restarts": self.restarts,
+            "busy_rejections": self.busy_rejections,
+            "ports": [w.port for w in self._workers],
+            "requests": sum(w.requests for w in self._workers)
+        }
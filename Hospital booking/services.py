@@ -0,0 +1,148 @@
+# services.py
+#
+# Registry for the heavy AI subsystems (TTS, Whisper, TinyLLaMA and
+# dateparser). Importing the app no longer loads any of them: each one is
+# created on first use. Production workers can warm selected services at
+# startup (WARM_UP_SERVICES) so the first patient does not pay for it.
+
+import threading
+import time
+
+# ================= CONFIG ================= #
+
+ALL = "all"
+
+
+class Service:
+    def __init__(self, name, factory, warm=None):
+        self.name = name
+        self.factory = factory    # () -> instance, called once
+        self.warm = warm          # (instance) -> None, optional
+        self.instance = None
+        self.load_ms = None
+        self.warm_ms = None
+        self.lock = threading.Lock()
+
+
+class ServiceRegistry:
+    def __init__(self, app=None):
+        self._services = {}
+        self.warming = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["services"] = self
+
+        names = app.config.get("WARM_UP_SERVICES") or ""
+        if isinstance(names, str):
+            names = [n.strip() for n in names.split(",") if n.strip()]
+        if not names:
+            return
+
+        if ALL in names:
+            names = None
+        if app.config.get("WARM_UP_BACKGROUND", True):
+            threading.Thread(
+                target=self.warm_up,
+                args=(names,),
+                name="service-warm-up",
+                daemon=True
+            ).start()
+        else:
+            self.warm_up(names)
+
+    def register(self, name, factory, warm=None):
+        self._services[name] = Service(name, factory, warm)
+
+    def get(self, name):
+        service = self._services[name]
+        if service.instance is None:
+            with service.lock:
+                if service.instance is None:
+                    t0 = time.perf_counter()
+                    service.instance = service.factory()
+                    service.load_ms = round((time.perf_counter() - t0) * 1000, 1)
+        return service.instance
+
+    def loaded(self, name):
+        return self._services[name].instance is not None
+
+    def warm_up(self, names=None):
+        """
+        Load (and exercise) the given services, or all of them.
+        Returns {name: milliseconds}; failures are printed, not raised,
+        so a missing model does not stop the worker from serving.
+        """
+        self.warming = True
+        timings = {}
+        try:
+            for name in names or list(self._services):
+                if name not in self._services:
+                    print(f"Warm-up: unknown service {name}")
+                    continue
+                service = self._services[name]
+                t0 = time.perf_counter()
+                try:
+                    instance = self.get(name)
+                    if service.warm is not None:
+                        service.warm(instance)
+                except Exception as e:
+                    print(f"Warm-up of {name} failed:", e)
+                    continue
+                service.warm_ms = round((time.perf_counter() - t0) * 1000, 1)
+                timings[name] = service.warm_ms
+        finally:
+            self.warming = False
+        return timings
+
+    def stats(self):
+        return {
+            name: {
+                "loaded": s.instance is not None,
+                "load_ms": s.load_ms,
+                "warm_ms": s.warm_ms
+            }
+            for name, s in self._services.items()
+        }
+
+
+# ================= SERVICES ================= #
+
+def _dateparser():
+    import dateparser
+    return dateparser
+
+
+def _warm_dateparser(dateparser):
+    # the first parse loads the language data
+    dateparser.parse("10 December 12 PM", settings={"PREFER_DATES_FROM": "future"})
+
+
+def _tts():
+    from tts_engine import tts
+    return tts
+
+
+def _whisper():
+    from whisper_stt_processor import get_backend
+    return get_backend()
+
+
+def _llama():
+    from tinyllama_client import get_backend
+    return get_backend()
+
+
+def _warm_backend(backend):
+    warm_up = getattr(backend, "warm_up", None)
+    if warm_up is not None:
+        warm_up()
+
+
+services = ServiceRegistry()
+services.register("dateparser", _dateparser, warm=_warm_dateparser)
+services.register("tts", _tts, warm=_warm_backend)
+services.register("whisper", _whisper, warm=_warm_backend)
+services.register("llama", _llama, warm=_warm_backend)
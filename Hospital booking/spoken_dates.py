@@ -0,0 +1,320 @@
+# spoken_dates.py
+#
+# Booking-time parser for /api/parse_booking_time. Voice bookings mostly
+# say a handful of forms ("tomorrow at 10 am", "next Monday 3:30 pm",
+# "10 December at 4 pm"), so those are read by two compiled regexes
+# before dateparser is touched:
+#
+#   1. memo       bounded LRU keyed on (normalised phrase, today)
+#   2. fast path  date and/or time, in either order
+#   3. fallback   services.get("dateparser"), PREFER_DATES_FROM future
+#
+# The fast path resolves dates the way dateparser does (weekdays after
+# today, a time alone rolls over to tomorrow once passed, day + month
+# rolls over to next year), and also reads forms dateparser misses:
+# "next monday", "tomorrow at 10", "half past 3", "10 o'clock". A bare
+# spoken hour from 1 to 7 without am/pm means the afternoon (clinic
+# hours). Only results that stay right for the whole day are memoised.
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from metrics import metrics
+from services import services
+
+# ================= CONFIG ================= #
+
+DEFAULT_MEMO_SIZE = 2048
+DATEPARSER_SETTINGS = {"PREFER_DATES_FROM": "future"}
+AFTERNOON_HOURS = range(1, 8)     # "at 3" → 15:00
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2, "thursday": 3, "thu": 3, "thur": 3,
+    "thurs": 3, "friday": 4, "fri": 4, "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7,
+    "jul": 7, "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12,
+    "dec": 12,
+}
+NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+    "eleven": "11", "twelve": "12", "fifteen": "15", "thirty": "30",
+    "forty five": "45", "forty-five": "45",
+}
+PM_PERIODS = {"in the afternoon", "in the evening", "at night"}
+
+_MISSING = object()
+
+
+# ================= PATTERNS ================= #
+
+def _alternatives(words):
+    # longest first, so "tues" is not read as "tue"
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+_DATE = rf"""
+(?:
+    (?P<relative>today|tomorrow|(?:the\ )?day\ after\ tomorrow)
+  | in\ (?P<in_days>\d{{1,3}})\ days?
+  | (?:on\ )?(?:(?:this|next|coming)\ )?(?P<weekday>{_alternatives(WEEKDAYS)})
+  | (?:on\ )?(?:the\ )?(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\ (?:of\ )?
+        (?P<month>{_alternatives(MONTHS)})(?:\ (?P<year>\d{{4}}))?
+  | (?:on\ )?(?P<month_first>{_alternatives(MONTHS)})\ (?:the\ )?
+        (?P<day_second>\d{{1,2}})(?:st|nd|rd|th)?(?:\ (?P<year_second>\d{{4}}))?
+  | (?P<iso>\d{{4}}-\d{{2}}-\d{{2}})
+)
+"""
+
+_TIME = r"""
+(?:(?:at|for)\ )?
+(?:
+    (?P<hour12>\d{1,2})(?:[:.\ ](?P<minute12>\d{2}))?\ ?(?P<meridiem>am|pm)
+  | (?P<hour24>\d{1,2}):(?P<minute24>\d{2})
+  | (?P<named>noon|midday|midnight)
+  | (?P<fraction>half\ past|quarter\ past|quarter\ to)\ (?P<fraction_hour>\d{1,2})
+  | (?P<clock_hour>\d{1,2})\ oclock
+  | at\ (?P<bare_hour>\d{1,2})
+)
+(?:\ (?P<period>in\ the\ morning|in\ the\ afternoon|in\ the\ evening|at\ night))?
+"""
+
+DATE_FIRST = re.compile(rf"^{_DATE}(?:\ {_TIME})?$", re.VERBOSE)
+TIME_FIRST = re.compile(rf"^{_TIME}(?:\ {_DATE})?$", re.VERBOSE)
+
+_MERIDIEM = re.compile(r"\b([ap])\.?\s?m\b\.?")
+_PUNCTUATION = re.compile(r"[,!?]|\.$")
+_SPACES = re.compile(r"\s+")
+_NUMBER_WORDS = re.compile(
+    r"\b(" + _alternatives(NUMBER_WORDS) + r")\b"
+)
+
+
+def normalise(text):
+    text = (text or "").lower().replace("o'clock", "oclock")
+    text = _MERIDIEM.sub(lambda m: f" {m.group(1)}m", text)
+    text = _PUNCTUATION.sub(" ", text)
+    text = _NUMBER_WORDS.sub(lambda m: NUMBER_WORDS[m.group(1)], text)
+    return _SPACES.sub(" ", text).strip()
+
+
+# ================= FAST PATH ================= #
+
+def _time_of_day(m):
+    """(hour, minute) from the time groups, None if absent or invalid."""
+    g = m.groupdict()
+    spoken = False
+    if g.get("hour12"):
+        hour, minute = int(g["hour12"]), int(g["minute12"] or 0)
+        if not 1 <= hour <= 12:
+            return _MISSING
+        hour = hour % 12 + (12 if g["meridiem"] == "pm" else 0)
+        return (hour, minute) if minute < 60 else _MISSING
+    if g.get("hour24"):
+        hour, minute = int(g["hour24"]), int(g["minute24"])
+    elif g.get("named"):
+        hour, minute = (0, 0) if g["named"] == "midnight" else (12, 0)
+    elif g.get("fraction"):
+        hour, spoken = int(g["fraction_hour"]), True
+        minute = {"half past": 30, "quarter past": 15}.get(g["fraction"], 45)
+    elif g.get("clock_hour"):
+        hour, minute, spoken = int(g["clock_hour"]), 0, True
+    elif g.get("bare_hour"):
+        hour, minute, spoken = int(g["bare_hour"]), 0, True
+    else:
+        return None
+
+    period = g.get("period")
+    if period in PM_PERIODS and hour < 12:
+        hour += 12
+    elif period is None and spoken and hour in AFTERNOON_HOURS:
+        hour += 12
+    if g.get("fraction") == "quarter to":
+        # after the rules above: they read the spoken hour, so
+        # "quarter to 1" is 12:45 and "quarter to 8" is 07:45
+        hour -= 1
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return _MISSING
+    return hour, minute
+
+
+def _date(m, now):
+    """(date, kind) from the date groups; kind decides the rollover."""
+    g = m.groupdict()
+    today = now.date()
+    if g.get("relative"):
+        days = {"today": 0, "tomorrow": 1}.get(g["relative"], 2)
+        return today + timedelta(days=days), "relative"
+    if g.get("in_days"):
+        return today + timedelta(days=int(g["in_days"])), "relative"
+    if g.get("weekday"):
+        ahead = (WEEKDAYS[g["weekday"]] - today.weekday() - 1) % 7 + 1
+        return today + timedelta(days=ahead), "weekday"
+    if g.get("iso"):
+        return datetime.strptime(g["iso"], "%Y-%m-%d").date(), "iso"
+
+    day = g.get("day") or g.get("day_second")
+    month = g.get("month") or g.get("month_first")
+    year = g.get("year") or g.get("year_second")
+    if day and month:
+        return (
+            today.replace(year=int(year) if year else today.year,
+                          month=MONTHS[month], day=int(day)),
+            "calendar" if year else "month_day"
+        )
+    return None, None
+
+
+def fast_parse(phrase, now):
+    """
+    Parse a normalised phrase. Returns (datetime, stable) or None when
+    the phrase is not a known form; stable means the answer holds for
+    the rest of the day and can be memoised.
+    """
+    m = DATE_FIRST.match(phrase) or TIME_FIRST.match(phrase)
+    if m is None:
+        return None
+
+    clock = _time_of_day(m)
+    if clock is _MISSING:
+        return None
+    try:
+        day, kind = _date(m, now)
+    except ValueError:        # 31 February
+        return None
+
+    if day is None:
+        if clock is None:
+            return None
+        # a time alone: today, or tomorrow once it has passed
+        result = now.replace(hour=clock[0], minute=clock[1], second=0, microsecond=0)
+        if result <= now:
+            result += timedelta(days=1)
+        return result, False
+
+    if clock is None:
+        if kind == "relative":
+            # like dateparser: the date at the current time of day
+            return datetime.combine(day, now.time()), False
+        result = datetime.combine(day, datetime.min.time())
+    else:
+        result = datetime.combine(day, datetime.min.time()).replace(
+            hour=clock[0], minute=clock[1]
+        )
+
+    stable = True
+    if kind == "month_day" and result < now:
+        try:
+            result = result.replace(year=result.year + 1)
+        except ValueError:    # 29 February
+            return None
+    elif kind == "month_day" and day == now.date():
+        stable = False        # flips to next year once the time passes
+    return result, stable
+
+
+# ================= ENGINE ================= #
+
+class SpokenDateParser:
+    def __init__(self, app=None):
+        self.memo_size = DEFAULT_MEMO_SIZE
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+        # stats
+        self.memo_hits = 0
+        self.fast = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.memo_size = app.config.get("SPOKEN_DATE_MEMO_SIZE", DEFAULT_MEMO_SIZE)
+        app.extensions["spoken_dates"] = self
+
+    def parse(self, text, now=None):
+        """A datetime for a spoken phrase, or None."""
+        started = time.perf_counter()
+        live = now is None
+        now = now or datetime.now()
+        phrase = normalise(text)
+        key = (phrase, now.date())
+
+        with self._lock:
+            cached = self._memo.get(key, _MISSING)
+            if cached is not _MISSING:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+        if cached is not _MISSING:
+            self._observe("memo", cached, started)
+            return cached
+
+        parsed = fast_parse(phrase, now) if phrase else (None, True)
+        if parsed is not None:
+            result, stable = parsed
+            path = "fast"
+        else:
+            result = self._fallback(text, now, live)
+            # seconds copied from the clock: relative to "now"
+            stable = result is None or (
+                result.second == 0 and result.microsecond == 0
+                and result.date() > now.date() + timedelta(days=1)
+            )
+            path = "dateparser"
+
+        with self._lock:
+            if path == "fast":
+                self.fast += 1
+            else:
+                self.fallbacks += 1
+            if result is None:
+                self.failures += 1
+            if stable and self.memo_size > 0:
+                self._memo[key] = result
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+
+        self._observe(path, result, started)
+        return result
+
+    def _fallback(self, text, now, live):
+        settings = dict(DATEPARSER_SETTINGS)
+        if not live:
+            settings["RELATIVE_BASE"] = now
+        return services.get("dateparser").parse(text, settings=settings)
+
+    def _observe(self, path, result, started):
+        metrics.observe_ai(
+            "dateparser", path, "ok" if result is not None else "no_match",
+            time.perf_counter() - started
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+    def stats(self):
+        with self._lock:
+            parses = self.memo_hits + self.fast + self.fallbacks
+            return {
+                "memo_size": len(self._memo),
+                "memo_hits": self.memo_hits,
+                "fast_path": self.fast,
+                "fallbacks": self.fallbacks,
+                "failures": self.failures,
+                "fallback_rate": round(self.fallbacks / parses, 3) if parses else None
+            }
+
+
+spoken_dates = SpokenDateParser()
@@ -0,0 +1,58 @@
+// static/js/paging.js
+
+// "Load more" for the keyset-paged JSON list APIs (/api/bookings,
+// /api/doctors, /api/admin/users). The first page is rendered by the
+// server; its cursor is in the button's data-cursor attribute.
+function setupLoadMore({ url, button, container, render, params = {} }) {
+    if (!button || !container) return;
+
+    let next = button.dataset.cursor || null;
+    button.hidden = !next;
+
+    button.addEventListener("click", async () => {
+        if (!next) return;
+        button.disabled = true;
+
+        try {
+            const query = new URLSearchParams({ ...params, cursor: next });
+            const res = await fetch(`${url}?${query}`);
+            const data = await res.json();
+            if (!res.ok) throw new Error(data.message || res.status);
+
+            container.insertAdjacentHTML(
+                "beforeend",
+                data.items.map(render).join("")
+            );
+            next = data.next_cursor;
+            button.hidden = !next;
+        } catch (err) {
+            console.error("Load more failed:", err);
+        } finally {
+            button.disabled = false;
+        }
+    });
+}
+
+function escapeHtml(value) {
+    return String(value ?? "")
+        .replace(/&/g, "&amp;")
+        .replace(/</g, "&lt;")
+        .replace(/>/g, "&gt;")
+        .replace(/"/g, "&quot;")
+        .replace(/'/g, "&#39;");
+}
+
+// "2026-10-17 14:30" -> "17 Oct 2026 02:30 PM" (same as the templates)
+const MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"];
+
+function formatTime(value) {
+    const [h, m] = value.slice(11, 16).split(":").map(Number);
+    const hour = h % 12 || 12;
+    return `${String(hour).padStart(2, "0")}:${String(m).padStart(2, "0")} ${h < 12 ? "AM" : "PM"}`;
+}
+
+function formatDateTime(value) {
+    const [y, mo, d] = value.slice(0, 10).split("-").map(Number);
+    return `${String(d).padStart(2, "0")} ${MONTHS[mo - 1]} ${y} ${formatTime(value)}`;
+}
@@ -0,0 +1,68 @@
+// static/js/push.js
+
+// Live updates for the logged-in user over Server-Sent Events
+// (/api/push/stream). Transfers and cancellations show up at once,
+// without reloading the dashboard. EventSource reconnects by itself.
+
+function showPushNotice(message) {
+    let popup = document.getElementById("notifPopup");
+
+    if (!popup) {
+        popup = document.createElement("div");
+        popup.id = "notifPopup";
+        popup.className = "modal-overlay";
+        popup.innerHTML = `
+            <div class="modal-content">
+                <h4 style="color: #d9534f;">⚠️ Appointment Update</h4>
+                <div class="notif-list"></div>
+                <button class="btn-primary">Understood</button>
+            </div>`;
+        popup.querySelector("button").addEventListener("click", () => {
+            if (typeof closeNotif === "function") {
+                closeNotif();
+            } else {
+                popup.style.display = "none";
+            }
+            popup.querySelector(".notif-list").innerHTML = "";
+        });
+        document.body.appendChild(popup);
+    }
+
+    const item = document.createElement("p");
+    item.className = "notif-item";
+    item.textContent = message;
+    popup.querySelector(".notif-list").appendChild(item);
+    popup.style.display = "flex";
+}
+
+function updateBookingCard(data) {
+    const card = document.querySelector(`[data-booking-id="${data.booking_id}"]`);
+    if (!card) return;
+
+    card.querySelectorAll("p").forEach(p => {
+        const strong = p.querySelector("strong");
+        if (strong && p.textContent.trim().startsWith("Status:")) {
+            strong.textContent = data.status;
+        }
+    });
+    if (data.status === "cancelled") {
+        card.querySelectorAll(".btn-cancel-booking, .doctor-actions button")
+            .forEach(btn => btn.remove());
+    }
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+    if (!window.EventSource || !document.body.dataset.push) return;
+
+    const source = new EventSource("/api/push/stream");
+
+    source.addEventListener("booking", (e) => {
+        const data = JSON.parse(e.data);
+        updateBookingCard(data);
+        showPushNotice(data.message);
+    });
+
+    source.addEventListener("notification", (e) => {
+        showPushNotice(JSON.parse(e.data).message);
+    });
+});
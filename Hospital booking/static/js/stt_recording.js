@@ -96,3 +96,122 @@ async function startRecording(endpoint) {
         }
     }, 5000);
 }
+
+/* ================= STREAMING DICTATION ================= */
+
+// Sends 16 kHz PCM to the server every STREAM_CHUNK_MS while the user is
+// still talking. The server transcribes each utterance as soon as it
+// hears a pause, so partial text shows up live ("stt-partial") and the
+// final "stt-response" arrives right after recording stops.
+const STREAM_CHUNK_MS = 400;
+const STREAM_MAX_MS = 10000;
+
+let streamState = null;
+
+function floatTo16BitPCM(samples) {
+    const out = new Int16Array(samples.length);
+    for (let i = 0; i < samples.length; i++) {
+        const s = Math.max(-1, Math.min(1, samples[i]));
+        out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+    }
+    return out;
+}
+
+function joinPCM(parts) {
+    const total = parts.reduce((n, p) => n + p.length, 0);
+    const out = new Int16Array(total);
+    let offset = 0;
+    for (const p of parts) {
+        out.set(p, offset);
+        offset += p.length;
+    }
+    return out;
+}
+
+// endpoint example: "/api/stt/stream"
+async function startStreamingRecording(endpoint) {
+    if (streamState) {
+        return;
+    }
+
+    let session;
+    try {
+        const res = await fetch(endpoint, { method: "POST" });
+        session = await res.json();
+        if (!res.ok) throw new Error(session.error || res.status);
+    } catch (err) {
+        // server busy or streaming unavailable: record the whole clip instead
+        return startRecording("/api/stt/whisper");
+    }
+
+    const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    const audioCtx = new AudioContext({ sampleRate: session.sample_rate || 16000 });
+    const source = audioCtx.createMediaStreamSource(stream);
+    const processor = audioCtx.createScriptProcessor(4096, 1, 1);
+    const url = `${endpoint}/${session.session_id}`;
+
+    const state = { pending: [], queue: Promise.resolve(), stopped: false };
+    streamState = state;
+
+    // chunks are chained so they reach the server in order
+    const send = (final) => {
+        const pcm = joinPCM(state.pending);
+        state.pending = [];
+        state.queue = state.queue.then(async () => {
+            const res = await fetch(final ? `${url}?final=1` : url, {
+                method: "POST",
+                headers: { "Content-Type": "application/octet-stream" },
+                body: pcm.buffer
+            });
+            return res.json();
+        });
+        return state.queue;
+    };
+
+    const stop = async () => {
+        if (state.stopped) return;
+        state.stopped = true;
+        clearInterval(state.ticker);
+        clearTimeout(state.timer);
+        processor.disconnect();
+        source.disconnect();
+        stream.getTracks().forEach(t => t.stop());
+        audioCtx.close();
+
+        let text;
+        try {
+            const data = await send(true);
+            text = data.text || data.error || "";
+        } catch (err) {
+            text = "Error: " + err;
+        }
+        streamState = null;
+        document.dispatchEvent(new CustomEvent("stt-response", { detail: text }));
+    };
+
+    processor.onaudioprocess = (e) => {
+        if (!state.stopped) {
+            state.pending.push(floatTo16BitPCM(e.inputBuffer.getChannelData(0)));
+        }
+    };
+    source.connect(processor);
+    processor.connect(audioCtx.destination);
+
+    state.ticker = setInterval(async () => {
+        if (state.stopped || !state.pending.length) return;
+        try {
+            const data = await send(false);
+            if (state.stopped) return;
+
+            const live = [data.text, data.partial].filter(Boolean).join(" ");
+            document.dispatchEvent(new CustomEvent("stt-partial", { detail: live }));
+
+            // the user has finished speaking: no need to wait for the timer
+            if (data.endpoint) stop();
+        } catch (err) {
+            stop();
+        }
+    }, STREAM_CHUNK_MS);
+
+    state.timer = setTimeout(stop, STREAM_MAX_MS);
+}
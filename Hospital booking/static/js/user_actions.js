@@ -31,6 +31,55 @@ function appendChat(speaker, text) {
   div.textContent = `${speaker}: ${text}`;
   chatLog.appendChild(div);
   chatLog.scrollTop = chatLog.scrollHeight;
+  return div;
+}
+
+/* ================= AI STREAMING ================= */
+
+// Reads the SSE stream from /api/tinyllama/assistant/stream.
+// onToken(textSoFar) is called as tokens arrive; resolves to the final reply.
+async function streamAssistant(message, onToken) {
+  const res = await fetch("/api/tinyllama/assistant/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ message })
+  });
+  if (!res.ok || !res.body) throw new Error("stream unavailable");
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let text = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // SSE events are separated by a blank line
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = "message";
+      let data = "";
+      raw.split("\n").forEach(line => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      });
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === "token") {
+        text += payload.text;
+        if (onToken) onToken(text);
+      } else if (event === "done") {
+        return payload.reply;
+      }
+    }
+  }
+  return text;
 }
 
 /* ================= TTS (TEXT TO SPEECH) ================= */
@@ -55,6 +104,19 @@ async function speakText(text) {
   }
 }
 
+/* ================= BACKGROUND JOBS ================= */
+
+// Polls /api/jobs/<id> every couple of seconds until the job is done or failed.
+async function waitForJob(jobId, maxTries = 300, intervalMs = 2000) {
+  for (let i = 0; i < maxTries; i++) {
+    const res = await fetch(`/api/jobs/${jobId}`);
+    const job = await res.json();
+    if (job.status === "done" || job.status === "failed") return job;
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+  return { status: "failed" };
+}
+
 /* ================= VOICE FLOW LOGIC ================= */
 
 function getNextIncompleteStep() {
@@ -75,7 +137,7 @@ function sanitizeAIText(text) {
     .trim();
 }
 
-async function getQuestionText(step) {
+async function getQuestionText(step, onToken) {
   if (!aiMode) {
     return [
       "What is your name?",
@@ -95,15 +157,23 @@ async function getQuestionText(step) {
   ];
 
   try {
-    const res = await fetch("/api/tinyllama/assistant", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message: prompts[step] })
+    const reply = await streamAssistant(prompts[step], text => {
+      if (onToken) onToken(sanitizeAIText(text));
     });
-    const data = await res.json();
-    return sanitizeAIText(data.reply);
+    return sanitizeAIText(reply);
   } catch {
-    return "Please answer.";
+    // fall back to the blocking endpoint
+    try {
+      const res = await fetch("/api/tinyllama/assistant", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ message: prompts[step] })
+      });
+      const data = await res.json();
+      return sanitizeAIText(data.reply);
+    } catch {
+      return "Please answer.";
+    }
   }
 }
 
@@ -120,16 +190,29 @@ async function runNextQuestion() {
     return;
   }
 
-  const question = await getQuestionText(currentStep);
-  appendChat("Assistant", question);
+  // AI replies are rendered progressively as tokens stream in
+  let liveLine = null;
+  const question = await getQuestionText(currentStep, partial => {
+    if (!liveLine) liveLine = appendChat("Assistant", partial);
+    else liveLine.textContent = `Assistant: ${partial}`;
+  });
+  if (liveLine) liveLine.textContent = `Assistant: ${question}`;
+  else appendChat("Assistant", question);
 
   listening = false;
   await speakText(question);
 
   if (!voiceBookingActive) return;
   listening = true;
-  // Assumes you have a helper function 'startRecording' defined elsewhere or imported
-  if (typeof startRecording === "function") {
+  listen();
+}
+
+// Streaming dictation when stt_recording.js provides it, otherwise the
+// record-then-upload flow
+function listen() {
+  if (typeof startStreamingRecording === "function") {
+    startStreamingRecording("/api/stt/stream");
+  } else if (typeof startRecording === "function") {
     startRecording("/api/stt/whisper");
   } else {
     console.error("startRecording function is missing. Check your recorder.js or audio script.");
@@ -143,7 +226,7 @@ async function processReply(text) {
 
   if (!text || text === "[BLANK_AUDIO]") {
     listening = true;
-    if (typeof startRecording === "function") startRecording("/api/stt/whisper");
+    listen();
     return;
   }
 
@@ -168,7 +251,7 @@ async function processReply(text) {
       appendChat("Assistant", msg);
       await speakText(msg);
       listening = true;
-      if (typeof startRecording === "function") startRecording("/api/stt/whisper");
+      listen();
       return;
     }
 
@@ -178,7 +261,7 @@ async function processReply(text) {
       appendChat("Assistant", msg);
       await speakText(msg);
       listening = true;
-      if (typeof startRecording === "function") startRecording("/api/stt/whisper");
+      listen();
       return;
     }
 
@@ -195,6 +278,41 @@ async function processReply(text) {
   await runNextQuestion();
 }
 
+/* ================= BOOKING CARDS ================= */
+
+// Same markup as the "My Bookings" cards in user_dashboard.html
+function renderUserBooking(b) {
+  let extra = "";
+  if (b.status === "booked") {
+    extra = `
+        <button class="btn-secondary btn-cancel-booking" data-id="${b.id}">Cancel Booking</button>`;
+  } else if (b.status === "ongoing") {
+    extra = `<p class="info-text">Consultation in progress...</p>`;
+  } else if (b.status === "completed") {
+    extra = `
+        <div class="prescription-upload-area">
+          <label>Upload Prescription Image:</label>
+          <input type="file" id="presc-file-${b.id}" accept="image/*">
+          <button class="btn-primary btn-upload-presc" data-id="${b.id}">Upload & Scan</button>
+        </div>
+        <div id="scan-result-${b.id}" class="scan-result hidden">
+          <strong>AI Analysis:</strong>
+          <p class="ai-text"></p>
+        </div>`;
+  } else if (b.status === "cancelled") {
+    extra = `<p class="error-text">Cancelled: ${escapeHtml(b.cancel_reason)}</p>`;
+  }
+
+  return `
+      <div class="booking-card" data-booking-id="${b.id}">
+        <h3>Dr. ${escapeHtml(b.doctor.name)} (Token ${escapeHtml(b.token_number)})</h3>
+        <p>${formatDateTime(b.start_time)} – ${formatTime(b.end_time)}</p>
+        <p>Status: <strong>${escapeHtml(b.status)}</strong></p>
+        <p>Issue: ${escapeHtml(b.issue_description)}</p>
+        ${extra}
+      </div>`;
+}
+
 /* ================= DOM CONTENT LOADED ================= */
 
 document.addEventListener("DOMContentLoaded", () => {
@@ -260,9 +378,15 @@ document.addEventListener("DOMContentLoaded", () => {
     appendChat("System", "Voice booking stopped.");
   });
 
+  document.addEventListener("stt-partial", e => {
+    if (!voiceBookingActive || !listening || !statusText) return;
+    statusText.textContent = e.detail;
+  });
+
   document.addEventListener("stt-response", async e => {
     if (!voiceBookingActive || !listening) return;
     listening = false;
+    if (statusText) statusText.textContent = "";
     await processReply(e.detail || "");
   });
 
@@ -304,6 +428,81 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   });
 
+  /* ================= FIND FREE SLOTS (DEPARTMENT) ================= */
+  const slotResults = document.getElementById("slot-results");
+
+  function selectSlot(doctorId, time) {
+    document.querySelectorAll(".doctor-card").forEach(c => {
+      c.classList.toggle("selected", c.dataset.doctorId === String(doctorId));
+    });
+    doctorIdInput.value = doctorId;
+    bookingTimeInput.value = time;
+    bookingStatus.textContent = "Slot Available!";
+    bookingStatus.style.color = "#22c55e";
+    btnOpenConfirm.disabled = false;
+  }
+
+  document.getElementById("btn-find-slots")?.addEventListener("click", async () => {
+    const department = document.getElementById("slot-department").value;
+    const dateFrom = document.getElementById("slot-date-from").value;
+    const dateTo = document.getElementById("slot-date-to").value || dateFrom;
+
+    if (!department || !dateFrom) {
+      slotResults.textContent = "Please choose a department and a date.";
+      return;
+    }
+
+    slotResults.textContent = "Searching...";
+
+    try {
+      const res = await fetch("/api/free_slots", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          department,
+          date_from: dateFrom,
+          date_to: dateTo,
+          slot_minutes: 30
+        })
+      });
+      const data = await res.json();
+
+      if (!data.success) {
+        slotResults.textContent = data.message || "Could not load slots.";
+        return;
+      }
+
+      slotResults.innerHTML = "";
+      const withSlots = data.doctors.filter(d => d.slots.length);
+      if (!withSlots.length) {
+        slotResults.textContent = "No free slots in this range.";
+        return;
+      }
+
+      withSlots.forEach(doc => {
+        const group = document.createElement("div");
+        group.className = "slot-group";
+
+        const title = document.createElement("h4");
+        title.textContent = `Dr. ${doc.name}`;
+        group.appendChild(title);
+
+        doc.slots.forEach(time => {
+          const btn = document.createElement("button");
+          btn.type = "button";
+          btn.className = "slot-chip";
+          btn.textContent = time;
+          btn.addEventListener("click", () => selectSlot(doc.doctor_id, time));
+          group.appendChild(btn);
+        });
+
+        slotResults.appendChild(group);
+      });
+    } catch {
+      slotResults.textContent = "Error loading slots.";
+    }
+  });
+
   /* ================= CONFIRM MODAL LOGIC (THE MISSING PART) ================= */
 
   // 1. Open Modal
@@ -366,71 +565,91 @@ document.addEventListener("DOMContentLoaded", () => {
   });
 
   /* ================= CANCEL BOOKING LOGIC ================= */
-  document.querySelectorAll(".btn-cancel-booking").forEach(btn => {
-    btn.addEventListener("click", async () => {
-      if (!confirm("Are you sure you want to cancel?")) return;
-      
-      const bookingId = btn.dataset.id;
-      const reason = prompt("Enter reason for cancellation:");
-      if (!reason) return;
-
-      try {
-        const res = await fetch(`/api/booking/${bookingId}/cancel`, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ reason })
-        });
-        const data = await res.json();
-        if (data.success) window.location.reload();
-        else alert("Failed to cancel booking.");
-      } catch (err) {
-        console.error(err);
-        alert("Error cancelling booking.");
-      }
-    });
+  // booking buttons are delegated so cards added by "Load more" work too
+  document.addEventListener("click", async e => {
+    const btn = e.target.closest(".btn-cancel-booking");
+    if (!btn) return;
+
+    if (!confirm("Are you sure you want to cancel?")) return;
+    
+    const bookingId = btn.dataset.id;
+    const reason = prompt("Enter reason for cancellation:");
+    if (!reason) return;
+
+    try {
+      const res = await fetch(`/api/booking/${bookingId}/cancel`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ reason })
+      });
+      const data = await res.json();
+      if (data.success) window.location.reload();
+      else alert("Failed to cancel booking.");
+    } catch (err) {
+      console.error(err);
+      alert("Error cancelling booking.");
+    }
   });
   /* ================= PRESCRIPTION UPLOAD & SCAN ================= */
-  document.querySelectorAll(".btn-upload-presc").forEach(btn => {
-    btn.addEventListener("click", async () => {
-      const bookingId = btn.dataset.id;
-      const fileInput = document.getElementById(`presc-file-${bookingId}`);
-      const resultDiv = document.getElementById(`scan-result-${bookingId}`);
-      const aiText = resultDiv.querySelector(".ai-text");
-
-      if (!fileInput.files[0]) {
-        alert("Please select an image first.");
+  document.addEventListener("click", async e => {
+    const btn = e.target.closest(".btn-upload-presc");
+    if (!btn) return;
+
+    const bookingId = btn.dataset.id;
+    const fileInput = document.getElementById(`presc-file-${bookingId}`);
+    const resultDiv = document.getElementById(`scan-result-${bookingId}`);
+    const aiText = resultDiv.querySelector(".ai-text");
+
+    if (!fileInput.files[0]) {
+      alert("Please select an image first.");
+      return;
+    }
+
+    const formData = new FormData();
+    formData.append("prescription", fileInput.files[0]);
+    formData.append("booking_id", bookingId);
+
+    btn.textContent = "Scanning...";
+    btn.disabled = true;
+
+    try {
+      const res = await fetch("/api/upload_scan_prescription", {
+        method: "POST",
+        body: formData
+      });
+      const data = await res.json();
+
+      if (!data.success) {
+        alert("Error: " + data.message);
         return;
       }
 
-      const formData = new FormData();
-      formData.append("prescription", fileInput.files[0]);
-      formData.append("booking_id", bookingId);
+      // analysis runs in a background job; wait for it
+      resultDiv.classList.remove("hidden");
+      aiText.textContent = "Uploaded. Analysing prescription...";
 
-      btn.textContent = "Scanning...";
-      btn.disabled = true;
-
-      try {
-        const res = await fetch("/api/upload_scan_prescription", {
-          method: "POST",
-          body: formData
-        });
-        const data = await res.json();
-
-        if (data.success) {
-          resultDiv.classList.remove("hidden");
-          aiText.textContent = data.analysis;
-          alert("Upload and Scan Complete!");
-        } else {
-          alert("Error: " + data.message);
-        }
-      } catch (err) {
-        console.error(err);
-        alert("Scan failed.");
-      } finally {
-        btn.textContent = "Upload & Scan";
-        btn.disabled = false;
+      const job = await waitForJob(data.job_id);
+      if (job.status === "done") {
+        aiText.textContent = job.result;
+        alert("Upload and Scan Complete!");
+      } else {
+        aiText.textContent = "Analysis failed. Please try again later.";
       }
-    });
+    } catch (err) {
+      console.error(err);
+      alert("Scan failed.");
+    } finally {
+      btn.textContent = "Upload & Scan";
+      btn.disabled = false;
+    }
+  });
+
+  /* ================= LOAD MORE BOOKINGS ================= */
+  setupLoadMore({
+    url: "/api/bookings",
+    button: document.getElementById("btn-more-bookings"),
+    container: document.getElementById("user-booking-list"),
+    render: renderUserBooking
   });
   /* ================= TRANSFER BOOKING ================= */
   // document.querySelectorAll(".btn-doc-transfer").forEach(btn => {
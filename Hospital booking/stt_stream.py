@@ -0,0 +1,328 @@
+# stt_stream.py
+#
+# Streaming dictation. While the user is still talking the browser posts
+# short chunks of 16 kHz mono PCM; an energy VAD cuts the audio at pauses
+# and every finished utterance is transcribed straight away. When the
+# recording stops only the last few hundred milliseconds are left, so the
+# final text comes back almost immediately.
+# Whisper itself runs with the Silero VAD model (VAD_MODEL_PATH) to trim
+# silence inside each utterance.
+#
+# Sessions (VAD state and buffered audio) live in the memory of the
+# process that opened them. Every chunk of a stream must reach that same
+# process: run a single gunicorn worker (scale with --threads), or route
+# /api/stt/stream/<session_id> to one worker per session. Anywhere else
+# a chunk gets 404 "Unknown or expired stream".
+
+import io
+import math
+import secrets
+import sys
+import threading
+import time
+import wave
+from array import array
+from collections import deque
+
+from whisper_stt_processor import transcribe_audio_bytes
+from admission import Overloaded
+
+# ================= CONFIG ================= #
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * 2   # 16-bit mono
+
+ENERGY_FLOOR = 300          # RMS below this is always silence
+NOISE_FACTOR = 3.0          # speech = louder than 3x the background level
+PRE_ROLL_FRAMES = 7         # ~200 ms kept before the first speech frame
+
+DEFAULT_SILENCE_MS = 600    # pause that ends an utterance
+DEFAULT_ENDPOINT_MS = 1200  # pause after which the user is done talking
+DEFAULT_PARTIAL_MS = 1500   # new audio before re-transcribing a partial
+DEFAULT_MAX_SEGMENT_MS = 15000
+DEFAULT_SESSION_TTL = 60    # seconds without a chunk before a session is dropped
+DEFAULT_MAX_SESSIONS = 50
+
+BLANK_MARKERS = ("[BLANK_AUDIO]", "[SILENCE]", "(silence)")
+
+
+class TooManyStreams(Exception):
+    """Every streaming slot is taken; the client should retry later."""
+
+
+def frame_rms(frame):
+    samples = array("h", frame)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def pcm_to_wav(pcm):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+# ================= VAD ================= #
+
+class SegmentVAD:
+    """
+    Frame-level energy VAD with an adaptive noise floor.
+    feed(pcm) returns the utterances closed by that chunk (PCM bytes,
+    trailing silence removed); leading silence is never buffered.
+    """
+
+    def __init__(self, silence_ms=DEFAULT_SILENCE_MS,
+                 max_segment_ms=DEFAULT_MAX_SEGMENT_MS):
+        self.silence_frames = max(1, silence_ms // FRAME_MS)
+        self.max_frames = max(1, max_segment_ms // FRAME_MS)
+        self.noise = ENERGY_FLOOR / NOISE_FACTOR
+        self.heard_speech = False
+        self.trailing_silence = 0   # silent frames since the last speech frame
+
+        self._rest = b""
+        self._pre = deque(maxlen=PRE_ROLL_FRAMES)
+        self._segment = []
+        self._silent_run = 0
+
+    def in_speech(self):
+        return bool(self._segment)
+
+    def open_frames(self):
+        return len(self._segment)
+
+    def open_segment(self):
+        return b"".join(self._segment)
+
+    def feed(self, pcm):
+        closed = []
+        data = self._rest + pcm
+        usable = len(data) - len(data) % FRAME_BYTES
+        self._rest = data[usable:]
+
+        for i in range(0, usable, FRAME_BYTES):
+            frame = data[i:i + FRAME_BYTES]
+            rms = frame_rms(frame)
+            speech = rms > max(ENERGY_FLOOR, self.noise * NOISE_FACTOR)
+
+            if speech:
+                self.heard_speech = True
+                self.trailing_silence = 0
+            else:
+                self.noise = 0.9 * self.noise + 0.1 * rms
+                self.trailing_silence += 1
+
+            if self._segment:
+                self._segment.append(frame)
+                self._silent_run = 0 if speech else self._silent_run + 1
+                if (self._silent_run >= self.silence_frames
+                        or len(self._segment) >= self.max_frames):
+                    closed.append(self._close())
+            elif speech:
+                self._segment = list(self._pre) + [frame]
+                self._pre.clear()
+                self._silent_run = 0
+            else:
+                self._pre.append(frame)
+
+        return closed
+
+    def flush(self):
+        """End of stream: close whatever utterance is still open."""
+        if self._segment:
+            return self._close()
+        return None
+
+    def _close(self):
+        keep = len(self._segment) - self._silent_run
+        segment = b"".join(self._segment[:keep] if keep > 0 else self._segment)
+        self._segment = []
+        self._silent_run = 0
+        return segment
+
+
+# ================= SESSIONS ================= #
+
+class StreamSession:
+    def __init__(self, session_id, vad):
+        self.id = session_id
+        self.vad = vad
+        self.texts = []           # finished utterances
+        self.partial = ""         # best guess for the open utterance
+        self.partial_frames = 0   # open_frames() when partial was made
+        self.error = None
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+
+
+class StreamingTranscriber:
+    """
+    Registry of open dictation streams (one per recording).
+    Chunks for one session are handled in order under its lock;
+    different sessions run in parallel against the Whisper backend.
+    """
+
+    def __init__(self, app=None, transcribe=None):
+        self.transcribe = transcribe or transcribe_audio_bytes
+        self.silence_ms = DEFAULT_SILENCE_MS
+        self.endpoint_ms = DEFAULT_ENDPOINT_MS
+        self.partial_ms = DEFAULT_PARTIAL_MS
+        self.max_segment_ms = DEFAULT_MAX_SEGMENT_MS
+        self.session_ttl = DEFAULT_SESSION_TTL
+        self.max_sessions = DEFAULT_MAX_SESSIONS
+
+        # in-process only: see the single-worker note at the top
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+        # stats
+        self.opened = 0
+        self.segments = 0
+        self.partials = 0
+        self.errors = 0
+        self.rejected = 0
+        self.final_ms_last = None
+        self._final_ms_total = 0.0
+        self._finals = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.silence_ms = app.config.get("STT_STREAM_SILENCE_MS", DEFAULT_SILENCE_MS)
+        self.endpoint_ms = app.config.get("STT_STREAM_ENDPOINT_MS", DEFAULT_ENDPOINT_MS)
+        self.partial_ms = app.config.get("STT_STREAM_PARTIAL_MS", DEFAULT_PARTIAL_MS)
+        self.max_segment_ms = app.config.get("STT_STREAM_MAX_SEGMENT_MS", DEFAULT_MAX_SEGMENT_MS)
+        self.session_ttl = app.config.get("STT_STREAM_SESSION_TTL", DEFAULT_SESSION_TTL)
+        self.max_sessions = app.config.get("STT_STREAM_MAX_SESSIONS", DEFAULT_MAX_SESSIONS)
+        app.extensions["stt_streams"] = self
+
+    # ---------- sessions ----------
+
+    def open(self):
+        self._expire()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                self.rejected += 1
+                raise TooManyStreams()
+            session_id = secrets.token_urlsafe(16)
+            self._sessions[session_id] = StreamSession(
+                session_id, SegmentVAD(self.silence_ms, self.max_segment_ms)
+            )
+            self.opened += 1
+            return session_id
+
+    def _expire(self):
+        limit = time.monotonic() - self.session_ttl
+        with self._lock:
+            for session_id in [
+                s.id for s in self._sessions.values() if s.last_seen < limit
+            ]:
+                del self._sessions[session_id]
+
+    # ---------- chunks ----------
+
+    def feed(self, session_id, pcm, final=False):
+        """
+        Add a chunk of PCM to a session. Returns the current transcript
+        or None when the session does not exist (expired / finished).
+        With final=True the rest is transcribed and the session closed.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            return None
+
+        t0 = time.perf_counter()
+        with session.lock:
+            session.last_seen = time.monotonic()
+            vad = session.vad
+
+            for segment in vad.feed(pcm):
+                self._finish_segment(session, segment)
+
+            if final:
+                segment = vad.flush()
+                if segment:
+                    self._finish_segment(session, segment)
+                with self._lock:
+                    self._sessions.pop(session_id, None)
+            elif vad.in_speech():
+                grown = vad.open_frames() - session.partial_frames
+                if grown * FRAME_MS >= self.partial_ms:
+                    session.partial = self._run(session, vad.open_segment(), partial=True)
+                    session.partial_frames = vad.open_frames()
+
+            result = {
+                "text": " ".join(session.texts),
+                "partial": "" if final else session.partial,
+                "endpoint": (
+                    vad.heard_speech
+                    and not vad.in_speech()
+                    and vad.trailing_silence * FRAME_MS >= self.endpoint_ms
+                ),
+                "final": final
+            }
+            if session.error and not session.texts:
+                result["error"] = session.error
+
+        if final:
+            elapsed = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self.final_ms_last = round(elapsed, 1)
+                self._final_ms_total += elapsed
+                self._finals += 1
+        return result
+
+    def _finish_segment(self, session, segment):
+        text = self._run(session, segment)
+        if text:
+            session.texts.append(text)
+        session.partial = ""
+        session.partial_frames = 0
+
+    def _run(self, session, pcm, partial=False):
+        try:
+            text, success = self.transcribe(pcm_to_wav(pcm))
+        except Overloaded as e:
+            # a refused segment is lost like a failed one; the session
+            # and its state stay usable for the next chunk
+            text, success = f"ERROR: {e}", False
+        with self._lock:
+            if partial:
+                self.partials += 1
+            else:
+                self.segments += 1
+            if not success:
+                self.errors += 1
+        if not success:
+            session.error = text
+            return ""
+        text = text.strip()
+        if text in BLANK_MARKERS:
+            return ""
+        return text
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": len(self._sessions),
+                "opened": self.opened,
+                "segments": self.segments,
+                "partials": self.partials,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "final_ms_last": self.final_ms_last,
+                "final_ms_avg": (
+                    round(self._final_ms_total / self._finals, 1)
+                    if self._finals else None
+                )
+            }
+
+
+stt_streams = StreamingTranscriber()
@@ -1,13 +1,27 @@
 import subprocess
+import codecs
+import json
 import os
+import threading
+import time
+
+from config import Config
+from server_pool import (
+    ServerProcessPool, PoolBusy, PoolUnavailable,
+    http_json, http_stream_lines
+)
+from response_cache import ResponseCache, cache_key
+from metrics import metrics
+from admission import admission, Overloaded
 
 # ================= CONFIG ================= #
 
 # Folder that contains llama.cpp executable
 LLAMA_DIR = r"C:\Users\saran\Music\llama-bin"
 
-# llama.cpp executable
+# llama.cpp executables
 LLAMA_EXE = os.path.join(LLAMA_DIR, "llama-cli.exe")
+LLAMA_SERVER_EXE = os.path.join(LLAMA_DIR, "llama-server.exe")
 
 # TinyLLaMA model (.gguf)
 MODEL_FILE = os.path.join(LLAMA_DIR, "tinyllama.gguf")
@@ -15,81 +29,622 @@ MODEL_FILE = os.path.join(LLAMA_DIR, "tinyllama.gguf")
 # Max tokens for short questions
 MAX_TOKENS = 64
 
-# ================= FUNCTION ================= #
+# Sampling (shared by every backend)
+TEMPERATURE = 0.2
+TOP_P = 0.9
+REPEAT_PENALTY = 1.1
+
+
+# Replies returned instead of an answer when something went wrong
+ERROR_REPLIES = {
+    "Assistant unavailable.",
+    "AI model not found.",
+    "AI took too long to respond.",
+    "Assistant is busy, please try again.",
+    "AI error occurred.",
+    "Please answer the question."
+}
+
 
-def tinyllama_chat(system_prompt, user_prompt):
+class BackendTimeout(Exception):
+    """The model did not answer within the request timeout."""
+
+
+# ================= BACKENDS ================= #
+
+class SpawnBackend:
     """
-    Runs TinyLLaMA locally using llama.cpp
-    Returns a short, clean assistant reply
+    Original behaviour: one llama-cli process per request.
+    Reloads the .gguf model every call, kept as a fallback.
     """
 
-    if not os.path.exists(LLAMA_EXE):
-        return "Assistant unavailable."
+    name = "spawn"
 
-    if not os.path.exists(MODEL_FILE):
-        return "AI model not found."
+    def available(self):
+        return os.path.exists(LLAMA_EXE) and os.path.exists(MODEL_FILE)
+
+    def _command(self, prompt):
+        return [
+            LLAMA_EXE,
+            "-m", MODEL_FILE,
+            "-p", prompt,
+            "-n", str(MAX_TOKENS),
+            "--temp", str(TEMPERATURE),
+            "--top-p", str(TOP_P),
+            "--repeat-penalty", str(REPEAT_PENALTY),
+            "--no-display-prompt"
+        ]
+
+    def generate(self, prompt, timeout):
+        try:
+            result = subprocess.run(
+                self._command(prompt),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+                text=True,
+                encoding="utf-8",
+                errors="ignore"
+            )
+        except subprocess.TimeoutExpired:
+            raise BackendTimeout()
+
+        return result.stdout
+
+    def stream(self, prompt, timeout):
+        """
+        Yield stdout as llama-cli prints it. The process is killed
+        when the consumer stops early or the timeout passes.
+        """
+        proc = subprocess.Popen(
+            self._command(prompt),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+        # read1() blocks while llama-cli is silent, so the deadline is
+        # enforced by killing the process, which ends the read
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            while True:
+                chunk = proc.stdout.read1(64)
+                if not chunk:
+                    break
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            if expired.is_set():
+                raise BackendTimeout()
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class ServerPoolBackend:
+    """
+    Pool of warm llama-server processes, each with the model loaded
+    once. Requests queue for a free worker (bounded wait) and are
+    sent to its /completion endpoint.
+    """
+
+    name = "server"
+
+    def __init__(self, workers=1, base_port=0, queue_timeout=10,
+                 health_interval=30):
+        self.pool = ServerProcessPool(
+            "llama-server",
+            self._command,
+            size=workers,
+            base_port=base_port,
+            queue_timeout=queue_timeout,
+            health_interval=health_interval
+        )
+
+    def _command(self, port):
+        return [
+            LLAMA_SERVER_EXE,
+            "-m", MODEL_FILE,
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "-np", "1"
+        ]
+
+    def available(self):
+        return os.path.exists(LLAMA_SERVER_EXE) and os.path.exists(MODEL_FILE)
+
+    def warm_up(self):
+        """Start every worker now instead of on the first request."""
+        self.pool.start()
+
+    def generate(self, prompt, timeout):
+        with self.pool.worker() as worker:
+            try:
+                data = http_json(
+                    worker.base_url + "/completion",
+                    {
+                        "prompt": prompt,
+                        "n_predict": MAX_TOKENS,
+                        "temperature": TEMPERATURE,
+                        "top_p": TOP_P,
+                        "repeat_penalty": REPEAT_PENALTY,
+                        "cache_prompt": True
+                    },
+                    timeout=timeout
+                )
+            except (TimeoutError, OSError) as e:
+                if "timed out" in str(e):
+                    raise BackendTimeout()
+                raise
+
+        return data.get("content", "")
+
+    def stream(self, prompt, timeout):
+        """
+        Yield tokens from llama-server's streaming /completion.
+        Closing this generator drops the connection, which stops
+        generation on the server and frees the worker.
+        """
+        with self.pool.worker() as worker:
+            lines = http_stream_lines(
+                worker.base_url + "/completion",
+                {
+                    "prompt": prompt,
+                    "n_predict": MAX_TOKENS,
+                    "temperature": TEMPERATURE,
+                    "top_p": TOP_P,
+                    "repeat_penalty": REPEAT_PENALTY,
+                    "cache_prompt": True,
+                    "stream": True
+                },
+                timeout=timeout
+            )
+            try:
+                for line in lines:
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:].strip() or "{}")
+                    if event.get("content"):
+                        yield event["content"]
+                    if event.get("stop"):
+                        break
+            except (TimeoutError, OSError) as e:
+                if "timed out" in str(e):
+                    raise BackendTimeout()
+                raise
+            finally:
+                lines.close()
+
+    def stats(self):
+        stats = self.pool.stats()
+        stats["backend"] = self.name
+        return stats
+
+
+class FakeLlamaBackend:
+    """
+    Stand-in for tests and benchmarks: no binaries, no model.
+    Answers deterministically from the prompt. `delay` simulates
+    generation time, `load_delay` a model load (paid on every call
+    when reload_each_call=True, i.e. the spawn behaviour).
+    """
+
+    name = "fake"
+
+    def __init__(self, delay=0.0, load_delay=0.0, reload_each_call=False):
+        self.delay = delay
+        self.load_delay = load_delay
+        self.reload_each_call = reload_each_call
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    def _load(self):
+        if self.reload_each_call:
+            time.sleep(self.load_delay)
+        else:
+            with self._lock:
+                if not self._loaded:
+                    time.sleep(self.load_delay)
+                    self._loaded = True
+
+        with self._lock:
+            self.calls += 1
+
+    def warm_up(self):
+        if not self.reload_each_call:
+            self._load()
+
+    def generate(self, prompt, timeout):
+        self._load()
+        time.sleep(self.delay)
+        return self._answer(prompt)
+
+    def _answer(self, prompt):
+        question = prompt.split("<|user|>")[-1].split("<|assistant|>")[0]
+        question = " ".join(question.split())
+        return (
+            f"Thank you for asking about {question.rstrip('.?!')}. "
+            "A staff member can help with anything else.\n"
+        )
+
+    def stream(self, prompt, timeout):
+        # same timing as generate(), spread over word-sized tokens
+        self._load()
+        words = self._answer(prompt).split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.delay / len(words))
+            yield word if i == 0 else " " + word
+
+    def stats(self):
+        return {"backend": self.name, "calls": self.calls}
+
+
+# ================= BACKEND SELECTION ================= #
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(kind=None):
+    kind = kind or Config.LLAMA_BACKEND
+
+    if kind == "fake":
+        return FakeLlamaBackend()
+
+    if kind == "server":
+        backend = ServerPoolBackend(
+            workers=Config.LLAMA_WORKERS,
+            base_port=Config.LLAMA_BASE_PORT,
+            queue_timeout=Config.LLAMA_QUEUE_TIMEOUT,
+            health_interval=Config.LLAMA_HEALTH_INTERVAL
+        )
+        if backend.available():
+            return backend
+
+    # no llama-server build → old per-call llama-cli
+    return SpawnBackend()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+
+def set_backend(backend):
+    """Swap the backend (tests / benchmarks)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+# ================= REPLY CACHE ================= #
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    with _backend_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                max_size=Config.LLAMA_CACHE_SIZE,
+                ttl=Config.LLAMA_CACHE_TTL,
+                path=Config.LLAMA_CACHE_PATH
+            )
+        return _cache
 
+
+# ================= FUNCTION ================= #
+
+# Lines containing any of these are prompt echo / role tags, not answers
+SKIP_MARKERS = ["<|", "system", "user", "assistant", "instruction"]
+
+# a "." after these does not end a sentence ("Dr. Rao", "10 a.m. on")
+ABBREVIATIONS = {
+    "dr", "mr", "mrs", "ms", "prof", "st", "no", "vs", "etc", "approx",
+    "dept", "e.g", "i.e", "a.m", "p.m", "mg", "tab", "cap"
+}
+
+def build_prompt(system_prompt, user_prompt):
     # Build prompt (VERY IMPORTANT FORMAT)
-    prompt = f"""<|system|>
+    return f"""<|system|>
 {system_prompt}
 <|user|>
 {user_prompt}
 <|assistant|>
 """
 
-    cmd = [
-        LLAMA_EXE,
-        "-m", MODEL_FILE,
-        "-p", prompt,
-        "-n", str(MAX_TOKENS),
-        "--temp", "0.2",
-        "--top-p", "0.9",
-        "--repeat-penalty", "1.1",
-        "--no-display-prompt"
-    ]
+
+def clean_reply(output):
+    output = output.strip()
+
+    # ================= CLEAN OUTPUT ================= #
+    lines = output.splitlines()
+    clean_lines = []
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if any(x in line.lower() for x in SKIP_MARKERS):
+            continue
+        clean_lines.append(line)
+
+    if not clean_lines:
+        return "Please answer the question."
+
+    # Only first clean sentence
+    reply = clean_lines[0]
+
+    return trim_reply(reply)
+
+
+def trim_reply(reply):
+    # Safety trims
+    reply = reply.replace("[", "").replace("]", "")
+    reply = reply.replace(":", "", 1)
+
+    return reply.strip()
+
+
+def tinyllama_chat(system_prompt, user_prompt, wait=None):
+    """
+    Runs TinyLLaMA locally using llama.cpp
+    Returns a short, clean assistant reply
+    Raises Overloaded when no llama slot frees up within `wait` seconds
+    (the admission budget's wait by default)
+    """
+
+    backend = get_backend()
+
+    if not backend.available():
+        metrics.observe_ai("llama", backend.name, "unavailable")
+        if backend.name == "spawn" and not os.path.exists(LLAMA_EXE):
+            return "Assistant unavailable."
+        return "AI model not found."
+
+    cache = get_cache()
+    key = cache_key(system_prompt, user_prompt, "chat")
+    cached = cache.get(key)
+    if cached is not None:
+        metrics.observe_ai("llama", backend.name, "cached")
+        return cached
+
+    prompt = build_prompt(system_prompt, user_prompt)
 
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=60,
-            text=True,
-            encoding="utf-8",
-            errors="ignore"
-        )
+        slot = admission.acquire("llama", wait)
+    except Overloaded:
+        metrics.observe_ai("llama", backend.name, "rejected")
+        raise
+
+    with slot, metrics.ai_call("llama", backend.name) as call:
+        try:
+            output = backend.generate(prompt, timeout=Config.LLAMA_TIMEOUT)
+            reply = clean_reply(output)
+            if reply not in ERROR_REPLIES:
+                cache.put(key, reply)
+            else:
+                call.outcome = "empty"
+            return reply
+
+        except BackendTimeout:
+            call.outcome = "timeout"
+            return "AI took too long to respond."
+
+        except PoolBusy:
+            call.outcome = "busy"
+            return "Assistant is busy, please try again."
+
+        except PoolUnavailable as e:
+            call.outcome = "unavailable"
+            print("TinyLLaMA error:", e)
+            return "Assistant unavailable."
+
+        except Exception as e:
+            call.outcome = "error"
+            print("TinyLLaMA error:", e)
+            return "AI error occurred."
+
+
+# ================= STREAMING ================= #
 
-        output = result.stdout.strip()
+_stream_stats = {
+    "streams": 0,
+    "ttft_last_ms": None,
+    "ttft_total_ms": 0.0,
+    "ttft_count": 0
+}
+_stream_lock = threading.Lock()
 
-        # ================= CLEAN OUTPUT ================= #
-        lines = output.splitlines()
-        clean_lines = []
 
-        for line in lines:
-            line = line.strip()
-            if not line:
+def ends_sentence(text):
+    """text ends with ".", "!" or "?" that is not an abbreviation's dot."""
+    if text[-1] in "!?":
+        return True
+    if text[-1] != ".":
+        return False
+    return text.split()[-1].lower().rstrip(".") not in ABBREVIATIONS
+
+
+def first_sentence(chunks):
+    """
+    Incremental clean_reply(): skips the same junk lines, yields the
+    first clean line as it is produced (one piece per chunk) and stops
+    at the end of its first sentence, since the rest is thrown away.
+    A sentence ends at ".", "!" or "?" followed by whitespace and an
+    uppercase letter, so "Dr. Rao" or "9 a.m. tomorrow" do not cut it.
+    """
+    line = ""
+    emitted = ""     # cleaned text already yielded
+    cleaned = ""     # cleaned text so far, may be ahead of `emitted`
+    at_end = False   # saw end punctuation + whitespace, next char decides
+
+    for chunk in chunks:
+        done = False
+
+        for ch in chunk:
+            if ch == "\n":
+                if cleaned:
+                    done = True
+                    break
+                line = ""
                 continue
-            if any(x in line.lower() for x in [
-                "<|", "system", "user", "assistant", "instruction"
-            ]):
+
+            if at_end and not ch.isspace():
+                if ch.isupper():
+                    done = True
+                    break
+                at_end = False
+
+            line += ch
+            text = line.strip()
+
+            if not text:
                 continue
-            clean_lines.append(line)
+            if any(x in text.lower() for x in SKIP_MARKERS):
+                if cleaned:
+                    done = True
+                    break
+                continue
+
+            # hold back the first word: "<" may still become "<|"
+            if not cleaned and " " not in text:
+                continue
+
+            cleaned = trim_reply(text)
+
+            if ch.isspace() and ends_sentence(text):
+                at_end = True
+
+        if len(cleaned) > len(emitted):
+            yield cleaned[len(emitted):]
+            emitted = cleaned
+
+        if done:
+            return
+
+    # stream ended on a single word
+    text = line.strip()
+    if not emitted and text and not any(x in text.lower() for x in SKIP_MARKERS):
+        yield trim_reply(text)
 
-        if not clean_lines:
-            return "Please answer the question."
 
-        # Only first clean sentence
-        reply = clean_lines[0]
+def tinyllama_stream(system_prompt, user_prompt):
+    """
+    Streaming variant of tinyllama_chat().
+    Yields ("token", {"text": ...}) events while the model runs and a
+    final ("done", {"reply": ..., "ttft_ms": ...}) event.
+    The llama slot is taken before the first event, so Overloaded is
+    raised by the first next() and the caller can still answer 503.
+    """
+
+    backend = get_backend()
+
+    if not backend.available():
+        metrics.observe_ai("llama_stream", backend.name, "unavailable")
+        yield "done", {"reply": "Assistant unavailable.", "ttft_ms": None}
+        return
+
+    cache = get_cache()
+    key = cache_key(system_prompt, user_prompt, "stream")
+    cached = cache.get(key)
+    if cached is not None:
+        metrics.observe_ai("llama_stream", backend.name, "cached")
+        yield "token", {"text": cached}
+        yield "done", {"reply": cached, "ttft_ms": 0.0, "cached": True}
+        return
 
-        # Safety trims
-        reply = reply.replace("[", "").replace("]", "")
-        reply = reply.replace(":", "", 1)
+    prompt = build_prompt(system_prompt, user_prompt)
 
-        return reply.strip()
+    try:
+        slot = admission.acquire("llama")
+    except Overloaded:
+        metrics.observe_ai("llama_stream", backend.name, "rejected")
+        raise
+
+    started = time.perf_counter()
+    ttft_ms = None
+    reply = ""
+    complete = False
+    outcome = "ok"
+
+    chunks = backend.stream(prompt, timeout=Config.LLAMA_TIMEOUT)
+    try:
+        for text in first_sentence(chunks):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            reply += text
+            yield "token", {"text": text}
+        complete = True
 
-    except subprocess.TimeoutExpired:
-        return "AI took too long to respond."
+    except BackendTimeout:
+        outcome = "timeout"
+        reply = reply or "AI took too long to respond."
+
+    except PoolBusy:
+        outcome = "busy"
+        reply = reply or "Assistant is busy, please try again."
 
     except Exception as e:
+        outcome = "error"
         print("TinyLLaMA error:", e)
-        return "AI error occurred."
+        reply = reply or "AI error occurred."
+
+    finally:
+        # stops generation if we finished early
+        chunks.close()
+        slot.release()
+
+    metrics.observe_ai("llama_stream", backend.name, outcome,
+                       time.perf_counter() - started)
+
+    if complete and reply.strip():
+        cache.put(key, reply.strip())
+
+    with _stream_lock:
+        _stream_stats["streams"] += 1
+        if ttft_ms is not None:
+            _stream_stats["ttft_last_ms"] = round(ttft_ms, 1)
+            _stream_stats["ttft_total_ms"] += ttft_ms
+            _stream_stats["ttft_count"] += 1
+
+    yield "done", {
+        "reply": reply.strip() or "Please answer the question.",
+        "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+        "cached": False
+    }
+
+
+def stream_stats():
+    with _stream_lock:
+        count = _stream_stats["ttft_count"]
+        return {
+            "streams": _stream_stats["streams"],
+            "ttft_last_ms": _stream_stats["ttft_last_ms"],
+            "ttft_avg_ms": (
+                round(_stream_stats["ttft_total_ms"] / count, 1)
+                if count else None
+            )
+        }
@@ -1,40 +1,394 @@
-import pyttsx3
-import uuid
+# tts_engine.py
+#
+# Text-to-speech for the voice assistant.
+# WAV files are content-addressed (hash of text + voice settings), so a
+# sentence that was spoken before is served from static/tts without
+# synthesising it again. New sentences are rendered in a small pool of
+# worker processes, each with its own pyttsx3 engine, so requests no
+# longer queue behind one global runAndWait(). Old files are evicted by
+# age and total size.
+
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
 
 # ================= CONFIG ================= #
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TTS_DIR = os.path.join(BASE_DIR, "static", "tts")
 
-os.makedirs(TTS_DIR, exist_ok=True)
+# Voice settings (part of the cache key)
+VOICE_HINT = "english"   # first installed voice whose name contains this
+RATE = 165               # speech speed
+VOLUME = 1.0
 
-# ================= INIT ENGINE ================= #
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT = 60              # seconds per synthesis
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 3600   # seconds since a file was last served
+SWEEP_INTERVAL = 60               # seconds between eviction sweeps
+RECENT_GRACE = 60                 # never evict a file served this recently
 
-engine = pyttsx3.init()
 
-# Optional: select a clear English voice
-voices = engine.getProperty("voices")
-for v in voices:
-    if "english" in v.name.lower():
-        engine.setProperty("voice", v.id)
-        break
+class TTSError(Exception):
+    """Synthesis failed or timed out."""
 
-engine.setProperty("rate", 165)   # Speech speed
-engine.setProperty("volume", 1.0) # Max volume
 
-# ================= FUNCTION ================= #
+# ================= WORKER PROCESS ================= #
 
-def synthesize_to_wav(text):
+_engine = None
+
+
+def _make_engine():
+    import pyttsx3
+
+    engine = pyttsx3.init()
+
+    # Optional: select a clear English voice
+    for v in engine.getProperty("voices"):
+        if VOICE_HINT in v.name.lower():
+            engine.setProperty("voice", v.id)
+            break
+
+    engine.setProperty("rate", RATE)
+    engine.setProperty("volume", VOLUME)
+    return engine
+
+
+def _init_worker():
+    global _engine
+    _engine = _make_engine()
+
+
+def _ready():
+    # gives the pool a reason to start a process (and its engine)
+    time.sleep(0.1)
+    return os.getpid()
+
+
+def _render(text, output_path):
     """
-    Convert text → speech WAV file
-    Returns filename only
+    Runs in a worker process (or inline with workers=0).
+    Writes to a temp name and renames, so a half-written WAV is never
+    served under the final name.
     """
+    global _engine
+    if _engine is None:
+        _engine = _make_engine()
+
+    t0 = time.perf_counter()
+    tmp_path = f"{output_path}.{os.getpid()}.part"
+    try:
+        _engine.save_to_file(text, tmp_path)
+        _engine.runAndWait()
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return (time.perf_counter() - t0) * 1000
+
+
+def voice_key(text):
+    raw = "\0".join([" ".join(text.split()), VOICE_HINT, str(RATE), str(VOLUME)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+# ================= ENGINE ================= #
+
+class TTSEngine:
+    """
+    synthesize(text) -> filename inside the TTS folder.
+    Identical requests in flight at the same time share one synthesis.
+    """
+
+    def __init__(self, app=None):
+        self.folder = TTS_DIR
+        self.workers = DEFAULT_WORKERS
+        self.timeout = DEFAULT_TIMEOUT
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.max_age = DEFAULT_MAX_AGE
+
+        self._pool = None
+        self._inline_lock = threading.Lock()   # pyttsx3 is not thread-safe
+        self._pending = {}                     # key -> Future
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.errors = 0
+        self.evicted = 0
+        self.synth_ms_last = None
+        self._synth_ms_total = 0.0
+        self._synths = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.config.get("TTS_FOLDER", TTS_DIR)
+        self.workers = app.config.get("TTS_WORKERS", DEFAULT_WORKERS)
+        self.timeout = app.config.get("TTS_TIMEOUT", DEFAULT_TIMEOUT)
+        self.max_bytes = app.config.get("TTS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        self.max_age = app.config.get("TTS_CACHE_MAX_AGE", DEFAULT_MAX_AGE)
+        app.extensions["tts"] = self
+
+    # ---------- synthesis ----------
+
+    def synthesize(self, text):
+        # imported here: the speech worker processes import this module
+        # and do not need Flask
+        from metrics import metrics
+        from admission import admission, Overloaded
+
+        os.makedirs(self.folder, exist_ok=True)
+        filename = f"tts_{voice_key(text)}.wav"
+        path = os.path.join(self.folder, filename)
+
+        if os.path.exists(path):
+            self._touch(path)
+            with self._lock:
+                self.hits += 1
+            metrics.observe_ai("tts", "pyttsx3", "cached")
+            return filename
+
+        # a new synthesis needs a tts slot (may wait or raise Overloaded);
+        # joining one already in flight does not
+        with self._lock:
+            future = self._pending.get(filename)
+        owner = future is None
 
-    filename = f"tts_{uuid.uuid4().hex}.wav"
-    output_path = os.path.join(TTS_DIR, filename)
+        if owner:
+            try:
+                slot = admission.acquire("tts")
+            except Overloaded:
+                metrics.observe_ai("tts", "pyttsx3", "rejected")
+                raise
 
-    engine.save_to_file(text, output_path)
-    engine.runAndWait()
+            with self._lock:
+                # someone else may have started it while we waited
+                future = self._pending.get(filename)
+                owner = future is None
+                if owner:
+                    try:
+                        future = self._submit(text, path)
+                    except BaseException:
+                        slot.release()
+                        raise
+                    self._pending[filename] = future
+                    self.misses += 1
 
-    return filename
+            if owner:
+                # held until the render ends, not until we stop waiting
+                future.add_done_callback(lambda _: slot.release())
+            else:
+                slot.release()
+
+        if not owner:
+            with self._lock:
+                self.shared += 1
+
+        with metrics.ai_call("tts", "pyttsx3") as call:
+            try:
+                elapsed = future.result(timeout=self.timeout)
+                if not owner:
+                    call.outcome = "shared"
+            except FutureTimeout:
+                call.outcome = "timeout"
+                self._count_error()
+                raise TTSError("Speech synthesis took too long")
+            except BrokenProcessPool:
+                call.outcome = "crashed"
+                self._reset_pool()
+                self._count_error()
+                raise TTSError("Speech worker crashed")
+            except Exception as e:
+                self._count_error()
+                raise TTSError(f"Speech synthesis failed: {e}")
+            finally:
+                if owner:
+                    with self._lock:
+                        self._pending.pop(filename, None)
+
+        if owner:
+            with self._lock:
+                self.synth_ms_last = round(elapsed, 1)
+                self._synth_ms_total += elapsed
+                self._synths += 1
+            self._maybe_sweep()
+        return filename
+
+    def _submit(self, text, path):
+        if self.workers <= 0:
+            return _InlineResult(self._render_inline, text, path)
+        return self._get_pool().submit(_render, text, path)
+
+    def _get_pool(self):
+        # called with self._lock held
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker
+            )
+        return self._pool
+
+    def _render_inline(self, text, path):
+        with self._inline_lock:
+            return _render(text, path)
+
+    def _reset_pool(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _count_error(self):
+        with self._lock:
+            self.errors += 1
+
+    # ---------- eviction ----------
+
+    def _touch(self, path):
+        # mtime doubles as "last served", so eviction is least-recently-used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _maybe_sweep(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+        self.evict()
+
+    def evict(self):
+        """
+        Drop files not served within max_age, then the least recently
+        served ones until the folder is under max_bytes.
+        """
+        now = time.time()
+        files = []
+        for name in os.listdir(self.folder):
+            if not (name.startswith("tts_") and name.endswith(".wav")):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime < RECENT_GRACE:
+                break
+            if now - mtime < self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self.evicted += removed
+        return removed
+
+    # ---------- lifecycle ----------
+
+    def warm_up(self):
+        """Start the worker processes and their pyttsx3 engines."""
+        if self.workers <= 0:
+            global _engine
+            with self._inline_lock:
+                if _engine is None:
+                    _engine = _make_engine()
+            return
+        with self._lock:
+            pool = self._get_pool()
+        for future in [pool.submit(_ready) for _ in range(self.workers)]:
+            future.result(timeout=self.timeout)
+
+    def stop(self):
+        self._reset_pool()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.shared
+            return {
+                "workers": self.workers,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "errors": self.errors,
+                "evicted": self.evicted,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "synth_ms_last": self.synth_ms_last,
+                "synth_ms_avg": (
+                    round(self._synth_ms_total / self._synths, 1)
+                    if self._synths else None
+                )
+            }
+
+
+class _InlineResult:
+    """Future-like wrapper for workers=0 (render on the calling thread)."""
+
+    def __init__(self, fn, *args):
+        self._fn = fn
+        self._args = args
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._callbacks = []
+
+    def add_done_callback(self, fn):
+        with self._start_lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def result(self, timeout=None):
+        with self._start_lock:
+            run = not self._started
+            self._started = True
+        if run:
+            try:
+                self._value = self._fn(*self._args)
+            except Exception as e:
+                self._error = e
+            finally:
+                with self._start_lock:
+                    self._done.set()
+                    callbacks, self._callbacks = self._callbacks, []
+                for fn in callbacks:
+                    fn(self)
+        elif not self._done.wait(timeout):
+            raise FutureTimeout()
+
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+tts = TTSEngine()
+
+
+def synthesize_to_wav(text):
+    """
+    Convert text → speech WAV file
+    Returns filename only
+    """
+    return tts.synthesize(text)
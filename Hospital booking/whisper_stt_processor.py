@@ -1,95 +1,272 @@
-# whisper_stt_processor.py (FINAL PROJECT VERSION USING REFERENCE CODE)
+# whisper_stt_processor.py
+#
+# Speech-to-text for the dictation buttons.
+# The default backend keeps ggml-base.en.bin loaded in a small pool of
+# whisper-server processes and sends them the audio bytes over HTTP, so a
+# request no longer pays for a model load or waits on a .txt file.
 
+import hashlib
 import os
 import subprocess
+import tempfile
+import threading
 import time
 
+from config import Config
+from server_pool import ServerProcessPool, PoolBusy, PoolUnavailable, http_multipart
+from metrics import metrics
+from admission import admission, Overloaded
+
 # === ABSOLUTE PATHS ===
 WHISPER_EXE_PATH = r"C:\Users\saran\Music\whisper-bin-x64\Release"
 WHISPER_CLI_EXE = os.path.join(WHISPER_EXE_PATH, "whisper-cli.exe")
+WHISPER_SERVER_EXE = os.path.join(WHISPER_EXE_PATH, "whisper-server.exe")
 
 # Models (full paths)
 MODEL_PATH = os.path.join(WHISPER_EXE_PATH, "ggml-base.en.bin")
 VAD_MODEL_PATH = os.path.join(WHISPER_EXE_PATH, "ggml-silero-v6.2.0.bin")
 
-# Flask project root
-FLASK_ROOT = os.path.dirname(os.path.abspath(__file__))
-OUTPUT_FOLDER_RELATIVE = "static\\uploads"
+LANGUAGE = "en"
 
 
-def transcribe_audio_whisper(audio_file_path):
+class TranscriptionError(Exception):
+    """The backend ran but could not produce a transcript."""
+
+
+def vad_args():
+    """Let whisper skip silence with the Silero model when it is installed."""
+    if os.path.exists(VAD_MODEL_PATH):
+        return ["--vad", "--vad-model", VAD_MODEL_PATH]
+    return []
+
+
+# ================= BACKENDS ================= #
+
+class CliBackend:
     """
-    Uses Whisper CLI (with VAD) to transcribe audio.
-    Handles .txt generation, multi-extension audio,
-    safe deletion, and retry logic.
+    Original behaviour: one whisper-cli process per recording (reloads
+    the model every call). Kept as a fallback when no whisper-server
+    build is present. The transcript is read from stdout, not a file.
     """
 
-    # Check executable
-    if not os.path.exists(WHISPER_CLI_EXE):
-        return f"ERROR: Whisper executable not found at: {WHISPER_CLI_EXE}", False
+    name = "cli"
 
-    # Get clean base name WITHOUT extension
-    base_name = os.path.splitext(os.path.basename(audio_file_path))[0]
+    def available(self):
+        return os.path.exists(WHISPER_CLI_EXE) and os.path.exists(MODEL_PATH)
 
-    # Output directory
-    output_dir_abs = os.path.join(FLASK_ROOT, OUTPUT_FOLDER_RELATIVE)
+    def transcribe(self, audio_bytes, timeout):
+        # whisper-cli only reads from a path: give every call its own
+        # directory so parallel requests never share a file
+        with tempfile.TemporaryDirectory(prefix="stt-") as tmp:
+            audio_path = os.path.join(tmp, "audio.wav")
+            with open(audio_path, "wb") as f:
+                f.write(audio_bytes)
 
-    # Final output base
-    output_base_no_ext = os.path.join(output_dir_abs, base_name)
+            command = [
+                WHISPER_CLI_EXE,
+                "-m", MODEL_PATH,
+                "-f", audio_path,
+                "-l", LANGUAGE,
+                "-nt",      # no timestamps
+                "-np"       # only print the transcript
+            ] + vad_args()
+            try:
+                result = subprocess.run(
+                    command,
+                    capture_output=True,
+                    check=True,
+                    timeout=timeout
+                )
+            except subprocess.CalledProcessError as e:
+                err_msg = (e.stderr or e.stdout).decode("utf-8", errors="ignore")
+                raise TranscriptionError(f"Whisper Execution Failed:\n{err_msg}")
 
-    # Normalize paths for Windows
-    input_path_win = audio_file_path.replace("/", "\\")
-    output_base_win = output_base_no_ext.replace("/", "\\")
+        return result.stdout.decode("utf-8", errors="ignore")
 
-    # ====== Whisper Command ======
-    command_str = (
-    f'"{WHISPER_CLI_EXE}" '
-    f'-m "{MODEL_PATH}" '
-    f'-f "{input_path_win}" '
-    f'-l "en" '
-    f'-otxt '
-    f'-of "{output_base_win}"'
-)
+    def stats(self):
+        return {"backend": self.name}
 
 
-    print("\n[DEBUG] Whisper Command:")
-    print(command_str)
+class ServerPoolBackend:
+    """
+    Pool of warm whisper-server processes. The recording is posted as
+    multipart form data to /inference and the JSON reply carries the
+    text; requests queue for a free worker with a bounded wait.
+    """
 
-    # Run whisper
-    try:
-        subprocess.run(
-            command_str,
-            shell=True,
-            check=True,
-            timeout=120,
-            capture_output=True
+    name = "server"
+
+    def __init__(self, workers=1, base_port=0, queue_timeout=10,
+                 health_interval=30):
+        self.pool = ServerProcessPool(
+            "whisper-server",
+            self._command,
+            size=workers,
+            base_port=base_port,
+            queue_timeout=queue_timeout,
+            health_interval=health_interval
+        )
+
+    def _command(self, port):
+        return [
+            WHISPER_SERVER_EXE,
+            "-m", MODEL_PATH,
+            "-l", LANGUAGE,
+            "--host", "127.0.0.1",
+            "--port", str(port)
+        ] + vad_args()
+
+    def available(self):
+        return os.path.exists(WHISPER_SERVER_EXE) and os.path.exists(MODEL_PATH)
+
+    def warm_up(self):
+        """Start every worker now instead of on the first request."""
+        self.pool.start()
+
+    def transcribe(self, audio_bytes, timeout):
+        with self.pool.worker() as worker:
+            data = http_multipart(
+                worker.base_url + "/inference",
+                {"response_format": "json", "temperature": "0.0"},
+                {"file": ("audio.wav", audio_bytes, "audio/wav")},
+                timeout=timeout
+            )
+
+        if "error" in data:
+            raise TranscriptionError(f"Whisper Execution Failed:\n{data['error']}")
+        return data.get("text", "")
+
+    def stats(self):
+        stats = self.pool.stats()
+        stats["backend"] = self.name
+        return stats
+
+
+class StubWhisperBackend:
+    """
+    Stand-in for tests and benchmarks: no binaries, no model.
+    The transcript is derived from the audio bytes, so callers can
+    check they got the answer for their own recording.
+    """
+
+    name = "stub"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def available(self):
+        return True
+
+    def transcribe(self, audio_bytes, timeout):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        digest = hashlib.sha1(audio_bytes).hexdigest()[:12]
+        return f"transcript {digest}"
+
+    def stats(self):
+        return {"backend": self.name, "calls": self.calls}
+
+
+# ================= BACKEND SELECTION ================= #
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(kind=None):
+    kind = kind or Config.WHISPER_BACKEND
+
+    if kind == "stub":
+        return StubWhisperBackend()
+
+    if kind == "server":
+        backend = ServerPoolBackend(
+            workers=Config.WHISPER_WORKERS,
+            base_port=Config.WHISPER_BASE_PORT,
+            queue_timeout=Config.WHISPER_QUEUE_TIMEOUT,
+            health_interval=Config.WHISPER_HEALTH_INTERVAL
         )
+        if backend.available():
+            return backend
+
+    # no whisper-server build → whisper-cli per recording
+    return CliBackend()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+
+def set_backend(backend):
+    """Swap the backend (tests / benchmarks)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
 
-        # ====== FIND OUTPUT FILE ======
-        for _ in range(20):
-            for file in os.listdir(output_dir_abs):
-                # Match: base + anything + .txt
-                if file.startswith(base_name) and file.endswith(".txt"):
-                    txt_path = os.path.join(output_dir_abs, file)
 
-                    try:
-                        with open(txt_path, "r", encoding="utf-8") as f:
-                            text = f.read().strip()
+# ================= API ================= #
 
-                        # Clean file after reading
-                        os.remove(txt_path)
-                        return text, True
+def transcribe_audio_bytes(audio_bytes):
+    """
+    Transcribe a recording held in memory.
+    Returns (text, success) like transcribe_audio_whisper; raises
+    Overloaded when no whisper slot frees up in time.
+    """
+    if not audio_bytes:
+        return "ERROR: Empty audio", False
+
+    backend = get_backend()
+    if not backend.available():
+        metrics.observe_ai("whisper", backend.name, "unavailable")
+        return f"ERROR: Whisper executable not found at: {WHISPER_EXE_PATH}", False
+
+    try:
+        slot = admission.acquire("whisper")
+    except Overloaded:
+        metrics.observe_ai("whisper", backend.name, "rejected")
+        raise
+
+    with slot, metrics.ai_call("whisper", backend.name) as call:
+        try:
+            text = backend.transcribe(audio_bytes, Config.WHISPER_TIMEOUT)
+            return " ".join(text.split()), True
+
+        except TranscriptionError as e:
+            call.outcome = "error"
+            return str(e), False
 
-                    except PermissionError:
-                        time.sleep(0.2)
+        except PoolBusy:
+            call.outcome = "busy"
+            return "ERROR: Speech recognition is busy, please try again", False
 
-            time.sleep(0.2)
+        except PoolUnavailable as e:
+            call.outcome = "unavailable"
+            return f"ERROR: {e}", False
 
-        return f"ERROR: Whisper output not found for base name: {base_name}", False
+        except subprocess.TimeoutExpired:
+            call.outcome = "timeout"
+            return "ERROR: Whisper took too long to respond", False
 
-    except subprocess.CalledProcessError as e:
-        err_msg = (e.stderr or e.stdout).decode("utf-8", errors="ignore")
-        return f"Whisper Execution Failed:\n{err_msg}", False
+        except Exception as e:
+            call.outcome = "error"
+            return f"General STT Error: {str(e)}", False
 
-    except Exception as e:
+
+def transcribe_audio_whisper(audio_file_path):
+    """
+    Transcribe an audio file on disk (kept for existing callers).
+    """
+    try:
+        with open(audio_file_path, "rb") as f:
+            audio_bytes = f.read()
+    except OSError as e:
         return f"General STT Error: {str(e)}", False
+
+    return transcribe_audio_bytes(audio_bytes)